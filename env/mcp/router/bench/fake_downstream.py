@@ -0,0 +1,101 @@
+# bench/fake_downstream.py
+# A downstream MCP server for benchmarks, over stdio or TCP, whose latency and reply size are
+# set on the command line. It speaks the router's JSON lines protocol and answers every request
+# on its own thread, echoing the request id, so pipelined calls overlap like on a real server.
+#
+#   python bench/fake_downstream.py --stdio --latency-ms 5 --payload-bytes 1024
+#   python bench/fake_downstream.py --port 4500 --latency-ms 20
+import argparse
+import json
+import socketserver
+import sys
+import threading
+import time
+
+TOOLS = [
+    {"name": "echo", "description": "Returns its args after the configured latency", "parameters": []},
+    {"name": "payload", "description": "Returns a string of the configured payload size", "parameters": []},
+]
+
+class FakeDownstream:
+    def __init__(self, latency_ms: float = 0.0, payload_bytes: int = 256):
+        self.latency = latency_ms / 1000.0
+        self.payload = "x" * payload_bytes
+
+    def handle(self, req):
+        t = req.get("type")
+        if t == "list_all":
+            resp = {"tools": TOOLS, "resources": [], "agents": []}
+        elif t == "run_tool" and req.get("name") in ("echo", "payload"):
+            if self.latency:
+                time.sleep(self.latency)
+            result = req.get("args", {}) if req["name"] == "echo" else self.payload
+            resp = {"ok": True, "result": result}
+        else:
+            resp = {"error": f"unknown request type: {t}"}
+        if "id" in req:
+            resp["id"] = req["id"]
+        return (json.dumps(resp) + "\n").encode("utf-8")
+
+    def serve_lines(self, lines, write):
+        """Answers each request line on its own thread; write(bytes) must be thread-safe."""
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+            except ValueError:
+                write(b'{"error": "invalid JSON"}\n')
+                continue
+            threading.Thread(target=lambda r=req: write(self.handle(r)), daemon=True).start()
+
+def serve_stdio(downstream: FakeDownstream):
+    lock = threading.Lock()
+    out = sys.stdout.buffer
+
+    def write(data: bytes):
+        with lock:
+            out.write(data)
+            out.flush()
+
+    downstream.serve_lines(sys.stdin.buffer, write)
+
+def serve_tcp(downstream: FakeDownstream, host: str, port: int, ready=None):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lock = threading.Lock()
+
+            def write(data: bytes):
+                with lock:
+                    try:
+                        self.wfile.write(data)
+                    except OSError:
+                        pass
+
+            downstream.serve_lines(self.rfile, write)
+
+    class Server(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    with Server((host, port), Handler) as server:
+        if ready:
+            ready(server.server_address[1])
+        server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake MCP downstream for router benchmarks.")
+    parser.add_argument("--stdio", action="store_true", help="Serve on stdin/stdout instead of TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="TCP port (0: any free port, printed on stdout).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Time each tool call takes.")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="Size of the 'payload' tool's result.")
+    args = parser.parse_args()
+    downstream = FakeDownstream(args.latency_ms, args.payload_bytes)
+    if args.stdio:
+        serve_stdio(downstream)
+    else:
+        serve_tcp(downstream, args.host, args.port, ready=lambda port: print(port, flush=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# bench/run_bench.py
+# Load generator for the MCP router. Starts the router (python router.py) with a fake stdio and
+# a fake TCP downstream, drives it with N concurrent clients sending a weighted mix of list_all,
+# local tool and proxied tool calls, and reports req/s, latency percentiles and the router
+# process's CPU and RSS. Results are saved as JSON so runs can be compared.
+#
+#   python bench/run_bench.py --clients 32 --duration 10 --engine threaded,asyncio --out bench.json
+#   python bench/run_bench.py compare before.json after.json
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROUTER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROUTER_DIR))
+
+from core.registry import MCPRegistry
+from core.tcp_client import TCPMCPClient
+
+FAKE_DOWNSTREAM = Path(__file__).resolve().parent / "fake_downstream.py"
+
+# Request type -> the request sent for it. Proxied calls go through the fake downstreams.
+REQUESTS = {
+    "list_all": {"type": "list_all"},
+    "local": {"type": "run_tool", "name": "ROUTER_list_registry", "args": {}},
+    "stdio": {"type": "run_tool", "name": "BENCH_STDIO_payload", "args": {}},
+    "tcp": {"type": "run_tool", "name": "BENCH_TCP_payload", "args": {}},
+}
+DEFAULT_MIX = "list_all=1,local=2,stdio=4,tcp=4"
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in REQUESTS:
+            raise ValueError(f"unknown request type in mix: {name} (expected one of {', '.join(REQUESTS)})")
+        mix[name] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise ValueError("mix needs at least one positive weight")
+    return mix
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles of latencies (seconds), in milliseconds."""
+    if not latencies:
+        return {"p50": None, "p90": None, "p99": None, "mean": None, "max": None}
+    s = sorted(latencies)
+    pick = lambda q: round(s[min(len(s) - 1, int(q * len(s)))] * 1000, 3)
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "mean": round(sum(s) / len(s) * 1000, 3), "max": round(s[-1] * 1000, 3)}
+
+class ProcessStats:
+    """CPU time and resident memory of a process, from /proc (Linux only; None elsewhere)."""
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        return (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+
+    def rss_bytes(self) -> Optional[int]:
+        try:
+            for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def _sample(self):
+        while not self._stop.wait(0.1):
+            self.peak_rss = max(self.peak_rss, self.rss_bytes() or 0)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+def _client_thread(port: int, mix: Dict[str, float], go, warmup: float, duration: float, seed: int,
+                   out: Dict[str, Dict[str, Any]], lock: threading.Lock, ready: threading.Barrier):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    client = TCPMCPClient(f"bench-{seed}", "127.0.0.1", port, MCPRegistry(), "")
+    client.connect(register=False)
+    ready.wait()
+    go.wait()
+    start = time.monotonic()
+    measure_from, end = start + warmup, start + warmup + duration
+    local: Dict[str, Dict[str, Any]] = {name: {"latencies": [], "errors": 0} for name in names}
+    try:
+        while True:
+            name = rng.choices(names, weights)[0]
+            t0 = time.monotonic()
+            if t0 >= end:
+                break
+            resp = client.call(REQUESTS[name], timeout=30)
+            t1 = time.monotonic()
+            if t0 < measure_from or t1 > end:
+                continue
+            result = resp.get("result") if resp else None
+            if resp is None or "error" in resp or (isinstance(result, dict) and "error" in result):
+                local[name]["errors"] += 1
+            else:
+                local[name]["latencies"].append(t1 - t0)
+    finally:
+        client.close()
+    with lock:
+        for name, data in local.items():
+            out[name]["latencies"] += data["latencies"]
+            out[name]["errors"] += data["errors"]
+
+def _client_process(port: int, clients: int, mix: Dict[str, float], warmup: float, duration: float, seed: int,
+                    ready_queue, go, results_queue):
+    """Runs `clients` closed-loop clients on threads (each waits for its reply before the next call)."""
+    out = {name: {"latencies": [], "errors": 0} for name in mix}
+    lock = threading.Lock()
+    ready = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=_client_thread, args=(port, mix, go, warmup, duration, seed * 1000 + i, out, lock, ready))
+               for i in range(clients)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    ready_queue.put(seed)
+    for t in threads:
+        t.join()
+    results_queue.put(out)
+
+class Stack:
+    """The fake TCP downstream and the router, as subprocesses."""
+    def __init__(self, engine: str, workers: int, latency_ms: float, payload_bytes: int, replicas: int, router_args: List[str]):
+        self.engine = engine
+        self.workers = workers
+        self.latency_ms = latency_ms
+        self.payload_bytes = payload_bytes
+        self.replicas = replicas
+        self.router_args = router_args
+        self.port = free_port()
+        self.procs: List[subprocess.Popen] = []
+        self._tmp = tempfile.TemporaryDirectory(prefix="mcp-bench-")
+
+    def __enter__(self):
+        fake_args = ["--latency-ms", str(self.latency_ms), "--payload-bytes", str(self.payload_bytes)]
+        tcp = subprocess.Popen([sys.executable, str(FAKE_DOWNSTREAM), "--port", "0"] + fake_args,
+                               stdout=subprocess.PIPE, text=True)
+        self.procs.append(tcp)
+        tcp_port = int(tcp.stdout.readline())
+        config = Path(self._tmp.name) / "downstreams.yaml"
+        # JSON is valid YAML.
+        config.write_text(json.dumps({"downstreams": [
+            {"name": "bench_stdio", "type": "local", "cmd": [sys.executable, str(FAKE_DOWNSTREAM), "--stdio"] + fake_args,
+             "replicas": self.replicas},
+            {"name": "bench_tcp", "type": "tcp", "host": "127.0.0.1", "port": tcp_port},
+        ]}))
+        log = open(Path(self._tmp.name) / "router.log", "w")
+        self.router = subprocess.Popen(
+            [sys.executable, str(ROUTER_DIR / "router.py"), "--host", "127.0.0.1", "--port", str(self.port),
+             "--engine", self.engine, "--workers", str(self.workers), "--downstreams", str(config),
+             "--no-descriptor-cache", "--log-level", "WARNING"] + self.router_args,
+            cwd=str(ROUTER_DIR), stdout=log, stderr=subprocess.STDOUT)
+        self.procs.append(self.router)
+        self._wait_ready(timeout=60)
+        return self
+
+    def _wait_ready(self, timeout: float):
+        wanted = {r["name"] for r in REQUESTS.values() if "name" in r}
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.router.poll() is not None:
+                raise RuntimeError(f"router exited with code {self.router.returncode}; see {self._tmp.name}/router.log")
+            client = TCPMCPClient("bench-probe", "127.0.0.1", self.port, MCPRegistry(), "")
+            try:
+                client.connect(timeout=2, register=False)
+                tools = {t["name"] for t in (client.capabilities or {}).get("tools", [])}
+                if wanted <= tools:
+                    return
+            except OSError:
+                pass
+            finally:
+                client.close()
+            time.sleep(0.2)
+        raise RuntimeError(f"router did not list {sorted(wanted)} within {timeout}s")
+
+    def __exit__(self, *exc):
+        for proc in reversed(self.procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self._tmp.cleanup()
+
+def run(args, engine: str) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    processes = max(1, min(args.processes, args.clients))
+    per_process = [args.clients // processes + (1 if i < args.clients % processes else 0) for i in range(processes)]
+    with Stack(engine, args.workers, args.latency_ms, args.payload_bytes, args.replicas, args.router_arg) as stack:
+        ctx = multiprocessing.get_context()
+        ready_queue, results_queue, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+        workers = [ctx.Process(target=_client_process, daemon=True,
+                               args=(stack.port, n, mix, args.warmup, args.duration, args.seed + i, ready_queue, go, results_queue))
+                   for i, n in enumerate(per_process)]
+        for w in workers:
+            w.start()
+        for _ in workers:
+            ready_queue.get(timeout=60)
+        stats = ProcessStats(stack.router.pid)
+        go.set()
+        time.sleep(args.warmup)
+        cpu_before, measured_at = stats.cpu_seconds(), time.monotonic()
+        stats.start()
+        time.sleep(args.duration)
+        cpu_after, elapsed = stats.cpu_seconds(), time.monotonic() - measured_at
+        stats.stop()
+        rss_end = stats.rss_bytes()
+        merged = {name: {"latencies": [], "errors": 0} for name in mix}
+        for _ in workers:
+            part = results_queue.get(timeout=args.duration + args.warmup + 120)
+            for name, data in part.items():
+                merged[name]["latencies"] += data["latencies"]
+                merged[name]["errors"] += data["errors"]
+        for w in workers:
+            w.join(timeout=10)
+
+    all_latencies = [l for data in merged.values() for l in data["latencies"]]
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return {
+        "label": args.label or engine,
+        "config": {"engine": engine, "clients": args.clients, "processes": processes, "workers": args.workers,
+                   "duration": args.duration, "warmup": args.warmup, "mix": mix, "latency_ms": args.latency_ms,
+                   "payload_bytes": args.payload_bytes, "replicas": args.replicas, "router_args": args.router_arg},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "requests": len(all_latencies),
+        "errors": sum(data["errors"] for data in merged.values()),
+        "rps": round(len(all_latencies) / args.duration, 1),
+        "latency_ms": percentiles(all_latencies),
+        "by_type": {name: {"requests": len(data["latencies"]), "errors": data["errors"],
+                           "rps": round(len(data["latencies"]) / args.duration, 1), "latency_ms": percentiles(data["latencies"])}
+                    for name, data in merged.items()},
+        "router": {"cpu_seconds": round(cpu, 3) if cpu is not None else None,
+                   "cpu_percent": round(cpu / elapsed * 100, 1) if cpu is not None else None,
+                   "rss_mb_peak": round(stats.peak_rss / 2 ** 20, 1) if stats.peak_rss else None,
+                   "rss_mb_end": round(rss_end / 2 ** 20, 1) if rss_end else None},
+    }
+
+def _fmt(value, unit=""):
+    return "-" if value is None else f"{value}{unit}"
+
+def print_run(result: Dict[str, Any]):
+    lat, router = result["latency_ms"], result["router"]
+    print(f"== {result['label']}: {result['rps']} req/s, {result['requests']} requests, {result['errors']} errors")
+    print(f"   latency p50 {_fmt(lat['p50'], 'ms')}  p90 {_fmt(lat['p90'], 'ms')}  p99 {_fmt(lat['p99'], 'ms')}  max {_fmt(lat['max'], 'ms')}")
+    print(f"   router cpu {_fmt(router['cpu_percent'], '%')}  rss peak {_fmt(router['rss_mb_peak'], ' MiB')}")
+    for name, data in result["by_type"].items():
+        print(f"   {name:<9} {data['rps']:>9} req/s  p50 {_fmt(data['latency_ms']['p50'], 'ms'):>10}  "
+              f"p99 {_fmt(data['latency_ms']['p99'], 'ms'):>10}  errors {data['errors']}")
+
+# (label, path in a result, higher is better)
+COMPARED = [("req/s", ("rps",), True), ("p50 ms", ("latency_ms", "p50"), False), ("p99 ms", ("latency_ms", "p99"), False),
+            ("cpu %", ("router", "cpu_percent"), False), ("rss MiB", ("router", "rss_mb_peak"), False)]
+
+def compare(base: Dict[str, Any], other: Dict[str, Any]):
+    print(f"{'':<10}{base['label']:>16}{other['label']:>16}{'change':>10}")
+    for label, path, higher_better in COMPARED:
+        a, b = base, other
+        for key in path:
+            a, b = (a or {}).get(key), (b or {}).get(key)
+        change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "-"
+        print(f"{label:<10}{_fmt(a):>16}{_fmt(b):>16}{change:>10}")
+
+def load_runs(path: str) -> List[Dict[str, Any]]:
+    return json.loads(Path(path).read_text())["runs"]
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(prog="run_bench.py compare", description="Compare saved benchmark runs.")
+        parser.add_argument("files", nargs="+", help="One file with two or more runs, or two files (runs paired by order).")
+        args = parser.parse_args(sys.argv[2:])
+        if len(args.files) == 1:
+            runs = load_runs(args.files[0])
+            pairs = [(runs[0], run) for run in runs[1:]]
+        else:
+            pairs = list(zip(load_runs(args.files[0]), load_runs(args.files[1])))
+        if not pairs:
+            parser.error("nothing to compare")
+        for base, other in pairs:
+            compare(base, other)
+            print()
+        return
+
+    parser = argparse.ArgumentParser(description="Benchmark the MCP router against fake downstreams.")
+    parser.add_argument("--engine", default="threaded", help="Router engine(s) to run, comma separated (threaded, asyncio).")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent closed-loop clients, one connection each.")
+    parser.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1), help="Processes the clients are spread over.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per run.")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted request mix (default: {DEFAULT_MIX}).")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Latency of each fake downstream tool call.")
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="Size of each proxied tool result.")
+    parser.add_argument("--replicas", type=int, default=1, help="Replicas of the stdio downstream.")
+    parser.add_argument("--workers", type=int, default=32, help="Router --workers.")
+    parser.add_argument("--router-arg", action="append", default=[], help="Extra router.py argument (repeatable), e.g. --router-arg=--lazy-load.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the request mix.")
+    parser.add_argument("--label", help="Label of the run in the results (default: the engine).")
+    parser.add_argument("--out", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    runs = []
+    for engine in [e.strip() for e in args.engine.split(",") if e.strip()]:
+        result = run(args, engine)
+        print_run(result)
+        runs.append(result)
+    if args.out:
+        Path(args.out).write_text(json.dumps({"runs": runs}, indent=2))
+        print(f"Results written to {args.out}")
+    if len(runs) > 1:
+        print()
+        for other in runs[1:]:
+            compare(runs[0], other)
+
+if __name__ == "__main__":
+    main()
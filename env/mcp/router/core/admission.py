@@ -0,0 +1,133 @@
+# core/admission.py
+# Admission control for MCPServer: caps open connections, requests in flight (globally and per
+# connection) and requests waiting for a worker. Overflow is turned away at once with a retryable
+# "overloaded" error rather than queued without bound.
+import threading
+from typing import Any, Dict, Optional
+from .metrics import Metrics
+
+# Rejection reasons (the "reason" label of mcp_rejected_total) and their messages.
+REASONS = {
+    "connections": "too many open connections",
+    "in_flight": "too many requests in flight",
+    "connection_in_flight": "too many requests in flight on this connection",
+    "queue": "execution queue is full",
+}
+
+def overloaded_reply(reason: str) -> Dict[str, Any]:
+    """The error reply for a rejected request or connection; clients may retry it after a backoff."""
+    return {"error": f"overloaded: {REASONS[reason]}", "overloaded": True, "retryable": True, "reason": reason}
+
+class Connection:
+    """Per-connection admission state."""
+    __slots__ = ("in_flight",)
+
+    def __init__(self):
+        self.in_flight = 0
+
+class Admission:
+    def __init__(self, metrics: Metrics, workers: int, max_connections: Optional[int] = None,
+                 max_in_flight: Optional[int] = None, max_in_flight_per_conn: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        """
+        workers: size of the executor requests run on.
+        max_connections: open connections; more are answered with an overloaded error and closed.
+        max_in_flight / max_in_flight_per_conn: requests admitted and not yet answered.
+        max_queue: admitted requests waiting for a free worker.
+        None means no limit.
+        """
+        self.metrics = metrics
+        self.workers = workers
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_conn = max_in_flight_per_conn
+        self.max_queue = max_queue
+        self.connections = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.running = 0
+        self._lock = threading.Lock()
+        self._in_flight_gauge = metrics.gauge("mcp_requests_in_flight", "Requests admitted and not yet answered")
+        self._queue_gauge = metrics.gauge("mcp_queue_depth", "Admitted requests waiting for a worker")
+
+    def _reject(self, reason: str) -> str:
+        self.metrics.counter("mcp_rejected_total", "Connections and requests rejected as overloaded", reason=reason).inc()
+        return reason
+
+    def connect(self) -> Optional[Connection]:
+        """State for a new connection, or None if max_connections are already open."""
+        with self._lock:
+            if self.max_connections is not None and self.connections >= self.max_connections:
+                rejected = True
+            else:
+                rejected = False
+                self.connections += 1
+        if rejected:
+            self._reject("connections")
+            return None
+        return Connection()
+
+    def disconnect(self, conn: Connection):
+        with self._lock:
+            self.connections -= 1
+
+    def admit(self, conn: Connection, queued: bool = True, force: bool = False) -> Optional[str]:
+        """
+        Counts a request as in flight, or returns the reason it is rejected. queued: the request
+        waits for an executor worker (call start() when it gets one); otherwise it runs on the
+        caller's thread. force: admit even over the limits (for stats, so an overloaded server can
+        still be observed). Every admitted request must be released.
+        """
+        with self._lock:
+            reason = None
+            if not force:
+                if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+                    reason = "in_flight"
+                elif self.max_in_flight_per_conn is not None and conn.in_flight >= self.max_in_flight_per_conn:
+                    reason = "connection_in_flight"
+                elif queued and self.max_queue is not None and self.queued >= self.max_queue + max(0, self.workers - self.running):
+                    # Full only once every worker is busy and max_queue requests already wait.
+                    reason = "queue"
+            if reason is None:
+                self.in_flight += 1
+                conn.in_flight += 1
+                if queued:
+                    self.queued += 1
+        if reason is not None:
+            return self._reject(reason)
+        self._in_flight_gauge.inc()
+        if queued:
+            self._queue_gauge.inc()
+        return None
+
+    def start(self):
+        """A queued request got a worker."""
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        self._queue_gauge.dec()
+
+    def cancel(self, conn: Connection):
+        """A queued request was dropped before it got a worker."""
+        with self._lock:
+            self.queued -= 1
+            self.in_flight -= 1
+            conn.in_flight -= 1
+        self._queue_gauge.dec()
+        self._in_flight_gauge.dec()
+
+    def release(self, conn: Connection, queued: bool = True):
+        """A request admitted with admit(conn, queued) was answered (after start(), if queued)."""
+        with self._lock:
+            self.in_flight -= 1
+            conn.in_flight -= 1
+            if queued:
+                self.running -= 1
+        self._in_flight_gauge.dec()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"connections": self.connections, "in_flight": self.in_flight, "queued": self.queued,
+                    "running": self.running, "workers": self.workers, "max_connections": self.max_connections,
+                    "max_in_flight": self.max_in_flight, "max_in_flight_per_conn": self.max_in_flight_per_conn,
+                    "max_queue": self.max_queue}
@@ -0,0 +1,178 @@
+# core/async_server.py
+# asyncio serving engine for MCPServer: every connection runs on one event loop using
+# asyncio streams, while blocking request handling is pushed to the server's bounded executor.
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Optional
+from .admission import overloaded_reply
+from .codec import FrameTooLarge, JSON_LINES
+
+log = logging.getLogger(__name__)
+
+class AsyncioEngine:
+    def __init__(self, server):
+        """
+        server: the owning MCPServer; its registry, executor and request handling are shared
+        with the threaded engine so both can be compared under the same load.
+        """
+        self.server = server
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._aserver: Optional[asyncio.AbstractServer] = None
+        self._ready = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._conn_tasks = set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="mcp-asyncio", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._start_error:
+            raise self._start_error
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self._aserver = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_conn, self.server.host, self.server.port, backlog=self.server.backlog)
+            )
+        except Exception as e:
+            self._start_error = e
+            self._ready.set()
+            self.loop.close()
+            return
+        # Pick up the real port when bound to port 0.
+        self.server.port = self._aserver.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def stop(self):
+        if not self.loop or not self.loop.is_running():
+            return
+
+        async def _shutdown():
+            if self._aserver:
+                self._aserver.close()
+            for task in list(self._conn_tasks):
+                task.cancel()
+            await asyncio.gather(*self._conn_tasks, return_exceptions=True)
+            if self._aserver:
+                await self._aserver.wait_closed()
+            self.loop.stop()
+
+        asyncio.run_coroutine_threadsafe(_shutdown(), self.loop)
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    async def _handle_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info("peername")
+        server = self.server
+        admitted = server._connection_opened()
+        if admitted is None:
+            log.warning(f"Refusing connection from {addr}: {server.admission.connections} connections open")
+            await self._send(writer, JSON_LINES.encode_reply(overloaded_reply("connections")))
+            writer.close()
+            return
+        log.info(f"Connection from {addr}")
+        task = asyncio.current_task()
+        self._conn_tasks.add(task)
+        in_flight = set()
+        codec = JSON_LINES
+        frames = codec.frame_reader()
+        # One writer per connection, so its change subscription can be dropped when it closes.
+        send = functools.partial(self._send_from_thread, writer)
+        try:
+            while True:
+                try:
+                    frame = frames.next_frame()
+                except FrameTooLarge as e:
+                    log.error(f"Request from {addr} too large: {e}")
+                    break
+                if frame is None:
+                    chunk = await reader.read(65536)
+                    if not chunk:
+                        break
+                    frames.feed(chunk)
+                    continue
+                received = time.time_ns()
+                req, err = server._decode_frame(frame, codec, addr)
+                timing = (received, time.time_ns())
+                if req is None:
+                    await self._send(writer, codec.encode_reply(err))
+                elif req.get("type") == "hello":
+                    resp, new_codec = server._hello(req, codec, busy=bool(in_flight))
+                    await self._send(writer, codec.encode_reply(resp, req.get("id"), "id" in req))
+                    if new_codec is not codec:
+                        codec, frames = server._switch_codec(new_codec, frames)
+                else:
+                    rejected = server._admit(admitted, req, codec)
+                    if rejected:
+                        await self._send(writer, rejected)
+                    elif "id" in req:
+                        # Pipelined request: dispatch concurrently, the reply is tagged with its id.
+                        t = asyncio.create_task(self._dispatch(admitted, req, writer, codec, send, timing))
+                        in_flight.add(t)
+                        t.add_done_callback(in_flight.discard)
+                    else:
+                        await self._dispatch(admitted, req, writer, codec, send, timing)
+            # Let pipelined requests finish so a half-closed client still gets every reply.
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            for t in in_flight:
+                t.cancel()
+        finally:
+            self._conn_tasks.discard(task)
+            server.change_feed.unsubscribe(send)
+            server._connection_closed(admitted)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+            log.info(f"Connection from {addr} closed")
+
+    async def _dispatch(self, admitted, req, writer: asyncio.StreamWriter, codec, send, timing):
+        server = self.server
+        fut = server.executor.submit(server._reply_admitted, admitted, req, codec, send, timing)
+        try:
+            out = await asyncio.wrap_future(fut)
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                # Cancelled before a worker picked it up, so _reply_admitted never released it.
+                server.admission.cancel(admitted)
+            raise
+        await self._send(writer, out)
+
+    async def _send(self, writer: asyncio.StreamWriter, out: bytes) -> bool:
+        if writer.is_closing():
+            return False
+        writer.write(out)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            return False
+        return True
+
+    def _send_from_thread(self, writer: asyncio.StreamWriter, out: bytes) -> bool:
+        """Writes a progress frame from an executor thread. Waits for the drain, so a slow client
+        throttles the stream instead of buffering it."""
+        loop = self.loop
+        if loop is None or not loop.is_running():
+            return False
+        fut = asyncio.run_coroutine_threadsafe(self._send(writer, out), loop)
+        while True:
+            try:
+                return fut.result(timeout=1.0)
+            except FutureTimeout:
+                if not loop.is_running():
+                    fut.cancel()
+                    return False
@@ -0,0 +1,72 @@
+# core/change_feed.py
+# Pushes list_changed notifications to connections that subscribed to registry changes, so an
+# upstream router can fetch just the diff (list_diff) instead of listing everything again.
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+from .registry import MCPRegistry
+
+log = logging.getLogger(__name__)
+
+class ChangeFeed:
+    def __init__(self, registry: MCPRegistry, debounce: float = 0.05):
+        """debounce: how long to wait after a change for more before notifying, so a burst of
+        registry updates (e.g. a reload touching several modules) goes out as one notification."""
+        self.registry = registry
+        self.debounce = debounce
+        self._subscribers: Dict[Callable[[bytes], bool], List] = {}  # send -> [codec, last version notified]
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        registry.add_listener(self._on_change)
+
+    def _on_change(self, namespace: Optional[str]):
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def subscribe(self, send: Callable[[bytes], bool], codec) -> int:
+        """Notifies send (a connection's frame writer) of later changes, encoded with codec.
+        Returns the current registry version, the base of the first diff the subscriber asks for."""
+        with self._cond:
+            version = self.registry.version
+            self._subscribers[send] = [codec, version]
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+                self._thread.start()
+        return version
+
+    def unsubscribe(self, send: Callable[[bytes], bool]):
+        with self._cond:
+            self._subscribers.pop(send, None)
+
+    def subscribers(self) -> int:
+        with self._cond:
+            return len(self._subscribers)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty or self._stopped)
+                if self._cond.wait_for(lambda: self._stopped, self.debounce):
+                    return
+                self._dirty = False
+                version = self.registry.version
+                due = []
+                for send, entry in self._subscribers.items():
+                    if entry[1] != version:
+                        entry[1] = version
+                        due.append((send, entry[0]))
+            for send, codec in due:
+                if not send(codec.encode_reply({"type": "list_changed", "version": version})):
+                    log.debug("Dropping change subscriber on a closed connection")
+                    self.unsubscribe(send)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._subscribers.clear()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2.0)
@@ -0,0 +1,197 @@
+# core/codec.py
+# Wire codecs shared by MCPServer and the downstream clients. Every connection starts with
+# newline-delimited JSON; a "hello" handshake can switch both ends to length-prefixed frames.
+import json
+import struct
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional dependency, see requirements.txt
+    msgpack = None
+
+# Largest frame either side accepts.
+MAX_FRAME = 256 * 1024 * 1024
+
+class FrameTooLarge(ValueError):
+    pass
+
+class Encoded:
+    """A reply that is already JSON-encoded (a single object, without the trailing newline).
+    obj is the same reply as a Python object, for codecs that are not JSON."""
+    __slots__ = ("data", "obj")
+
+    def __init__(self, data: bytes, obj: Dict[str, Any]):
+        self.data = data
+        self.obj = obj
+
+class LineFrameReader:
+    """Incremental reader for newline-delimited frames. Partial frames are kept across reads and
+    only newly received bytes are scanned for the delimiter."""
+    def __init__(self, max_frame: int = MAX_FRAME):
+        self._buf = bytearray()
+        self._pos = 0       # start of the next unread frame
+        self._scanned = 0   # bytes already searched for a newline
+        self.max_frame = max_frame
+
+    def feed(self, data: bytes):
+        if self._pos and self._pos == len(self._buf):
+            self._buf.clear()
+            self._scanned = self._pos = 0
+        self._buf += data
+
+    def next_frame(self) -> Optional[bytes]:
+        buf = self._buf
+        i = buf.find(b"\n", max(self._scanned, self._pos))
+        if i < 0:
+            self._scanned = len(buf)
+            if len(buf) - self._pos > self.max_frame:
+                raise FrameTooLarge(f"frame exceeds {self.max_frame} bytes")
+            self._compact()
+            return None
+        frame = bytes(buf[self._pos:i])
+        self._pos = self._scanned = i + 1
+        return frame
+
+    def _compact(self):
+        if self._pos:
+            del self._buf[:self._pos]
+            self._scanned -= self._pos
+            self._pos = 0
+
+    def rest(self) -> bytes:
+        """Returns and forgets everything not consumed as a frame yet (used when switching codecs)."""
+        data = bytes(self._buf[self._pos:])
+        self._buf.clear()
+        self._pos = self._scanned = 0
+        return data
+
+    def pending_bytes(self) -> int:
+        return len(self._buf) - self._pos
+
+class LengthPrefixedFrameReader:
+    """Incremental reader for frames prefixed with their length as a 4-byte big-endian integer."""
+    def __init__(self, max_frame: int = MAX_FRAME):
+        self._buf = bytearray()
+        self._pos = 0
+        self.max_frame = max_frame
+
+    def feed(self, data: bytes):
+        if self._pos and self._pos == len(self._buf):
+            self._buf.clear()
+            self._pos = 0
+        self._buf += data
+
+    def next_frame(self) -> Optional[bytes]:
+        buf = self._buf
+        if len(buf) - self._pos < 4:
+            self._compact()
+            return None
+        (size,) = struct.unpack_from(">I", buf, self._pos)
+        if size > self.max_frame:
+            raise FrameTooLarge(f"frame of {size} bytes exceeds {self.max_frame} bytes")
+        end = self._pos + 4 + size
+        if len(buf) < end:
+            self._compact()
+            return None
+        frame = bytes(buf[self._pos + 4:end])
+        self._pos = end
+        return frame
+
+    def _compact(self):
+        if self._pos:
+            del self._buf[:self._pos]
+            self._pos = 0
+
+    def rest(self) -> bytes:
+        data = bytes(self._buf[self._pos:])
+        self._buf.clear()
+        self._pos = 0
+        return data
+
+    def pending_bytes(self) -> int:
+        return len(self._buf) - self._pos
+
+class JsonLinesCodec:
+    """Newline-delimited JSON: the default, and the fallback when negotiation fails."""
+    name = "json"
+
+    def frame_reader(self):
+        return LineFrameReader()
+
+    def decode(self, frame: bytes) -> Any:
+        return json.loads(frame.decode("utf-8"))
+
+    def encode(self, msg: Any) -> bytes:
+        if isinstance(msg, Encoded):
+            return msg.data + b"\n"
+        return json.dumps(msg).encode("utf-8") + b"\n"
+
+    def encode_reply(self, resp: Any, req_id: Any = None, tagged: bool = False) -> bytes:
+        """Encodes a reply, tagged with req_id when tagged is set."""
+        if not tagged:
+            return self.encode(resp)
+        if isinstance(resp, Encoded):
+            # Splice the id into the pre-encoded object instead of re-encoding it.
+            return b'{"id": ' + json.dumps(req_id).encode("utf-8") + b", " + resp.data[1:] + b"\n"
+        return self.encode({"id": req_id, **resp})
+
+class JsonFramesCodec(JsonLinesCodec):
+    """Length-prefixed JSON: no delimiter scanning, available without extra dependencies."""
+    name = "json-lp"
+
+    def frame_reader(self):
+        return LengthPrefixedFrameReader()
+
+    def encode(self, msg: Any) -> bytes:
+        payload = msg.data if isinstance(msg, Encoded) else json.dumps(msg).encode("utf-8")
+        return struct.pack(">I", len(payload)) + payload
+
+    def encode_reply(self, resp: Any, req_id: Any = None, tagged: bool = False) -> bytes:
+        if tagged and isinstance(resp, Encoded):
+            payload = b'{"id": ' + json.dumps(req_id).encode("utf-8") + b", " + resp.data[1:]
+            return struct.pack(">I", len(payload)) + payload
+        return self.encode({"id": req_id, **resp} if tagged else resp)
+
+class MsgpackCodec:
+    """Length-prefixed msgpack: no JSON escaping of large string payloads."""
+    name = "msgpack"
+
+    def frame_reader(self):
+        return LengthPrefixedFrameReader()
+
+    def decode(self, frame: bytes) -> Any:
+        return msgpack.unpackb(frame, raw=False)
+
+    def encode(self, msg: Any) -> bytes:
+        if isinstance(msg, Encoded):
+            msg = msg.obj
+        payload = msgpack.packb(msg, use_bin_type=True)
+        return struct.pack(">I", len(payload)) + payload
+
+    def encode_reply(self, resp: Any, req_id: Any = None, tagged: bool = False) -> bytes:
+        if isinstance(resp, Encoded):
+            resp = resp.obj
+        return self.encode({"id": req_id, **resp} if tagged else resp)
+
+JSON_LINES = JsonLinesCodec()
+
+# Supported codecs, most preferred first.
+CODECS: Dict[str, Any] = {}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+CODECS["json-lp"] = JsonFramesCodec()
+CODECS["json"] = JSON_LINES
+
+def supported_codecs() -> List[str]:
+    return list(CODECS)
+
+def choose_codec(offered) -> Any:
+    """Server side of the handshake: the first offered codec this side supports, else JSON lines."""
+    for name in offered or []:
+        if name in CODECS:
+            return CODECS[name]
+    return JSON_LINES
+
+def hello_request(codecs: Optional[List[str]] = None) -> Dict[str, Any]:
+    return {"type": "hello", "codecs": codecs if codecs is not None else supported_codecs()}
@@ -0,0 +1,187 @@
+# core/container_pool.py
+# Pool of pre-started, pre-handshaken downstream containers, so that connecting a docker downstream
+# claims one that is already listening instead of paying for docker run plus the server's startup.
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, Tuple[str, ...]]
+
+def pool_key(image: str, extra_args: Optional[List[str]] = None) -> PoolKey:
+    """Containers are interchangeable only if they were started from the same image and arguments."""
+    return image, tuple(extra_args or ())
+
+def _latency_summary(samples) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"count": len(ordered), "p50_ms": round(pick(0.50) * 1000, 2), "p95_ms": round(pick(0.95) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2)}
+
+class WarmContainerPool:
+    def __init__(self, launch: Callable[[str, List[str]], Any], destroy: Callable[[Any], None],
+                 alive: Optional[Callable[[Any], bool]] = None, size: int = 1, ttl: float = 600.0,
+                 retry_delay: float = 10.0, max_launches: int = 4):
+        """
+        launch(image, extra_args) starts and handshakes one instance (raising on failure),
+        destroy(instance) tears it down, alive(instance) tells whether an idle instance is still
+        usable. The pool keeps size idle instances per (image, extra_args) that was claimed or
+        prewarmed within the last ttl seconds, and destroys the idle instances of the others.
+        A failed launch is retried after retry_delay seconds. At most max_launches run at once.
+        """
+        if size < 1:
+            raise ValueError(f"size must be positive, got {size}")
+        self.launch = launch
+        self.destroy = destroy
+        self.alive = alive or (lambda instance: True)
+        self.size = size
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self._cond = threading.Condition()
+        self._idle: Dict[PoolKey, Deque[Any]] = {}
+        self._last_used: Dict[PoolKey, float] = {}
+        self._launching: Dict[PoolKey, int] = {}
+        self._retry_at: Dict[PoolKey, float] = {}
+        self._stopped = False
+        self._hits = 0
+        self._misses = 0
+        self._launched = 0
+        self._launch_failures = 0
+        self._reaped = 0
+        self._claim_latency: Deque[float] = deque(maxlen=1000)
+        self._cold_latency: Deque[float] = deque(maxlen=1000)
+        self._launcher = ThreadPoolExecutor(max_workers=max_launches, thread_name_prefix="warm-launch")
+        self._thread = threading.Thread(target=self._maintain, name="warm-pool", daemon=True)
+        self._thread.start()
+
+    def claim(self, image: str, extra_args: Optional[List[str]] = None) -> Optional[Any]:
+        """Takes an idle instance for image/extra_args, or returns None on a miss (the caller then
+        starts one itself). Either way the pool refills in the background."""
+        start = time.monotonic()
+        key = pool_key(image, extra_args)
+        dead = []
+        with self._cond:
+            self._last_used[key] = start
+            idle = self._idle.get(key)
+            instance = None
+            while idle:
+                candidate = idle.popleft()
+                if self.alive(candidate):
+                    instance = candidate
+                    break
+                dead.append(candidate)
+            if instance is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._claim_latency.append(time.monotonic() - start)
+            self._cond.notify_all()
+        self._destroy_all(dead, "dead")
+        return instance
+
+    def record_cold_start(self, seconds: float):
+        """Records how long a connect took after a miss, to compare with the claim latency of hits."""
+        with self._cond:
+            self._cold_latency.append(seconds)
+
+    def prewarm(self, image: str, extra_args: Optional[List[str]] = None):
+        """Starts filling the pool for image/extra_args before the first claim."""
+        with self._cond:
+            self._last_used[pool_key(image, extra_args)] = time.monotonic()
+            self._cond.notify_all()
+
+    def idle_count(self, image: str, extra_args: Optional[List[str]] = None) -> int:
+        with self._cond:
+            return len(self._idle.get(pool_key(image, extra_args), ()))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            claims = self._hits + self._misses
+            return {
+                "size": self.size,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / claims, 3) if claims else None,
+                "claim_latency": _latency_summary(self._claim_latency),
+                "cold_start_latency": _latency_summary(self._cold_latency),
+                "launched": self._launched,
+                "launch_failures": self._launch_failures,
+                "reaped": self._reaped,
+                "idle": {" ".join((image,) + args): len(q) for (image, args), q in self._idle.items() if q},
+            }
+
+    def _maintain(self):
+        # Wakes up on claims/prewarms, and periodically to reap idle keys.
+        interval = max(0.05, min(self.ttl / 4, 5.0))
+        while True:
+            reaped = []
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                for key, last_used in list(self._last_used.items()):
+                    if now - last_used > self.ttl:
+                        reaped.extend(self._idle.pop(key, ()))
+                        del self._last_used[key]
+                        continue
+                    missing = self.size - len(self._idle.get(key, ())) - self._launching.get(key, 0)
+                    if missing > 0 and now >= self._retry_at.get(key, 0.0):
+                        self._launching[key] = self._launching.get(key, 0) + missing
+                        for _ in range(missing):
+                            self._launcher.submit(self._fill, key)
+                self._reaped += len(reaped)
+            self._destroy_all(reaped, "idle past ttl")
+            with self._cond:
+                if not self._stopped:
+                    self._cond.wait(interval)
+
+    def _fill(self, key: PoolKey):
+        image, args = key
+        try:
+            instance = self.launch(image, list(args))
+        except Exception as e:
+            log.warning(f"Warm pool: failed to start '{image}': {e}")
+            with self._cond:
+                self._launching[key] -= 1
+                self._launch_failures += 1
+                self._retry_at[key] = time.monotonic() + self.retry_delay
+            return
+        with self._cond:
+            self._launching[key] -= 1
+            self._launched += 1
+            # The key may have gone cold, or the pool stopped, while this instance was starting.
+            keep = not self._stopped and key in self._last_used
+            if keep:
+                self._idle.setdefault(key, deque()).append(instance)
+                self._retry_at.pop(key, None)
+        if keep:
+            log.info(f"Warm pool: '{image}' instance ready ({self.idle_count(image, list(args))} idle)")
+        else:
+            self._destroy_all([instance], "no longer needed")
+
+    def _destroy_all(self, instances, why: str):
+        for instance in instances:
+            log.info(f"Warm pool: destroying instance ({why})")
+            try:
+                self.destroy(instance)
+            except Exception as e:
+                log.warning(f"Warm pool: failed to destroy instance: {e}")
+
+    def shutdown(self):
+        """Stops refilling and destroys every idle instance, waiting for launches in progress."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5.0)
+        self._launcher.shutdown(wait=True)
+        with self._cond:
+            idle = [instance for q in self._idle.values() for instance in q]
+            self._idle.clear()
+        self._destroy_all(idle, "pool shut down")
@@ -0,0 +1,101 @@
+# core/descriptor_cache.py
+# Persistent cache of the component descriptors (listing entries) each component module registered,
+# so a restarted router can list a module's components before importing it.
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "d8z-mcp-router" / "descriptors.json"
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+class DescriptorCache:
+    """
+    Maps a component file to the descriptors its module registered, e.g. {"tools": [{"name": ...}]}.
+    An entry is valid while the file's mtime and size are unchanged; when they changed but the
+    content hash did not (a touch, a checkout of the same revision), the entry is still used.
+    """
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_path()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable descriptor cache {self.path}: {e}")
+            return
+        if isinstance(data, dict) and data.get("version") == FORMAT_VERSION:
+            self._entries = data.get("files", {})
+
+    def lookup(self, py_file: Path) -> Optional[Dict[str, Any]]:
+        """Returns the cached descriptors of py_file if they are still valid, else None."""
+        key = str(py_file.resolve())
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            st = py_file.stat()
+            if (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size):
+                return entry["descriptors"]
+            if entry["sha256"] != file_digest(py_file):
+                return None
+        except (OSError, KeyError):
+            return None
+        with self._lock:
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            self._dirty = True
+        return entry["descriptors"]
+
+    def store(self, py_file: Path, descriptors: Dict[str, Any]):
+        """Records the descriptors a freshly imported py_file registered."""
+        try:
+            st = py_file.stat()
+            digest = file_digest(py_file)
+        except OSError:
+            return
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest, "descriptors": descriptors}
+        key = str(py_file.resolve())
+        with self._lock:
+            if self._entries.get(key) != entry:
+                self._entries[key] = entry
+                self._dirty = True
+
+    def forget(self, py_file: Path):
+        with self._lock:
+            if self._entries.pop(str(py_file.resolve()), None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Writes the cache if it changed. Failures (e.g. a read-only home) are logged and ignored."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"version": FORMAT_VERSION, "files": self._entries}, sort_keys=True)
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".descriptors-")
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            log.warning(f"Could not write descriptor cache {self.path}: {e}")
@@ -0,0 +1,357 @@
+# core/docker_api.py
+# Minimal Docker Engine API client: HTTP/1.1 over the daemon's unix socket with keep-alive
+# connections, so container operations do not fork and start the docker CLI every time.
+import http.client
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+
+class DockerAPIError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Docker API error {status}: {message}")
+        self.status = status
+        self.message = message
+
+class UnsupportedArgs(ValueError):
+    """docker run arguments run_config() cannot translate; callers fall back to the CLI."""
+
+def socket_path_from_env() -> Optional[str]:
+    """The daemon socket from DOCKER_HOST, or the default one. None when DOCKER_HOST is not a unix socket."""
+    host = os.environ.get("DOCKER_HOST", "")
+    if not host:
+        return DEFAULT_SOCKET
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return None
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float]):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        try:
+            s.connect(self._path)
+        except OSError:
+            s.close()
+            raise
+        self.sock = s
+
+def run_config(image: str, args: Optional[List[str]] = None, ports: Optional[Dict[int, int]] = None) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Translates `docker run [args] image` into (container name, create body). ports maps container
+    ports to host ports like -p. Supports -e/--env, -v/--volume, -l/--label, --name,
+    --network/--net and --rm; raises UnsupportedArgs for anything else.
+    """
+    env: List[str] = []
+    binds: List[str] = []
+    labels: Dict[str, str] = {}
+    name = network = None
+    auto_remove = False
+    it = iter(args or [])
+    for arg in it:
+        opt, eq, value = arg.partition("=") if arg.startswith("--") else (arg, "", "")
+        if opt == "--rm" and not eq:
+            auto_remove = True
+            continue
+        if opt not in ("-e", "--env", "-v", "--volume", "-l", "--label", "--name", "--network", "--net"):
+            raise UnsupportedArgs(f"unsupported docker run option: {arg}")
+        if not eq:
+            value = next(it, None)
+            if value is None:
+                raise UnsupportedArgs(f"{opt} needs a value")
+        if opt in ("-e", "--env"):
+            if "=" not in value:
+                # Like the CLI: a bare name passes the variable through from this environment.
+                if value not in os.environ:
+                    continue
+                value = f"{value}={os.environ[value]}"
+            env.append(value)
+        elif opt in ("-v", "--volume"):
+            binds.append(value)
+        elif opt in ("-l", "--label"):
+            key, _, label = value.partition("=")
+            labels[key] = label
+        elif opt == "--name":
+            name = value
+        else:
+            network = value
+    body: Dict[str, Any] = {"Image": image}
+    host_config: Dict[str, Any] = {}
+    if env:
+        body["Env"] = env
+    if labels:
+        body["Labels"] = labels
+    if ports:
+        body["ExposedPorts"] = {f"{cport}/tcp": {} for cport in ports}
+        host_config["PortBindings"] = {f"{cport}/tcp": [{"HostPort": str(hport)}] for cport, hport in ports.items()}
+    if binds:
+        host_config["Binds"] = binds
+    if network:
+        host_config["NetworkMode"] = network
+    if auto_remove:
+        host_config["AutoRemove"] = True
+    if host_config:
+        body["HostConfig"] = host_config
+    return name, body
+
+def _split_image(image: str) -> Tuple[str, str]:
+    repo, sep, tag = image.rpartition(":")
+    if not sep or "/" in tag:  # no tag, or the colon belongs to a registry host:port
+        return image, "latest"
+    return repo, tag
+
+def _error_message(data: bytes) -> str:
+    try:
+        return json.loads(data).get("message", "") or data.decode("utf-8", errors="replace")
+    except (ValueError, AttributeError):
+        return data.decode("utf-8", errors="replace").strip()
+
+def _read_exact(resp, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        more = resp.read(n - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+class DockerAPI:
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 30.0, max_idle: int = 4):
+        """Connections are opened on first use and kept alive for reuse, up to max_idle idle ones."""
+        self.socket_path = socket_path if socket_path is not None else socket_path_from_env()
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.connections_opened = 0
+        self._idle: List[_UnixHTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(self.socket_path) and os.path.exists(self.socket_path)
+
+    def _acquire(self) -> _UnixHTTPConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.connections_opened += 1
+        return _UnixHTTPConnection(self.socket_path, self.timeout)
+
+    def _release(self, conn: _UnixHTTPConnection, resp: http.client.HTTPResponse):
+        if not resp.will_close:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    def _open(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, body: Any = None,
+              timeout: Optional[float] = -1) -> Tuple[_UnixHTTPConnection, http.client.HTTPResponse]:
+        url = path + ("?" + urlencode(params, doseq=True) if params else "")
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        timeout = self.timeout if timeout == -1 else timeout
+        conn = self._acquire()
+        reused = conn.sock is not None
+        while True:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            try:
+                conn.request(method, url, body=data, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # The daemon closed an idle keep-alive connection: retry once on a new one.
+                reused = False
+                with self._lock:
+                    self.connections_opened += 1
+            except Exception:
+                conn.close()
+                raise
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, body: Any = None) -> Any:
+        """Sends one request and returns the decoded JSON (or raw bytes) body. Raises DockerAPIError for 4xx/5xx."""
+        conn, resp = self._open(method, path, params, body)
+        try:
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn, resp)
+        if resp.status >= 400:
+            raise DockerAPIError(resp.status, _error_message(data))
+        if data and (resp.getheader("Content-Type") or "").startswith("application/json"):
+            return json.loads(data)
+        return data
+
+    def ping(self) -> bool:
+        return self.request("GET", "/_ping") == b"OK"
+
+    def list_containers(self, filters: Optional[Dict[str, List[str]]] = None, all: bool = True) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {"all": int(all)}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return self.request("GET", "/containers/json", params)
+
+    def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return self.request("GET", f"/containers/{quote(container_id)}/json")
+
+    def pull_image(self, image: str):
+        repo, tag = _split_image(image)
+        log.info(f"Pulling image '{repo}:{tag}'")
+        conn, resp = self._open("POST", "/images/create", {"fromImage": repo, "tag": tag}, timeout=None)
+        try:
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn, resp)
+        if resp.status >= 400:
+            raise DockerAPIError(resp.status, _error_message(data))
+        # The body is a stream of JSON progress messages; a failure is reported in the last one.
+        lines = [line for line in data.splitlines() if line.strip()]
+        if lines and "error" in json.loads(lines[-1]):
+            raise DockerAPIError(500, json.loads(lines[-1])["error"])
+
+    def create_container(self, body: Dict[str, Any], name: Optional[str] = None) -> str:
+        return self.request("POST", "/containers/create", {"name": name} if name else None, body)["Id"]
+
+    def start_container(self, container_id: str):
+        self.request("POST", f"/containers/{quote(container_id)}/start")
+
+    def run_container(self, body: Dict[str, Any], name: Optional[str] = None) -> str:
+        """Like docker run -d: creates (pulling the image if it is missing) and starts a container. Returns its id."""
+        try:
+            container_id = self.create_container(body, name)
+        except DockerAPIError as e:
+            if e.status != 404:
+                raise
+            self.pull_image(body["Image"])
+            container_id = self.create_container(body, name)
+        try:
+            self.start_container(container_id)
+        except Exception:
+            self.remove_container(container_id)
+            raise
+        return container_id
+
+    def remove_container(self, container_id: str, force: bool = True) -> bool:
+        """Like docker rm -f. Returns False if there was no such container."""
+        try:
+            self.request("DELETE", f"/containers/{quote(container_id)}", {"force": int(force)})
+        except DockerAPIError as e:
+            if e.status == 404:
+                return False
+            raise
+        return True
+
+    def logs(self, container_id: str, tail: str = "all", follow: bool = False) -> Iterator[bytes]:
+        """Yields the container's stdout and stderr as they arrive. Closing the iterator ends a followed stream."""
+        tty = self.inspect_container(container_id).get("Config", {}).get("Tty", False)
+        params = {"stdout": 1, "stderr": 1, "tail": tail, "follow": int(follow)}
+        conn, resp = self._open("GET", f"/containers/{quote(container_id)}/logs", params,
+                                timeout=None if follow else self.timeout)
+        if resp.status >= 400:
+            data = resp.read()
+            self._release(conn, resp)
+            raise DockerAPIError(resp.status, _error_message(data))
+        return self._log_chunks(conn, resp, tty)
+
+    def _log_chunks(self, conn, resp, tty: bool) -> Iterator[bytes]:
+        finished = False
+        try:
+            if tty:
+                while True:
+                    data = resp.read1(65536)
+                    if not data:
+                        break
+                    yield data
+            else:
+                # Without a TTY, stdout and stderr are multiplexed in frames with an 8-byte header.
+                while True:
+                    header = _read_exact(resp, 8)
+                    if len(header) < 8:
+                        break
+                    _stream, size = struct.unpack(">BxxxL", header)
+                    yield _read_exact(resp, size)
+            finished = True
+        finally:
+            if finished:
+                self._release(conn, resp)
+            else:
+                conn.close()
+
+    def events(self, since: Optional[float] = None, filters: Optional[Dict[str, List[str]]] = None) -> "EventStream":
+        """Subscribes to the daemon's event stream (replaying events after the unix time since)."""
+        params: Dict[str, Any] = {}
+        if since is not None:
+            params["since"] = f"{since:.9f}"
+        if filters:
+            params["filters"] = json.dumps(filters)
+        conn, resp = self._open("GET", "/events", params, timeout=None)
+        if resp.status >= 400:
+            data = resp.read()
+            conn.close()
+            raise DockerAPIError(resp.status, _error_message(data))
+        return EventStream(conn, resp)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+class EventStream:
+    """Iterates the decoded events of an /events response. close() may be called from another
+    thread to end an iteration that is blocked waiting for the next event."""
+
+    def __init__(self, conn: _UnixHTTPConnection, resp: http.client.HTTPResponse):
+        self._conn = conn
+        self._resp = resp
+        self._iterating = False
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._iterating = True
+        try:
+            for line in iter(self._resp.readline, b""):
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            self._iterating = False
+            self._conn.close()
+
+    def close(self):
+        if not self._iterating:
+            self._conn.close()
+            return
+        # Only wake the reader up: it closes the connection itself when its read fails.
+        sock = self._conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+_default_client: Optional[DockerAPI] = None
+_default_lock = threading.Lock()
+
+def default_client() -> DockerAPI:
+    """The process-wide client for the daemon in DOCKER_HOST (or the default socket)."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = DockerAPI()
+        return _default_client
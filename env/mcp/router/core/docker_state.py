@@ -0,0 +1,202 @@
+# core/docker_state.py
+# In-memory table of docker compose service states, kept current from one subscription to the
+# Docker events stream, so tools can wait for a state change instead of polling `docker compose ps`.
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .docker_api import DockerAPI, DockerAPIError, EventStream, default_client
+from .readiness import backoff_delays
+
+log = logging.getLogger(__name__)
+
+SERVICE_LABEL = "com.docker.compose.service"
+PROJECT_LABEL = "com.docker.compose.project"
+
+# Container event actions that change the state reported for a service.
+_ACTION_STATES = {"create": "created", "start": "running", "restart": "running", "unpause": "running",
+                  "pause": "paused", "die": "exited"}
+
+def _exit_code(status: str) -> Optional[int]:
+    # The container list only reports it inside the human-readable status, e.g. "Exited (1) 2 minutes ago".
+    match = re.match(r"Exited \((-?\d+)\)", status)
+    return int(match.group(1)) if match else None
+
+class ServiceStateTracker:
+    def __init__(self, api: DockerAPI, project: Optional[str] = None):
+        """Tracks the containers of compose services (of one compose project, if given)."""
+        self.api = api
+        self.project = project
+        self.connected = False
+        self._containers: Dict[str, Dict[str, Any]] = {}  # container id -> state
+        self._seq = 0  # bumped on every state change; each state records its own as "seq"
+        self._cond = threading.Condition()
+        self._stream: Optional[EventStream] = None
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _labels(self):
+        labels = [SERVICE_LABEL]
+        if self.project:
+            labels.append(f"{PROJECT_LABEL}={self.project}")
+        return labels
+
+    def start(self):
+        """Loads the current states, then follows the events stream on a background thread."""
+        since = self._resync()
+        self._thread = threading.Thread(target=self._run, args=(since,), name="docker-events", daemon=True)
+        self._thread.start()
+
+    def _resync(self) -> float:
+        # Events are replayed from a little before the snapshot, so nothing in between is missed;
+        # replaying an event the snapshot already reflects ends in the same state.
+        since = time.time() - 1.0
+        containers = self.api.list_containers({"label": self._labels()})
+        with self._cond:
+            previous = self._containers
+            self._containers = {}
+            for c in containers:
+                labels = c.get("Labels") or {}
+                old = previous.get(c["Id"], {})
+                state = {"service": labels.get(SERVICE_LABEL), "container_id": c["Id"],
+                         "name": (c.get("Names") or ["/"])[0].lstrip("/"), "state": c.get("State", "").lower(),
+                         "exit_code": _exit_code(c.get("Status", "")), "health": None,
+                         "restarts": old.get("restarts", 0), "updated": time.time()}
+                if old.get("state") == state["state"]:
+                    state["seq"] = old["seq"]
+                else:
+                    self._seq += 1
+                    state["seq"] = self._seq
+                self._containers[c["Id"]] = state
+            self._cond.notify_all()
+        return since
+
+    def _run(self, since: float):
+        delays = backoff_delays(initial=0.5, max_delay=30.0)
+        while not self._stopped:
+            try:
+                stream = self.api.events(since=since, filters={"type": ["container"], "label": self._labels()})
+                with self._cond:
+                    if self._stopped:
+                        stream.close()
+                        return
+                    self._stream = stream
+                self.connected = True
+                delays = backoff_delays(initial=0.5, max_delay=30.0)
+                for event in stream:
+                    self.apply_event(event)
+            except (OSError, ValueError, DockerAPIError) as e:
+                if not self._stopped:
+                    log.warning(f"Docker events stream failed: {e}")
+            self.connected = False
+            with self._cond:
+                if self._cond.wait_for(lambda: self._stopped, next(delays)):
+                    return
+            try:
+                since = self._resync()
+            except (OSError, ValueError, DockerAPIError) as e:
+                log.warning(f"Docker state resync failed: {e}")
+
+    def apply_event(self, event: Dict[str, Any]):
+        """Updates the table from one container event of the Docker events stream."""
+        if event.get("Type") != "container":
+            return
+        actor = event.get("Actor") or {}
+        attributes = actor.get("Attributes") or {}
+        service = attributes.get(SERVICE_LABEL)
+        cid = actor.get("ID") or event.get("id")
+        action = event.get("Action") or event.get("status") or ""
+        if not service or not cid:
+            return
+        with self._cond:
+            if action == "destroy":
+                self._containers.pop(cid, None)
+                self._cond.notify_all()
+                return
+            state = self._containers.setdefault(cid, {
+                "service": service, "container_id": cid, "name": attributes.get("name", ""), "state": "created",
+                "exit_code": None, "health": None, "restarts": 0, "updated": time.time(), "seq": 0})
+            if action.startswith("health_status:"):
+                state["health"] = action.split(":", 1)[1].strip()
+            elif action in _ACTION_STATES:
+                new_state = _ACTION_STATES[action]
+                if new_state == "running" and state["state"] == "exited":
+                    state["restarts"] += 1
+                state["state"] = new_state
+                if action == "die":
+                    state["exit_code"] = int(attributes.get("exitCode", 0))
+                    state["health"] = None
+                elif action == "start":
+                    state["exit_code"] = None
+            else:
+                return
+            state["updated"] = event.get("timeNano", 0) / 1e9 or time.time()
+            self._seq += 1
+            state["seq"] = self._seq
+            self._cond.notify_all()
+
+    def _service_locked(self, service: str, container_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # A scaled or recreated service has several containers: report the most recently changed one.
+        candidates = [c for c in self._containers.values()
+                      if c["service"] == service and (container_id is None or c["container_id"] == container_id)]
+        return dict(max(candidates, key=lambda c: c["updated"])) if candidates else None
+
+    def service(self, service: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            return self._service_locked(service)
+
+    def services(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            return {name: self._service_locked(name) for name in sorted({c["service"] for c in self._containers.values()})}
+
+    def mark(self) -> int:
+        """A marker for "now": states changed later have a "seq" greater than it."""
+        with self._cond:
+            return self._seq
+
+    def wait_for(self, service: str, predicate: Callable[[Optional[Dict[str, Any]]], bool], timeout: float,
+                 container_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Blocks until predicate(state of service) is true or timeout passes; returns the last state seen.
+        container_id: only consider that container of the service."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                state = self._service_locked(service, container_id)
+                remaining = deadline - time.monotonic()
+                if predicate(state) or remaining <= 0 or self._stopped:
+                    return state
+                self._cond.wait(remaining)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            stream, self._stream = self._stream, None
+            self._cond.notify_all()
+        if stream:
+            stream.close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+
+_default_tracker: Optional[ServiceStateTracker] = None
+_default_lock = threading.Lock()
+
+def default_tracker() -> Optional[ServiceStateTracker]:
+    """The shared tracker for the default Docker client, started on first use (project from
+    COMPOSE_PROJECT_NAME). None when the daemon socket is not reachable."""
+    global _default_tracker
+    with _default_lock:
+        if _default_tracker is None or _default_tracker._stopped:
+            api = default_client()
+            if not api.available():
+                return None
+            tracker = ServiceStateTracker(api, project=os.environ.get("COMPOSE_PROJECT_NAME") or None)
+            try:
+                tracker.start()
+            except (OSError, DockerAPIError) as e:
+                log.warning(f"Docker state tracking unavailable: {e}")
+                return None
+            _default_tracker = tracker
+        return _default_tracker
@@ -0,0 +1,82 @@
+# core/downstream_config.py
+# Declarative list of downstreams to connect at startup (router.py --downstreams config.yaml).
+import shlex
+from pathlib import Path
+from typing import Any, Dict
+
+DOWNSTREAM_TYPES = ("local", "tcp", "docker")
+DEFAULT_PARALLELISM = 8
+DEFAULT_TIMEOUT = 30.0
+
+def load_downstream_config(path) -> Dict[str, Any]:
+    """
+    Reads a YAML (or JSON) file such as
+
+        parallelism: 8        # downstreams connected at the same time
+        timeout: 30           # default seconds per downstream
+        downstreams:
+          - {name: analytics, type: local, cmd: ["python", "analytics_mcp.py", "--stdio"], replicas: 2}
+          - {name: github, type: tcp, host: github, port: 3456, timeout: 5}
+          - {name: search, type: docker, image: "myorg/search:latest", extra_args: ["--env", "X=1"]}
+
+    and returns it normalized. Raises ValueError for invalid entries.
+    """
+    import yaml  # PyYAML, see requirements.txt; only needed when a config file is used
+
+    data = yaml.safe_load(Path(path).read_text()) or {}
+    if isinstance(data, list):
+        data = {"downstreams": data}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping with a 'downstreams' list")
+    config = {
+        "parallelism": _positive(data.get("parallelism", DEFAULT_PARALLELISM), "parallelism", int),
+        "timeout": _positive(data.get("timeout", DEFAULT_TIMEOUT), "timeout", float),
+        "downstreams": [],
+    }
+    seen = set()
+    for i, entry in enumerate(data.get("downstreams") or []):
+        spec = _normalize(entry, i, config["timeout"])
+        if spec["name"] in seen:
+            raise ValueError(f"downstream #{i}: duplicate name '{spec['name']}'")
+        seen.add(spec["name"])
+        config["downstreams"].append(spec)
+    return config
+
+def _positive(value, what: str, kind):
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a number, got {value!r}")
+    if value <= 0:
+        raise ValueError(f"{what} must be positive, got {value}")
+    return value
+
+def _normalize(entry, index: int, default_timeout: float) -> Dict[str, Any]:
+    if not isinstance(entry, dict):
+        raise ValueError(f"downstream #{index}: expected a mapping, got {entry!r}")
+    name = entry.get("name")
+    if not name or not isinstance(name, str):
+        raise ValueError(f"downstream #{index}: 'name' is required")
+    kind = entry.get("type")
+    if kind not in DOWNSTREAM_TYPES:
+        raise ValueError(f"downstream '{name}': 'type' must be one of {DOWNSTREAM_TYPES}, got {kind!r}")
+    spec = {"name": name, "type": kind, "timeout": _positive(entry.get("timeout", default_timeout), f"downstream '{name}': timeout", float)}
+    if kind == "local":
+        cmd = entry.get("cmd")
+        if isinstance(cmd, str):
+            cmd = shlex.split(cmd)
+        if not cmd or not isinstance(cmd, list):
+            raise ValueError(f"downstream '{name}': 'cmd' is required for local downstreams")
+        spec["cmd"] = [str(c) for c in cmd]
+        spec["replicas"] = _positive(entry.get("replicas", 1), f"downstream '{name}': replicas", int)
+    elif kind == "tcp":
+        if not entry.get("host") or "port" not in entry:
+            raise ValueError(f"downstream '{name}': 'host' and 'port' are required for tcp downstreams")
+        spec["host"] = str(entry["host"])
+        spec["port"] = _positive(entry["port"], f"downstream '{name}': port", int)
+    else:
+        if not entry.get("image"):
+            raise ValueError(f"downstream '{name}': 'image' is required for docker downstreams")
+        spec["image"] = str(entry["image"])
+        spec["extra_args"] = [str(a) for a in entry.get("extra_args") or []]
+    return spec
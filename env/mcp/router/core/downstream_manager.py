@@ -4,10 +4,16 @@ import socket
 import subprocess
 import time
 import json
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
 from .stdio_client import StdioMCPClient
 from .tcp_client import TCPMCPClient
+from .replica_pool import StdioReplicaPool
 from .registry import MCPRegistry
+from .proxy import downstream_namespace
+from .readiness import Readiness
+from .container_pool import WarmContainerPool
+from .docker_api import DockerAPI, DockerAPIError, UnsupportedArgs, default_client, run_config
 
 log = logging.getLogger(__name__)
 
@@ -18,43 +24,54 @@ def _find_free_port():
     s.close()
     return port
 
+class _WarmContainer:
+    """A pooled container and its connected, not yet registered, client."""
+    __slots__ = ("container_id", "client")
+
+    def __init__(self, container_id: str, client: TCPMCPClient):
+        self.container_id = container_id
+        self.client = client
+
 class DownstreamManager:
-    def __init__(self, registry: MCPRegistry):
+    def __init__(self, registry: MCPRegistry, docker: Optional[DockerAPI] = None):
         self.registry = registry
+        # Engine API client for container operations; the docker CLI is the fallback.
+        self.docker = docker or default_client()
         # keyed by name
-        self._local_clients: Dict[str, StdioMCPClient] = {}
+        self._local_clients: Dict[str, Union[StdioMCPClient, StdioReplicaPool]] = {}
         self._tcp_clients: Dict[str, TCPMCPClient] = {}
         self._docker_containers: Dict[str, str] = {}  # name -> container id
+        self._readiness: Dict[str, Readiness] = {}  # name -> how long it took to become ready
+        self._warm_pool: Optional[WarmContainerPool] = None  # see enable_warm_pool()
 
-    def connect_local(self, name: str, cmd: list):
-        log.info(f"Connecting to local downstream '{name}'")
+    def connect_local(self, name: str, cmd: list, replicas: int = 1, timeout: float = 10.0):
+        """Starts cmd as a stdio downstream. With replicas > 1, N copies share one set of
+        prefixed proxies and calls are balanced across them. timeout bounds the handshake."""
+        log.info(f"Connecting to local downstream '{name}' ({replicas} replica(s))")
         prefix = f"{name.upper()}_"
-        client = StdioMCPClient(name=name, cmd=cmd, registry=self.registry, prefix=prefix)
-        client.start()
+        if replicas > 1:
+            client = StdioReplicaPool(name=name, cmd=cmd, registry=self.registry, prefix=prefix, replicas=replicas)
+        else:
+            client = StdioMCPClient(name=name, cmd=cmd, registry=self.registry, prefix=prefix)
+        client.start(timeout=timeout)
         self._local_clients[name] = client
+        if client.readiness is not None:
+            self._readiness[name] = client.readiness
         return client
 
     def disconnect_local(self, name: str):
         log.info(f"Disconnecting local downstream '{name}'")
         client = self._local_clients.pop(name, None)
+        self._readiness.pop(name, None)
         if client:
             client.stop()
-            # remove registered objects with prefix
-            pref = f"{name.upper()}_"
-            for t in list(self.registry.list_tools()):
-                if t.startswith(pref):
-                    self.registry.remove_tool(t)
-            for r in list(self.registry.list_resources()):
-                if r.startswith(pref):
-                    self.registry.remove_resource(r)
-            for a in list(self.registry.list_agents()):
-                if a.startswith(pref):
-                    self.registry.remove_agent(a)
+            # remove everything the downstream registered in one atomic update
+            self.registry.remove_namespace(downstream_namespace(name))
             return True
         return False
 
-    def connect_service(self, name: str, host: str, port: int):
-        """Connects to a pre-existing service via TCP."""
+    def connect_service(self, name: str, host: str, port: int, timeout: float = 5.0):
+        """Connects to a pre-existing service via TCP, retrying until it answers or timeout passes."""
         log.info(f"Connecting to existing service '{name}' at {host}:{port}")
         if name in self._tcp_clients:
             log.warning(f"Service '{name}' is already connected.")
@@ -62,61 +79,196 @@ class DownstreamManager:
 
         prefix = f"{name.upper()}_"
         client = TCPMCPClient(name=name, host=host, port=port, registry=self.registry, prefix=prefix)
-        client.connect()
+        self._readiness[name] = client.connect_when_ready(timeout=timeout)
         self._tcp_clients[name] = client
         return client
 
-    def connect_remote_docker(self, name: str, image: str, extra_args: Optional[list] = None):
+    def enable_warm_pool(self, size: int = 1, ttl: float = 600.0, timeout: float = 60.0) -> WarmContainerPool:
         """
-        Launch docker container mapping a free host port (hostport) to container:3456,
-        then connect via TCP to hostport.
+        Keeps size started and handshaken containers per image (and extra_args) that was connected
+        within the last ttl seconds, so that connect_remote_docker only has to claim one. timeout
+        bounds starting each warm container.
         """
-        log.info(f"Connecting to remote downstream '{name}' with image '{image}'")
+        if self._warm_pool is None:
+            log.info(f"Enabling warm container pool (size {size}, ttl {ttl}s)")
+            self._warm_pool = WarmContainerPool(
+                launch=lambda image, extra_args: self._launch_warm(image, extra_args, timeout),
+                destroy=self._destroy_warm, alive=lambda warm: warm.client.is_connected(), size=size, ttl=ttl)
+        return self._warm_pool
+
+    def prewarm(self, image: str, extra_args: Optional[list] = None):
+        """Starts warming containers for image before it is first connected."""
+        if self._warm_pool is None:
+            raise RuntimeError("the warm container pool is not enabled")
+        self._warm_pool.prewarm(image, extra_args)
+
+    def warm_pool_stats(self) -> Optional[Dict[str, Any]]:
+        return self._warm_pool.stats() if self._warm_pool else None
+
+    def close_warm_pool(self):
+        pool, self._warm_pool = self._warm_pool, None
+        if pool:
+            pool.shutdown()
+
+    def _start_container(self, image: str, extra_args: Optional[list], timeout: float):
+        """docker run -d with a free host port published to container:3456. Returns (container id, host port).
+        Goes through the Engine API socket when possible, else the docker CLI."""
         host_port = _find_free_port()
+        if self.docker.available():
+            try:
+                container_name, body = run_config(image, extra_args, ports={3456: host_port})
+            except UnsupportedArgs as e:
+                log.info(f"{e}; starting '{image}' with the docker CLI")
+            else:
+                try:
+                    return self.docker.run_container(body, name=container_name), host_port
+                except OSError as e:
+                    log.warning(f"Docker API unreachable ({e}); starting '{image}' with the docker CLI")
         # build docker run command
         args = ["docker", "run", "-d", "-p", f"{host_port}:3456"]
         if extra_args:
             args += extra_args
         args += [image]
         log.info(f"Running command: {' '.join(args)}")
-        proc = subprocess.run(args, capture_output=True, text=True)
+        proc = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
         if proc.returncode != 0:
             log.error(f"Docker run failed for image '{image}': {proc.stderr}")
             raise RuntimeError(f"docker run failed: {proc.stderr}")
-        container_id = proc.stdout.strip()
-        log.info(f"Container '{container_id}' started for downstream '{name}'")
-        # wait briefly for container to start
-        time.sleep(1.0)
+        return proc.stdout.strip(), host_port
+
+    def _remove_container(self, container_id: str):
+        if self.docker.available():
+            try:
+                self.docker.remove_container(container_id)
+                return
+            except (OSError, DockerAPIError) as e:
+                log.warning(f"Docker API remove of '{container_id}' failed ({e}); using the docker CLI")
+        subprocess.run(["docker", "rm", "-f", container_id])
+
+    def _launch_warm(self, image: str, extra_args: List[str], timeout: float) -> "_WarmContainer":
+        """Starts a container for the pool and completes the handshake, without registering proxies."""
+        deadline = time.monotonic() + timeout
+        container_id, host_port = self._start_container(image, extra_args, timeout)
+        client = TCPMCPClient(name=f"warm-{container_id[:12]}", host="127.0.0.1", port=host_port, registry=self.registry, prefix="")
+        try:
+            client.connect_when_ready(timeout=max(deadline - time.monotonic(), 0.1), register=False)
+            if client.capabilities is None:
+                raise ConnectionError(f"no capabilities from warm container of '{image}'")
+        except Exception:
+            client.close()
+            self._remove_container(container_id)
+            raise
+        return _WarmContainer(container_id, client)
+
+    def _destroy_warm(self, warm: "_WarmContainer"):
+        warm.client.close()
+        self._remove_container(warm.container_id)
+
+    def connect_remote_docker(self, name: str, image: str, extra_args: Optional[list] = None, timeout: float = 60.0):
+        """
+        Launch docker container mapping a free host port (hostport) to container:3456,
+        then connect via TCP to hostport. timeout bounds docker run plus the connection.
+        With the warm pool enabled, an idle pre-handshaken container is claimed instead when available.
+        """
+        began = time.monotonic()
+        deadline = began + timeout
+        log.info(f"Connecting to remote downstream '{name}' with image '{image}'")
         prefix = f"{name.upper()}_"
+        warm = self._warm_pool.claim(image, extra_args) if self._warm_pool else None
+        if warm is not None:
+            container_id, client = warm.container_id, warm.client
+            log.info(f"Claimed warm container '{container_id}' for downstream '{name}'")
+            client.name, client.prefix = name, prefix
+            self._docker_containers[name] = container_id
+            client.register_capabilities()
+            self._readiness[name] = Readiness(time.monotonic() - began, 0)
+            self._tcp_clients[name] = client
+            return container_id, client
+        container_id, host_port = self._start_container(image, extra_args, timeout)
+        log.info(f"Container '{container_id}' started for downstream '{name}'")
         client = TCPMCPClient(name=name, host="127.0.0.1", port=host_port, registry=self.registry, prefix=prefix)
-        client.connect()
-        self._tcp_clients[name] = client
         self._docker_containers[name] = container_id
+        # The published port accepts connections before the server inside listens: probe the handshake.
+        self._readiness[name] = client.connect_when_ready(timeout=max(deadline - time.monotonic(), 0.1))
+        self._tcp_clients[name] = client
+        if self._warm_pool:
+            self._warm_pool.record_cold_start(time.monotonic() - began)
         return container_id, client
 
     def disconnect_remote(self, name: str):
         log.info(f"Disconnecting remote downstream '{name}'")
         client = self._tcp_clients.pop(name, None)
         cid = self._docker_containers.pop(name, None)
+        self._readiness.pop(name, None)
         if client:
             client.close()
-        # remove prefixed registry entries
-        pref = f"{name.upper()}_"
-        for t in list(self.registry.list_tools()):
-            if t.startswith(pref):
-                self.registry.remove_tool(t)
-        for r in list(self.registry.list_resources()):
-            if r.startswith(pref):
-                self.registry.remove_resource(r)
-        for a in list(self.registry.list_agents()):
-            if a.startswith(pref):
-                self.registry.remove_agent(a)
+        # remove everything the downstream registered in one atomic update
+        self.registry.remove_namespace(downstream_namespace(name))
         if cid:
             log.info(f"Removing container '{cid}' for downstream '{name}'")
-            subprocess.run(["docker", "rm", "-f", cid])
+            self._remove_container(cid)
             return True
         return False
 
+    def connect_all(self, specs: List[Dict[str, Any]], parallelism: int = 8) -> Dict[str, Any]:
+        """
+        Connects the downstreams described by specs (see core/downstream_config.py), up to
+        parallelism at a time. Each spec's timeout bounds its own handshake. A downstream that fails
+        does not stop the others. Returns a report with the ready and failed downstreams, the time
+        each took and the total time until all were settled.
+        """
+        start = time.monotonic()
+        timings: Dict[str, float] = {}
+        failed: Dict[str, str] = {}
+
+        def connect(spec):
+            began = time.monotonic()
+            try:
+                self._connect_spec(spec)
+            except Exception as e:
+                log.error(f"Failed to connect downstream '{spec['name']}': {e}")
+                failed[spec["name"]] = str(e) or type(e).__name__
+            finally:
+                timings[spec["name"]] = round(time.monotonic() - began, 3)
+
+        if specs:
+            with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(specs))), thread_name_prefix="connect") as pool:
+                list(pool.map(connect, specs))
+        total = round(time.monotonic() - start, 3)
+        ready = [s["name"] for s in specs if s["name"] not in failed]
+        log.info(f"{len(ready)}/{len(specs)} downstreams ready in {total:.2f}s"
+                 + (f" (slowest: {max(timings, key=timings.get)} {max(timings.values()):.2f}s)" if timings else ""))
+        return {"ready": ready, "failed": failed, "timings": timings, "total_seconds": total,
+                "readiness": {n: r for n, r in self.readiness().items() if n in ready}}
+
+    def _connect_spec(self, spec: Dict[str, Any]):
+        name, kind, timeout = spec["name"], spec["type"], spec.get("timeout", 30.0)
+        if kind == "local":
+            client = self.connect_local(name, spec["cmd"], replicas=spec.get("replicas", 1), timeout=timeout)
+            if client.capabilities is None:
+                self.disconnect_local(name)
+                raise ConnectionError(f"no capabilities from '{name}' within {timeout}s")
+        elif kind == "tcp":
+            client = self.connect_service(name, spec["host"], spec["port"], timeout=timeout)
+            if client.capabilities is None:
+                self.disconnect_remote(name)
+                raise ConnectionError(f"no capabilities from '{name}' within {timeout}s")
+        elif kind == "docker":
+            try:
+                _, client = self.connect_remote_docker(name, spec["image"], extra_args=spec.get("extra_args"), timeout=timeout)
+            except Exception:
+                self.disconnect_remote(name)
+                raise
+            if client.capabilities is None:
+                self.disconnect_remote(name)
+                raise ConnectionError(f"no capabilities from '{name}' within {timeout}s")
+        else:
+            raise ValueError(f"unknown downstream type: {kind}")
+
+    def readiness(self) -> Dict[str, Dict[str, Any]]:
+        """Time to ready (and number of probes) of each connected downstream."""
+        return {name: r.as_dict() for name, r in self._readiness.items()}
+
     def list_downstreams(self):
         return {
             "local": list(self._local_clients.keys()),
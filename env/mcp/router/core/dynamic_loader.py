@@ -1,18 +1,51 @@
+import ast
 import logging
 import importlib
 import importlib.util
 import sys
-import time
 import threading
+import time
 from pathlib import Path
+from typing import Any, Dict, Optional, Set
 
-from .registry import MCPRegistry
+from .registry import MCPRegistry, Tool, Resource, Agent, describe_component
+from .descriptor_cache import DescriptorCache
 from .downstream_manager import DownstreamManager
+from .file_watcher import FileWatcher
 
 log = logging.getLogger(__name__)
 
+def module_namespace(module_name: str) -> str:
+    """Registry namespace that owns the components registered by a dynamically loaded module."""
+    return f"module:{module_name}"
+
+def read_manifest(py_file: Path) -> Optional[Dict[str, Any]]:
+    """
+    Returns the module-level MANIFEST literal of a component file without importing it, or None if
+    it has none. A manifest lists the components a module registers, keyed by kind, e.g.
+    {"tools": [{"name": "X_run", "description": "...", "parameters": [...], "cacheable": True}]}
+    """
+    tree = ast.parse(py_file.read_bytes(), filename=str(py_file))
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets = [node.target]
+        else:
+            continue
+        if any(isinstance(t, ast.Name) and t.id == "MANIFEST" for t in targets):
+            return ast.literal_eval(node.value)
+    return None
+
 class DynamicLoader:
-    def __init__(self, registry: MCPRegistry, downstream_manager: DownstreamManager, tools_dir: Path, resources_dir: Path, agents_dir: Path):
+    def __init__(self, registry: MCPRegistry, downstream_manager: DownstreamManager, tools_dir: Path, resources_dir: Path, agents_dir: Path,
+                 lazy: bool = False, descriptor_cache: Optional[DescriptorCache] = None):
+        """
+        lazy: modules that declare a MANIFEST, or whose descriptors are in descriptor_cache from an
+        earlier run, are not imported at startup; stub components built from those descriptors are
+        registered instead, and the module is imported on the first call to any of them.
+        descriptor_cache: records the descriptors of every imported module for later lazy starts.
+        """
         self.registry = registry
         self.downstream_manager = downstream_manager
         self.tools_dir = tools_dir
@@ -23,14 +56,33 @@ class DynamicLoader:
         self._tool_map = {} # module_name -> list of tool names
         self._resource_map = {} # module_name -> list of resource names
         self._agent_map = {} # module_name -> list of agent names
+        self._watcher: Optional[FileWatcher] = None
+        self.lazy = lazy
+        self.descriptor_cache = descriptor_cache
+        self._lazy_modules = {} # module_name -> arguments for _load_module, while only stubs are registered
+        self._stub_sources = {} # module_name -> where the stub descriptors came from ("MANIFEST" or "descriptor cache")
+        self._import_locks = {} # module_name -> lock held while importing, reloading or unloading it
+        self._lock = threading.Lock()
+        self.import_times = {} # module_name -> seconds spent importing and building its components
 
     def load_components(self):
         """Loads all components (tools, resources, agents) from their respective directories."""
-        self._load_directory_components("tool", self.tools_dir, "make_tools", self.registry.register_tool, self._tool_map)
-        self._load_directory_components("resource", self.resources_dir, "make_resources", self.registry.register_resource, self._resource_map)
-        self._load_directory_components("agent", self.agents_dir, "make_agents", self.registry.register_agent, self._agent_map)
+        start = time.perf_counter()
+        for component_type, directory_path, make_function_name, component_map in self._directories():
+            self._load_directory_components(component_type, directory_path, make_function_name, component_map)
+        log.info(f"Loaded components in {(time.perf_counter() - start) * 1000:.1f} ms "
+                 f"({len(self._loaded_modules)} modules imported, {len(self._lazy_modules)} deferred)")
+        self._save_descriptors()
+
+    def _save_descriptors(self):
+        if self.descriptor_cache is not None:
+            self.descriptor_cache.save()
+
+    def _register_module_components(self, component_type: str, module_name: str, components: dict):
+        """Atomically replaces the components owned by a module with the given ones."""
+        self.registry.register_namespace(module_namespace(module_name), **{f"{component_type}s": components})
 
-    def _load_directory_components(self, component_type: str, directory_path: Path, make_function_name: str, register_function, component_map: dict):
+    def _load_directory_components(self, component_type: str, directory_path: Path, make_function_name: str, component_map: dict):
         if not directory_path.is_dir():
             log.warning(f"{component_type.capitalize()} directory not found: {directory_path}")
             return
@@ -39,100 +91,228 @@ class DynamicLoader:
             sys.path.insert(0, str(directory_path.parent))
 
         for py_file in directory_path.glob("*.py"):
-            if py_file.name.startswith("__"):
+            if not _is_component_file(py_file):
                 continue
-            self._load_module(component_type, directory_path.name, py_file, make_function_name, register_function, component_map)
+            self._load_module(component_type, directory_path.name, py_file, make_function_name, component_map)
 
-    def _load_module(self, component_type: str, directory_name: str, py_file: Path, make_function_name: str, register_function, component_map: dict):
+    def _load_module(self, component_type: str, directory_name: str, py_file: Path, make_function_name: str, component_map: dict,
+                     lazy: Optional[bool] = None):
+        """Imports (or re-imports) a component file and atomically swaps in its components. If the
+        import fails, the components of the previous version stay registered. In lazy mode, modules
+        that were not imported yet only get stubs from their manifest."""
         module_name = f"{directory_name}.{py_file.stem}"
-        
+        reloading = module_name in self._loaded_modules
+        if (self.lazy if lazy is None else lazy) and not reloading:
+            if self._register_stubs(component_type, directory_name, py_file, make_function_name, component_map):
+                return
+
         try:
+            # Stamped before reading, so an edit made while importing is picked up by the next check.
+            stamp = self._file_stamp(py_file)
             spec = importlib.util.spec_from_file_location(module_name, py_file)
             if not spec or not spec.loader:
                 return
 
             module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            components_in_module = []
-            if hasattr(module, make_function_name):
-                make_function = getattr(module, make_function_name)
-                components = make_function(self.registry, self.downstream_manager)
-                for name, component in components.items():
-                    register_function(name, component)
-                    components_in_module.append(name)
-                    log.info(f"Loaded {component_type}: {name}")
-            
+            # Registered before executing, like a regular import, so the module can be reloaded
+            # and referenced by name (e.g. by pickle or dataclasses).
+            previous = sys.modules.get(module_name)
+            sys.modules[module_name] = module
+            start = time.perf_counter()
+            try:
+                spec.loader.exec_module(module)
+                components = {}
+                if hasattr(module, make_function_name):
+                    make_function = getattr(module, make_function_name)
+                    components = make_function(self.registry, self.downstream_manager)
+            except BaseException:
+                if previous is not None:
+                    sys.modules[module_name] = previous
+                else:
+                    sys.modules.pop(module_name, None)
+                raise
+            elapsed = time.perf_counter() - start
+            self.import_times[module_name] = elapsed
+            log.info(f"Imported {module_name} in {elapsed * 1000:.1f} ms")
+            if self._lazy_modules.pop(module_name, None) is not None:
+                source = self._stub_sources.pop(module_name, "MANIFEST")
+                declared = set(component_map.get(module_name, []))
+                if declared != set(components):
+                    log.warning(f"{source} of {module_name} does not match its components: "
+                                f"declared {sorted(declared)}, registered {sorted(components)}")
+            if self.descriptor_cache is not None:
+                kind = f"{component_type}s"
+                self.descriptor_cache.store(py_file, {kind: [describe_component(kind, n, c) for n, c in components.items()]})
+            self._register_module_components(component_type, module_name, components)
+            for comp_name in component_map.get(module_name, []):
+                if comp_name not in components:
+                    log.info(f"Unloaded {component_type}: {comp_name}")
+            for name in components:
+                log.info(f"{'Reloaded' if reloading else 'Loaded'} {component_type}: {name}")
+
             self._loaded_modules[module_name] = module
-            self._file_mtimes[py_file] = py_file.stat().st_mtime
-            component_map[module_name] = components_in_module
+            self._file_mtimes[py_file] = stamp
+            component_map[module_name] = list(components)
 
         except Exception as e:
-            log.error(f"Error loading {component_type} from {py_file}", exc_info=e)
-
-    def watch_for_changes(self):
-        """Monitors the component directories for changes and reloads them."""
-        def watch_loop():
-            while True:
-                self.check_and_reload_components()
-                time.sleep(2)
-        
-        thread = threading.Thread(target=watch_loop, daemon=True)
+            log.error(f"Error {'reloading' if reloading else 'loading'} {component_type} from {py_file}", exc_info=e)
+
+    def _register_stubs(self, component_type: str, directory_name: str, py_file: Path, make_function_name: str, component_map: dict) -> bool:
+        """Registers stub components from the module's MANIFEST, or else from descriptors cached by an
+        earlier import of the same file. Returns False if neither is available."""
+        module_name = f"{directory_name}.{py_file.stem}"
+        source = "MANIFEST"
+        try:
+            descriptors = read_manifest(py_file)
+        except (SyntaxError, ValueError) as e:
+            log.warning(f"Unreadable MANIFEST in {py_file}, importing it instead: {e}")
+            return False
+        if descriptors is None and self.descriptor_cache is not None:
+            source = "descriptor cache"
+            descriptors = self.descriptor_cache.lookup(py_file)
+        if descriptors is None:
+            return False
+        components = {}
+        for entry in descriptors.get(f"{component_type}s", []):
+            components[entry["name"]] = self._make_stub(component_type, module_name, entry)
+        self._lazy_modules[module_name] = (component_type, directory_name, py_file, make_function_name, component_map)
+        self._stub_sources[module_name] = source
+        self._register_module_components(component_type, module_name, components)
+        self._file_mtimes[py_file] = self._file_stamp(py_file)
+        component_map[module_name] = list(components)
+        log.info(f"Registered {len(components)} {component_type}s of {module_name} from its {source}, import deferred")
+        return True
+
+    def _make_stub(self, component_type: str, module_name: str, entry: Dict[str, Any]):
+        name = entry["name"]
+
+        def run(args):
+            self.ensure_imported(module_name)
+            real = getattr(self.registry, f"get_{component_type}")(name)
+            fn = getattr(real, "access" if component_type == "resource" else "run", None)
+            if fn is None or fn is run:
+                raise RuntimeError(f"{component_type} {name} is unavailable: {module_name} could not be imported or does not define it")
+            return fn(args)
+
+        description = entry.get("description", "")
+        if component_type == "tool":
+            return Tool(name=name, description=description, parameters=entry.get("parameters", []), run_fn=run,
+                        cacheable=entry.get("cacheable", False), cache_ttl=entry.get("cache_ttl", 30.0),
+                        streaming=entry.get("streaming", False), invalidates=entry.get("invalidates", False))
+        if component_type == "resource":
+            return Resource(name=name, description=description, access_fn=run,
+                            cacheable=entry.get("cacheable", False), cache_ttl=entry.get("cache_ttl", 30.0))
+        return Agent(name=name, description=description, run_fn=run, invalidates=entry.get("invalidates", False))
+
+    def _module_lock(self, module_name: str) -> threading.Lock:
+        """Held while a module is imported, reloaded or unloaded, so those never overlap."""
+        with self._lock:
+            return self._import_locks.setdefault(module_name, threading.Lock())
+
+    def ensure_imported(self, module_name: str):
+        """Imports a module that only has stubs registered; concurrent first calls import it once."""
+        with self._module_lock(module_name):
+            pending = self._lazy_modules.get(module_name)
+            if pending is not None:
+                self._load_module(*pending, lazy=False)
+                self._save_descriptors()
+
+    def warm_in_background(self) -> threading.Thread:
+        """Imports every module that is still deferred, one after another on a background thread."""
+        def warm():
+            start = time.perf_counter()
+            for module_name in list(self._lazy_modules):
+                self.ensure_imported(module_name)
+            log.info(f"Warmed deferred modules in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        thread = threading.Thread(target=warm, name="warm-modules", daemon=True)
         thread.start()
-        log.info("Component hot-reloading enabled.")
+        return thread
 
-    def check_and_reload_components(self):
-        """Checks for modified or new component files and reloads them."""
-        self._check_and_reload_directory_components("tool", self.tools_dir, "make_tools", self.registry.register_tool, self.registry.remove_tool, self._tool_map)
-        self._check_and_reload_directory_components("resource", self.resources_dir, "make_resources", self.registry.register_resource, self.registry.remove_resource, self._resource_map)
-        self._check_and_reload_directory_components("agent", self.agents_dir, "make_agents", self.registry.register_agent, self.registry.remove_agent, self._agent_map)
-    
-    def _check_and_reload_directory_components(self, component_type: str, directory_path: Path, make_function_name: str, register_function, remove_function, component_map: dict):
-        if not directory_path.is_dir():
+    def _unload_module(self, component_type: str, directory_name: str, py_file: Path, component_map: dict):
+        """Unregisters everything a deleted (or renamed away) component file registered."""
+        module_name = f"{directory_name}.{py_file.stem}"
+        self._file_mtimes.pop(py_file, None)
+        imported = self._loaded_modules.pop(module_name, None) is not None
+        deferred = self._lazy_modules.pop(module_name, None) is not None
+        self._stub_sources.pop(module_name, None)
+        if self.descriptor_cache is not None:
+            self.descriptor_cache.forget(py_file)
+        if not imported and not deferred:
             return
+        sys.modules.pop(module_name, None)
+        self.registry.remove_namespace(module_namespace(module_name))
+        for comp_name in component_map.pop(module_name, []):
+            log.info(f"Unloaded {component_type}: {comp_name}")
 
-        for py_file in directory_path.glob("*.py"):
-            if py_file.name.startswith("__"):
-                continue
+    @staticmethod
+    def _file_stamp(py_file: Path):
+        st = py_file.stat()
+        return (st.st_mtime_ns, st.st_size)
 
-            current_mtime = py_file.stat().st_mtime
-            module_name = f"{directory_path.name}.{py_file.stem}"
-            
-            if py_file not in self._file_mtimes:
-                log.info(f"New {component_type} file detected: {py_file.name}")
-                self._load_module(component_type, directory_path.name, py_file, make_function_name, register_function, component_map)
-            elif self._file_mtimes[py_file] < current_mtime:
-                log.info(f"{component_type.capitalize()} file modified: {py_file.name}. Reloading...")
-                self._reload_module(component_type, directory_path.name, py_file, make_function_name, register_function, remove_function, component_map)
-    
-    def _reload_module(self, component_type: str, directory_name: str, py_file: Path, make_function_name: str, register_function, remove_function, component_map: dict):
-        module_name = f"{directory_name}.{py_file.stem}"
+    def _directories(self):
+        return (
+            ("tool", self.tools_dir, "make_tools", self._tool_map),
+            ("resource", self.resources_dir, "make_resources", self._resource_map),
+            ("agent", self.agents_dir, "make_agents", self._agent_map),
+        )
 
-        # Unregister old components from this module
-        if module_name in component_map:
-            for comp_name in component_map[module_name]:
-                remove_function(comp_name)
-                log.info(f"Unloaded {component_type}: {comp_name}")
-            del component_map[module_name]
+    def watch_for_changes(self, mode: str = "auto", debounce: float = 0.2, poll_interval: float = 2.0):
+        """
+        Reloads component files as they change. mode is "inotify", "poll", or "auto" (inotify when
+        available). Bursts of saves are coalesced into one reload per file.
+        """
+        self.stop_watching()
+        self._watcher = FileWatcher([d for _, d, _, _ in self._directories()], self.apply_changes,
+                                    mode=mode, debounce=debounce, poll_interval=poll_interval)
+        self._watcher.start()
+        log.info(f"Component hot-reloading enabled ({self._watcher.mode}).")
 
-        # Reload the module
-        if module_name in self._loaded_modules:
-            try:
-                module = self._loaded_modules[module_name]
-                importlib.reload(module)
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
 
-                # Re-register components
-                components_in_module = []
-                if hasattr(module, make_function_name):
-                    make_function = getattr(module, make_function_name)
-                    components = make_function(self.registry, self.downstream_manager)
-                    for name, component in components.items():
-                        register_function(name, component)
-                        components_in_module.append(name)
-                        log.info(f"Reloaded {component_type}: {name}")
-                
-                component_map[module_name] = components_in_module
-                self._file_mtimes[py_file] = py_file.stat().st_mtime
-            except Exception as e:
-                log.error(f"Error reloading {component_type} module {module_name}", exc_info=e)
+    def apply_changes(self, paths: Optional[Set[Path]]):
+        """Loads, reloads or unloads the component files in paths (None: rescan every directory)."""
+        if paths is None:
+            self.check_and_reload_components()
+            return
+        for component_type, directory_path, make_function_name, component_map in self._directories():
+            for py_file in sorted(p for p in paths if p.parent == directory_path):
+                if not _is_component_file(py_file):
+                    continue
+                # A lazy first call (ensure_imported) may be importing this module right now.
+                with self._module_lock(f"{directory_path.name}.{py_file.stem}"):
+                    self._apply_change(component_type, directory_path, py_file, make_function_name, component_map)
+        self._save_descriptors()
+
+    def _apply_change(self, component_type: str, directory_path: Path, py_file: Path, make_function_name: str, component_map: dict):
+        if not py_file.exists():
+            if py_file in self._file_mtimes:
+                log.info(f"{component_type.capitalize()} file removed: {py_file.name}")
+            self._unload_module(component_type, directory_path.name, py_file, component_map)
+            return
+        try:
+            stamp = self._file_stamp(py_file)
+        except OSError:
+            return
+        if self._file_mtimes.get(py_file) == stamp:
+            return
+        if py_file in self._file_mtimes:
+            log.info(f"{component_type.capitalize()} file modified: {py_file.name}. Reloading...")
+        else:
+            log.info(f"New {component_type} file detected: {py_file.name}")
+        self._load_module(component_type, directory_path.name, py_file, make_function_name, component_map)
+
+    def check_and_reload_components(self):
+        """Checks every component directory once for new, modified and deleted files."""
+        paths = set(self._file_mtimes)
+        for _, directory_path, _, _ in self._directories():
+            if directory_path.is_dir():
+                paths.update(directory_path.glob("*.py"))
+        self.apply_changes(paths)
 
+def _is_component_file(path: Path) -> bool:
+    # Skips packages' __init__ and editor droppings such as .#foo.py
+    return path.suffix == ".py" and not path.name.startswith(("__", "."))
@@ -0,0 +1,248 @@
+# core/file_watcher.py
+# Event-driven directory watcher: Linux inotify through ctypes, with a polling fallback for
+# platforms and mounts without it. Bursts of changes are coalesced into one callback.
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+WATCH_MODES = ("auto", "inotify", "poll")
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by len bytes of name
+
+class InotifyBackend:
+    """Reports changed paths from inotify events on a set of directories (not recursive). A directory
+    that does not exist (yet) is waited for through a watch on its nearest existing ancestor, and
+    watched, with the files already in it reported as changed, once it appears."""
+    name = "inotify"
+
+    def __init__(self, directories: Iterable[Path]):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._ancestors: Dict[int, Path] = {}  # wd -> existing ancestor of a missing directory
+        self._missing: Set[Path] = set()
+        self.overflowed = False
+        try:
+            for directory in directories:
+                if Path(directory).is_dir():
+                    self._dirs[self._add_watch(directory)] = Path(directory)
+                else:
+                    self._missing.add(Path(directory))
+            self._wait_for_missing()
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _add_watch(self, directory: Path) -> int:
+        # Every watch gets the full mask: a directory can also be the ancestor of a missing one,
+        # and adding a watch again replaces the mask of the existing one.
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch failed for {directory}: {os.strerror(err)}")
+        return wd
+
+    def _wait_for_missing(self) -> Set[Path]:
+        """Watches missing directories that now exist, returning the files already in them; for the
+        others, watches their nearest existing ancestor."""
+        found = set()
+        for directory in list(self._missing):
+            try:
+                if directory.is_dir():
+                    self._dirs[self._add_watch(directory)] = directory
+                    self._missing.discard(directory)
+                    found |= {Path(entry.path) for entry in os.scandir(directory)}
+                    continue
+                ancestor = directory.parent
+                while not ancestor.is_dir() and ancestor != ancestor.parent:
+                    ancestor = ancestor.parent
+                self._ancestors[self._add_watch(ancestor)] = ancestor
+            except OSError as e:
+                # Raced with a removal; tried again on the next event under its ancestor.
+                log.debug(f"Cannot watch {directory} yet: {e}")
+        return found
+
+    def poll(self, timeout: float) -> Set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return set()
+            raise
+        changed = set()
+        rearm = False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; the caller has to rescan everything.
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                # The watched directory itself was removed: wait for it to come back.
+                directory = self._dirs.pop(wd, None)
+                self._ancestors.pop(wd, None)
+                if directory is not None:
+                    self._missing.add(directory)
+                    rearm = True
+                continue
+            if wd in self._ancestors and self._missing:
+                rearm = True
+            if not name or wd not in self._dirs:
+                continue
+            changed.add(self._dirs[wd] / os.fsdecode(name))
+        if rearm:
+            changed |= self._wait_for_missing()
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class PollingBackend:
+    """Fallback: compares (mtime, size) of every file in the directories between scans. Directories
+    that do not exist are skipped, so they are picked up once they appear."""
+    name = "poll"
+
+    def __init__(self, directories: Iterable[Path]):
+        self._directories = list(directories)
+        self.overflowed = False
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for directory in self._directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                snapshot[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout: float) -> Set[Path]:
+        time.sleep(timeout)
+        snapshot = self._scan()
+        previous, self._snapshot = self._snapshot, snapshot
+        return {p for p in previous.keys() | snapshot.keys() if previous.get(p) != snapshot.get(p)}
+
+    def close(self):
+        pass
+
+def make_backend(directories: Iterable[Path], mode: str = "auto"):
+    """mode: "inotify", "poll", or "auto" (inotify when the platform supports it, else polling)."""
+    if mode not in WATCH_MODES:
+        raise ValueError(f"unknown watch mode: {mode} (expected one of {WATCH_MODES})")
+    directories = list(directories)
+    if mode != "poll":
+        try:
+            return InotifyBackend(directories)
+        except (OSError, AttributeError) as e:
+            if mode == "inotify":
+                raise
+            log.info(f"inotify unavailable ({e}), falling back to polling")
+    return PollingBackend(directories)
+
+class FileWatcher:
+    def __init__(self, directories: Iterable[Path], callback: Callable[[Optional[Set[Path]]], None], mode: str = "auto",
+                 debounce: float = 0.2, poll_interval: float = 2.0):
+        """
+        Calls callback(paths) on a background thread with the set of paths that were created,
+        modified, deleted or renamed (both old and new names), once no further change has been
+        seen for debounce seconds. callback(None) means events were lost and everything should
+        be rescanned. poll_interval is how often the polling backend scans while idle.
+        """
+        # Directories that do not exist yet are watched once they are created.
+        self.directories = [Path(d) for d in directories]
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = make_backend(self.directories, mode)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def mode(self) -> str:
+        return self.backend.name
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.mode}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        pending: Set[Path] = set()
+        rescan = False
+        last_change = 0.0
+        # inotify wakes up on events; the idle timeout only bounds how long stop() takes.
+        idle = self.poll_interval if self.mode == "poll" else 1.0
+        try:
+            while not self._stopped.is_set():
+                waiting = bool(pending) or rescan
+                try:
+                    changed = self.backend.poll(self.debounce if waiting else idle)
+                except OSError as e:
+                    if not self._stopped.is_set():
+                        log.error(f"file watcher error: {e}")
+                    return
+                if self.backend.overflowed:
+                    self.backend.overflowed = False
+                    rescan = True
+                if changed or (rescan and not waiting):
+                    pending |= changed
+                    last_change = time.monotonic()
+                    continue
+                if waiting and time.monotonic() - last_change >= self.debounce:
+                    batch = None if rescan else pending
+                    pending, rescan = set(), False
+                    try:
+                        self.callback(batch)
+                    except Exception as e:
+                        log.error(f"file watcher callback error: {e}", exc_info=True)
+        finally:
+            self.backend.close()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(self.poll_interval, 1.0) + 1.0)
@@ -2,30 +2,88 @@
 # Simple TCP MCP server that exposes the router registry via JSON per-line protocol.
 import logging
 import socket
+import contextvars
 import threading
+import time
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Callable, Dict, Optional, Tuple
 from .registry import MCPRegistry
+from .admission import Admission, Connection, overloaded_reply
+from .change_feed import ChangeFeed
+from .metrics import Metrics, SIZE_BUCKETS, serve_prometheus
+from .proxy import downstream_name
+from .tracing import SERVER, Tracer, tracer
 from .downstream_manager import DownstreamManager
 from .dynamic_loader import DynamicLoader
+from .descriptor_cache import DescriptorCache
+from .result_cache import ResultCache, MISS
+from .codec import Encoded, FrameTooLarge, JSON_LINES, choose_codec, supported_codecs
+from .streaming import is_stream, iter_chunks, collect, on_close
 
 log = logging.getLogger(__name__)
 
+ENGINES = ("threaded", "asyncio")
+# Request types that may appear inside a batch.
+BATCH_TYPES = ("run_tool", "access_resource", "run_agent")
+# Request types metrics are labelled with; anything else is counted as "other".
+REQUEST_TYPES = ("list_all", "list_diff", "list_tools", "list_resources", "list_agents", "subscribe_changes",
+                 "cache_stats", "stats", "batch") + BATCH_TYPES
+# Request types admitted even over the admission limits, so an overloaded server can be observed.
+ADMISSION_EXEMPT = ("stats",)
+DEFAULT_BACKLOG = 128
+
+def _is_error_result(result) -> bool:
+    # Includes error replies relayed from downstream proxies.
+    return isinstance(result, dict) and ("error" in result or result.get("status") == "error")
+
 class MCPServer:
-    def __init__(self, host: str = "0.0.0.0", port: int = 3456):
+    def __init__(self, host: str = "0.0.0.0", port: int = 3456, engine: str = "threaded", max_workers: int = 32,
+                 cache_bytes: int = 32 * 1024 * 1024, watch: str = "auto", lazy_load: bool = False, warm_modules: bool = False,
+                 descriptor_cache: Optional[str] = None, metrics_port: Optional[int] = None, backlog: int = DEFAULT_BACKLOG,
+                 max_connections: Optional[int] = None, max_in_flight: Optional[int] = None,
+                 max_in_flight_per_conn: Optional[int] = None, max_queue: Optional[int] = None):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine: {engine} (expected one of {ENGINES})")
         self.registry = MCPRegistry()
         self.downstream_manager = DownstreamManager(self.registry)
+        self.result_cache = ResultCache(max_bytes=cache_bytes)
+        # Reloaded modules and disconnected downstreams drop their cached results.
+        self.registry.add_listener(self.result_cache.invalidate_namespace)
+        # Call, request and connection metrics; also served for Prometheus on metrics_port if set.
+        self.metrics = Metrics()
+        self.metrics_port = metrics_port
+        self._metrics_http = None
+        # Connections that sent subscribe_changes are told when the listing changes.
+        self.change_feed = ChangeFeed(self.registry)
         
         # The tools directory is assumed to be ../tools relative to this file's directory
         tools_dir = Path(__file__).parent.parent / "tools"
         resources_dir = Path(__file__).parent.parent / "resources"
         agents_dir = Path(__file__).parent.parent / "agents"
-        self.dynamic_loader = DynamicLoader(self.registry, self.downstream_manager, tools_dir, resources_dir, agents_dir)
+        # descriptor_cache: path of the on-disk descriptor cache, None to run without one.
+        self.dynamic_loader = DynamicLoader(self.registry, self.downstream_manager, tools_dir, resources_dir, agents_dir, lazy=lazy_load,
+                                            descriptor_cache=DescriptorCache(descriptor_cache) if descriptor_cache else None)
+        self.warm_modules = warm_modules
         
         self.host = host
         self.port = port
+        self.engine = engine
+        self.watch = watch
+        self.max_workers = max_workers
+        self.backlog = backlog
+        # Limits on connections, requests in flight and requests waiting for a worker; requests
+        # over them are answered with a retryable "overloaded" error (see core/admission.py).
+        self.admission = Admission(self.metrics, max_workers, max_connections=max_connections, max_in_flight=max_in_flight,
+                                   max_in_flight_per_conn=max_in_flight_per_conn, max_queue=max_queue)
+        # Bounded pool for blocking Tool.run / Resource.access / Agent.run callables.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-worker")
+        # Batch items get their own pool: a batch may itself be running on self.executor, and
+        # fanning out into the same pool could deadlock once it is saturated.
+        self.batch_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcp-batch")
         self._sock = None
+        self._async_engine = None
         self._running = False
 
     def start(self):
@@ -36,52 +94,281 @@ class MCPServer:
         log.info(f"Loaded resources: {self.registry.list_resources()}")
         log.info(f"Loaded agents: {self.registry.list_agents()}")
 
+        if self.engine == "asyncio":
+            from .async_server import AsyncioEngine
+            self._async_engine = AsyncioEngine(self)
+            self._async_engine.start()
+            self._running = True
+        else:
+            self._start_threaded()
+        log.info(f"MCP Router server ({self.engine} engine) listening on {self.host}:{self.port}")
+        if self.warm_modules:
+            # Deferred modules are imported once clients can already connect.
+            self.dynamic_loader.warm_in_background()
+        if self.metrics_port is not None:
+            self._metrics_http = serve_prometheus(self.metrics, self.host, self.metrics_port)
+            log.info(f"Prometheus metrics at http://{self.host}:{self._metrics_http.server_address[1]}/metrics")
+        # Start watching for changes
+        self.dynamic_loader.watch_for_changes(mode=self.watch)
+
+    def stop(self):
+        self._running = False
+        self.dynamic_loader.stop_watching()
+        self.downstream_manager.close_warm_pool()
+        self.change_feed.stop()
+        if self._metrics_http:
+            self._metrics_http.shutdown()
+            self._metrics_http.server_close()
+            self._metrics_http = None
+        if self._async_engine:
+            self._async_engine.stop()
+            self._async_engine = None
+        if self._sock:
+            try:
+                self._sock.close()
+            except Exception:
+                pass
+            self._sock = None
+        self.executor.shutdown(wait=False)
+        self.batch_executor.shutdown(wait=False)
+
+    def _start_threaded(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((self.host, self.port))
-        s.listen(5)
+        s.listen(self.backlog)
+        # Pick up the real port when bound to port 0.
+        self.port = s.getsockname()[1]
         self._sock = s
         self._running = True
         threading.Thread(target=self._accept_loop, daemon=True).start()
-        log.info(f"MCP Router server listening on {self.host}:{self.port}")
-        # Start watching for changes
-        self.dynamic_loader.watch_for_changes()
 
     def _accept_loop(self):
         while self._running:
             try:
                 conn, addr = self._sock.accept()
-                threading.Thread(target=self._handle_conn, args=(conn, addr), daemon=True).start()
+                admitted = self._connection_opened()
+                if admitted is None:
+                    self._refuse(conn, addr)
+                    continue
+                threading.Thread(target=self._handle_conn, args=(conn, addr, admitted), daemon=True).start()
             except Exception as e:
+                if not self._running:
+                    break
                 log.error("accept loop error", exc_info=e)
 
-    def _handle_conn(self, conn: socket.socket, addr):
+    def _connection_opened(self) -> Optional[Connection]:
+        """Admission state of a new connection, or None if it is refused (max_connections reached)."""
+        admitted = self.admission.connect()
+        if admitted is not None:
+            self.metrics.gauge("mcp_connections_open", "Client connections currently open").inc()
+            self.metrics.counter("mcp_connections_total", "Client connections accepted").inc()
+        return admitted
+
+    def _connection_closed(self, admitted: Connection):
+        self.admission.disconnect(admitted)
+        self.metrics.gauge("mcp_connections_open").dec()
+
+    def _refuse(self, conn: socket.socket, addr):
+        """Answers a connection over max_connections with an overloaded error and closes it."""
+        log.warning(f"Refusing connection from {addr}: {self.admission.connections} connections open")
+        try:
+            conn.settimeout(1.0)
+            conn.sendall(JSON_LINES.encode_reply(overloaded_reply("connections")))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _admit(self, admitted: Connection, req: Dict[str, Any], codec, queued: bool = True) -> Optional[bytes]:
+        """Admits req as in flight on the connection, or returns the encoded overloaded reply.
+        An admitted request is answered with _reply_admitted (with the same queued)."""
+        reason = self.admission.admit(admitted, queued, force=req.get("type") in ADMISSION_EXEMPT)
+        if reason is None:
+            return None
+        return codec.encode_reply(overloaded_reply(reason), req.get("id"), "id" in req)
+
+    def _reply_admitted(self, admitted: Connection, req: Dict[str, Any], codec, send, received, queued: bool = True) -> bytes:
+        """_reply for a request admitted with _admit; it stops counting as in flight once answered."""
+        if queued:
+            self.admission.start()
+        try:
+            return self._reply(req, codec, send, received)
+        finally:
+            self.admission.release(admitted, queued)
+
+    def _handle_conn(self, conn: socket.socket, addr, admitted: Connection):
         log.info(f"Connection from {addr}")
-        f = conn.makefile("rwb")
+        write_lock = threading.Lock()
+        in_flight = set()
+
+        def send(out: bytes) -> bool:
+            with write_lock:
+                try:
+                    conn.sendall(out)
+                    return True
+                except OSError:
+                    log.debug(f"Dropping reply to closed connection {addr}")
+                    return False
+
+        codec = JSON_LINES
+        reader = codec.frame_reader()
         while True:
-            line = f.readline()
-            if not line:
+            try:
+                frame = reader.next_frame()
+            except FrameTooLarge as e:
+                log.error(f"Request from {addr} too large: {e}")
                 break
+            if frame is None:
+                try:
+                    chunk = conn.recv(65536)
+                except OSError:
+                    break
+                if not chunk:
+                    break
+                reader.feed(chunk)
+                continue
+            received = time.time_ns()
+            req, err = self._decode_frame(frame, codec, addr)
+            timing = (received, time.time_ns())
+            if req is None:
+                send(codec.encode_reply(err))
+            elif req.get("type") == "hello":
+                resp, new_codec = self._hello(req, codec, busy=bool(in_flight))
+                send(codec.encode_reply(resp, req.get("id"), "id" in req))
+                if new_codec is not codec:
+                    codec, reader = self._switch_codec(new_codec, reader)
+            elif "id" in req:
+                # Pipelined request: dispatch concurrently, the reply is tagged with its id.
+                rejected = self._admit(admitted, req, codec)
+                if rejected:
+                    send(rejected)
+                    continue
+                fut = self.executor.submit(lambda r=req, c=codec, tm=timing: send(self._reply_admitted(admitted, r, c, send, tm)))
+                in_flight.add(fut)
+                fut.add_done_callback(in_flight.discard)
+            else:
+                # Runs on this connection's thread, so it never waits in the executor queue.
+                rejected = self._admit(admitted, req, codec, queued=False)
+                send(rejected or self._reply_admitted(admitted, req, codec, send, timing, queued=False))
+        # Let pipelined requests finish so a half-closed client still gets every reply.
+        for fut in list(in_flight):
             try:
-                req = json.loads(line.decode("utf-8"))
-                log.debug(f"Request from {addr}: {req}")
-                resp = self._handle_request(req)
-            except Exception as e:
-                resp = {"error": str(e)}
-                log.error(f"Error handling request: {e}", exc_info=True)
-            out = (json.dumps(resp) + "\n").encode("utf-8")
-            f.write(out)
-            f.flush()
+                fut.result()
+            except Exception:
+                pass
+        self.change_feed.unsubscribe(send)
+        self._connection_closed(admitted)
         try:
             conn.close()
         except Exception:
             pass
         log.info(f"Connection from {addr} closed")
 
+    def _hello(self, req: Dict[str, Any], codec, busy: bool):
+        """Codec handshake. Returns (reply, codec to use after the reply). The switch is refused while
+        pipelined requests are in flight, since their replies are encoded with the current codec."""
+        chosen = choose_codec(req.get("codecs")) if not busy else codec
+        return {"ok": True, "codec": chosen.name, "codecs": supported_codecs()}, chosen
+
+    @staticmethod
+    def _switch_codec(codec, reader):
+        """Moves bytes received after the hello request over to a reader for the new codec."""
+        rest = reader.rest()
+        reader = codec.frame_reader()
+        reader.feed(rest)
+        return codec, reader
+
+    def _decode_frame(self, frame: bytes, codec=JSON_LINES, addr=None):
+        """Returns (request, None), or (None, error response) if the frame is not a valid request."""
+        self.metrics.histogram("mcp_request_bytes", "Size of request frames", SIZE_BUCKETS).observe(len(frame))
+        try:
+            req = codec.decode(frame)
+        except Exception as e:
+            log.error(f"Error decoding request: {e}")
+            return None, {"error": str(e)}
+        if not isinstance(req, dict):
+            return None, {"error": "request must be a JSON object"}
+        log.debug(f"Request from {addr}: {req}")
+        return req, None
+
+    def _reply(self, req: Dict[str, Any], codec=JSON_LINES, send: Optional[Callable[[bytes], bool]] = None,
+               received: Optional[Tuple[int, int]] = None) -> bytes:
+        """Handles a decoded request and returns the encoded reply, tagged with the request id if any.
+        Shared by the threaded and asyncio engines. When the request sets "stream" and the result is
+        a generator or async iterator, its chunks are written with send() as progress frames and the
+        returned reply is the final frame; otherwise the chunks are collected into a list.
+        subscribe_changes registers send for list_changed notifications.
+        received: when the frame arrived and when it was decoded (time.time_ns()), for tracing."""
+        t = req.get("type")
+        t = t if t in REQUEST_TYPES else "other"
+        timer = self.metrics.histogram("mcp_request_seconds", "Time to handle a request, until its final frame", type=t)
+        started = time.perf_counter()
+        span = self._request_span(req, t, received)
+        try:
+            with Tracer.activate(span):
+                if req.get("type") == "subscribe_changes":
+                    resp = self._subscribe_changes(codec, send)
+                else:
+                    resp = self._handle_request(req)
+                if isinstance(resp, dict) and is_stream(resp.get("result")):
+                    if req.get("stream") and send is not None:
+                        resp = self._stream(req, resp["result"], codec, send)
+                    else:
+                        resp = self._materialize(resp)
+        except Exception as e:
+            resp = {"error": str(e)}
+            log.error(f"Error handling request: {e}", exc_info=True)
+        out = codec.encode_reply(resp, req.get("id"), "id" in req)
+        if span is not None:
+            if isinstance(resp, dict) and "error" in resp:
+                span.set_error(str(resp["error"]))
+            span.set_attribute("mcp.response.bytes", len(out))
+            span.end()
+        timer.observe(time.perf_counter() - started)
+        self.metrics.counter("mcp_requests_total", "Requests handled", type=t).inc()
+        if isinstance(resp, dict) and "error" in resp:
+            self.metrics.counter("mcp_request_errors_total", "Requests answered with an error", type=t).inc()
+        self.metrics.histogram("mcp_response_bytes", "Size of final reply frames", SIZE_BUCKETS, type=t).observe(len(out))
+        return out
+
+    def _request_span(self, req: Dict[str, Any], t: str, received: Optional[Tuple[int, int]]):
+        """The server span of a request, continuing the caller's trace if the request carries a
+        traceparent, with child spans for decoding the frame and waiting for a worker."""
+        tr = tracer()
+        if not tr.enabled:
+            return None
+        now = time.time_ns()
+        arrived, decoded = received or (now, now)
+        attributes = {"mcp.request.type": req.get("type", "")}
+        if req.get("name") is not None:
+            attributes["mcp.request.name"] = str(req.get("name"))
+        span = tr.start_span(f"mcp {t}", SERVER, req.get("traceparent") or None,
+                             arrived, attributes)
+        if received and span.sampled:
+            tr.start_span("decode", parent=span, start_ns=arrived).end(decoded)
+            tr.start_span("dispatch", parent=span, start_ns=decoded).end(now)
+        return span
+
+    def _subscribe_changes(self, codec, send: Optional[Callable[[bytes], bool]]) -> Dict[str, Any]:
+        if send is None:
+            return {"error": "subscribe_changes needs a connection"}
+        return {"ok": True, "version": self.change_feed.subscribe(send, codec)}
+
     def _handle_request(self, req: Dict[str, Any]) -> Dict[str, Any]:
         t = req.get("type")
         if t == "list_all":
-            return self.registry.snapshot()
+            state = self.registry.state()
+            if req.get("if_version") == state.version:
+                return {"not_modified": True, "version": state.version}
+            return Encoded(state.encoded_listing(), state.listing())
+        if t == "list_diff":
+            # What changed since the listing version the caller has; the full listing if that
+            # version is too old to diff against.
+            diff = self.registry.diff_since(req.get("since"))
+            if diff is None:
+                return {**self.registry.state().listing(), "full": True}
+            return diff
         if t == "list_tools":
             return {"tools": self.registry.list_tools()}
         if t == "list_resources":
@@ -95,8 +382,7 @@ class MCPServer:
             if not tool:
                 return {"error": f"tool not found: {name}"}
             try:
-                result = tool.run(args)
-                return {"ok": True, "result": result}
+                return self._invoke("tools", name, tool, tool.run, args)
             except Exception as e:
                 log.error(f"tool run error: {e}", exc_info=True)
                 return {"error": f"tool run error: {e}"}
@@ -107,8 +393,7 @@ class MCPServer:
             if not r:
                 return {"error": f"resource not found: {name}"}
             try:
-                result = r.access(args)
-                return {"ok": True, "result": result}
+                return self._invoke("resources", name, r, r.access, args)
             except Exception as e:
                 log.error(f"resource access error: {e}", exc_info=True)
                 return {"error": f"resource access error: {e}"}
@@ -119,9 +404,142 @@ class MCPServer:
             if not a:
                 return {"error": f"agent not found: {name}"}
             try:
-                result = a.run(args)
-                return {"ok": True, "result": result}
+                return self._invoke("agents", name, a, a.run, args)
             except Exception as e:
                 log.error(f"agent run error: {e}", exc_info=True)
                 return {"error": f"agent run error: {e}"}
+        if t == "cache_stats":
+            return {"cache": self.result_cache.stats()}
+        if t == "stats":
+            if req.get("format") == "prometheus":
+                return {"ok": True, "text": self.metrics.prometheus()}
+            return {"ok": True, "metrics": self.metrics.snapshot(), "cache": self.result_cache.stats(),
+                    "admission": self.admission.stats()}
+        if t == "batch":
+            return self._handle_batch(req)
         return {"error": f"unknown request type: {t}"}
+
+    def _stream(self, req: Dict[str, Any], result, codec, send: Callable[[bytes], bool]) -> Dict[str, Any]:
+        """Writes each chunk of a stream result as {"progress": chunk, "seq": n} and returns the final frame."""
+        req_id, tagged = req.get("id"), "id" in req
+        seq = 0
+        chunks = iter_chunks(result)
+        try:
+            streamed = self.metrics.counter("mcp_stream_bytes_total", "Bytes sent in progress frames")
+            for chunk in chunks:
+                frame = codec.encode_reply({"progress": chunk, "seq": seq}, req_id, tagged)
+                if not send(frame):
+                    log.info(f"Client went away, stopping stream of {req.get('name')}")
+                    break
+                streamed.inc(len(frame))
+                seq += 1
+        except Exception as e:
+            log.error(f"stream error: {e}", exc_info=True)
+            return {"error": f"stream error: {e}", "chunks": seq}
+        finally:
+            chunks.close()
+        return {"ok": True, "done": True, "chunks": seq}
+
+    def _materialize(self, resp: Dict[str, Any]) -> Dict[str, Any]:
+        """Replaces a stream result by the list of its chunks."""
+        try:
+            return {**resp, "result": collect(resp["result"])}
+        except Exception as e:
+            log.error(f"stream error: {e}", exc_info=True)
+            return {"error": f"stream error: {e}"}
+
+    def _invoke(self, kind: str, name: str, component, fn, args) -> Dict[str, Any]:
+        """Runs a tool/resource/agent callable, going through the result cache for cacheable components.
+        Its latency and outcome are recorded per component (and per downstream for proxies); for
+        stream results, once the stream ends."""
+        owner = self.registry.state().owners.get((kind, name))
+        downstream = downstream_name(owner)
+        timer = self.metrics.time_call(kind, name, downstream)
+        span = tracer().start_span(f"{kind[:-1]} {name}", attributes={"mcp.kind": kind, "mcp.name": name, "mcp.owner": owner or ""})
+
+        def done(error: Optional[str]):
+            timer.done(error is not None)
+            if span is not None:
+                if error is not None:
+                    span.set_error(error)
+                span.end()
+
+        try:
+            with Tracer.activate(span):
+                resp = self._invoke_cached(kind, name, component, fn, args, owner)
+        except BaseException as e:
+            done(f"{type(e).__name__}: {e}")
+            raise
+        if span is not None and resp.get("cached"):
+            span.set_attribute("mcp.cached", True)
+        result = resp["result"]
+        if is_stream(result):
+            resp["result"] = on_close(result, lambda error: done(None if error is None else f"{type(error).__name__}: {error}"))
+        else:
+            done(str(result.get("error", "error")) if _is_error_result(result) else None)
+        return resp
+
+    def _invoke_cached(self, kind: str, name: str, component, fn, args, owner: Optional[str]) -> Dict[str, Any]:
+        cache = self.result_cache
+        if getattr(component, "cacheable", False):
+            key = cache.make_key(kind, name, args)
+            if key is not None:
+                cached = cache.get(key, component)
+                if cached is not MISS:
+                    return {"ok": True, "result": cached, "cached": True}
+                result = fn(args)
+                if is_stream(result):
+                    # Chunks are sent as they are produced and never cached.
+                    return {"ok": True, "result": result}
+                # Never cache failures (a proxy whose downstream did not answer returns None).
+                if result is not None and not _is_error_result(result):
+                    cache.put(key, result, component.cache_ttl, component, owner)
+                return {"ok": True, "result": result}
+        result = fn(args)
+        # Components marked invalidates change what reads of the same module/downstream return.
+        if getattr(component, "invalidates", False):
+            cache.invalidate_namespace(owner)
+        return {"ok": True, "result": result}
+
+    def _handle_batch(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs run_tool/access_resource/run_agent sub-requests concurrently and returns their
+        replies in order. Items still running when the optional deadline (seconds) passes are
+        reported as errors; they are not interrupted."""
+        items = req.get("requests")
+        if not isinstance(items, list):
+            return {"error": "batch requires a 'requests' list"}
+        deadline = req.get("deadline")
+        if deadline is not None and (not isinstance(deadline, (int, float)) or deadline < 0):
+            return {"error": f"invalid batch deadline: {deadline}"}
+
+        futures = []
+        for item in items:
+            if not isinstance(item, dict) or item.get("type") not in BATCH_TYPES:
+                futures.append(None)
+            else:
+                # Each item runs in a copy of this context, so its spans join the batch's trace.
+                futures.append(self.batch_executor.submit(contextvars.copy_context().run, self._handle_batch_item, item))
+        wait([f for f in futures if f is not None], timeout=deadline)
+
+        results = []
+        for item, fut in zip(items, futures):
+            if fut is None:
+                t = item.get("type") if isinstance(item, dict) else None
+                results.append({"error": f"unsupported batch request type: {t}"})
+            elif fut.done():
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    log.error(f"batch item error: {e}", exc_info=True)
+                    results.append({"error": str(e)})
+            else:
+                fut.cancel()
+                results.append({"error": f"deadline exceeded after {deadline}s", "timeout": True})
+        return {"ok": True, "results": results}
+
+    def _handle_batch_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        # Batch replies are a single frame, so stream results are collected.
+        resp = self._handle_request(item)
+        if isinstance(resp, dict) and is_stream(resp.get("result")):
+            return self._materialize(resp)
+        return resp
@@ -0,0 +1,223 @@
+# core/metrics.py
+# In-process counters, gauges and latency histograms for the router, cheap enough to leave on:
+# recording is a dict lookup, a bisect and an add under a per-series lock. Exposed as a JSON
+# snapshot (the "stats" request) and in the Prometheus text format.
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Bucket upper bounds: 1-1.5-2-3-5-7 steps per decade, so percentiles are estimated to within
+# one step, from 10us to 10 minutes.
+LATENCY_BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 3) for m in (1, 1.5, 2, 3, 5, 7))
+SIZE_BUCKETS = tuple(float(4 ** k) for k in range(3, 14))  # 64 B .. 64 MiB
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum", "max", "_lock")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate of the q-quantile (0 < q <= 1), interpolated within its bucket. None if empty."""
+        with self._lock:
+            counts, count, top = list(self.counts), self.count, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = min(self.bounds[i] if i < len(self.bounds) else top, top)
+                return lower + (max(upper, lower) - lower) * (rank - seen) / n
+            seen += n
+        return top
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = self.count
+        return {"count": count, "sum": self.sum, "mean": self.sum / count if count else None, "max": self.max,
+                "p50": self.percentile(0.50), "p95": self.percentile(0.95), "p99": self.percentile(0.99)}
+
+_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+class Metrics:
+    """
+    Named metric families, each with one series per label set, e.g.
+    metrics.histogram("mcp_call_seconds", "...", kind="tools", name="x").observe(0.2).
+    Series are created on first use. The metric arguments are positional, so any label name
+    (including "name") can be used.
+    """
+    def __init__(self):
+        self._families: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._series: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, name: str, help: str, labels: Dict[str, Any], *args):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                family = self._families.setdefault(name, (kind, help))
+                if family[0] != kind:
+                    raise ValueError(f"metric {name} is a {family[0]}, not a {kind}")
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _TYPES[kind](*args)
+        return series
+
+    def counter(self, name: str, help: str = "", /, **labels) -> Counter:
+        return self._get("counter", name, help, labels)
+
+    def gauge(self, name: str, help: str = "", /, **labels) -> Gauge:
+        return self._get("gauge", name, help, labels)
+
+    def histogram(self, name: str, help: str = "", bounds: Sequence[float] = LATENCY_BUCKETS, /, **labels) -> Histogram:
+        return self._get("histogram", name, help, labels, bounds)
+
+    def time_call(self, kind: str, name: str, downstream: Optional[str] = None) -> "CallTimer":
+        """Starts timing one call of a tool/resource/agent (proxying to downstream, if given)."""
+        return CallTimer(self, kind, name, downstream)
+
+    def _items(self) -> List[Tuple[str, str, str, Dict[str, str], Any]]:
+        with self._lock:
+            families = dict(self._families)
+            series = list(self._series.items())
+        return [(name, *families[name], dict(labels), s) for (name, labels), s in sorted(series, key=lambda i: i[0])]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{family: {"type", "help", "series": [{labels..., values...}]}}; histograms report
+        count, sum, mean, max and p50/p95/p99."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for name, kind, help, labels, series in self._items():
+            family = out.setdefault(name, {"type": kind, "help": help, "series": []})
+            family["series"].append({**labels, **series.snapshot()})
+        return out
+
+    def prometheus(self) -> str:
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        current = None
+        for name, kind, help, labels, series in self._items():
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {_escape_help(help)}")
+                lines.append(f"# TYPE {name} {kind}")
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(series.value)}")
+                continue
+            with series._lock:
+                counts, count, total = list(series.counts), series.count, series.sum
+            cumulative = 0
+            for bound, n in zip(series.bounds + (math.inf,), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+class CallTimer:
+    """In-flight gauges go up when the timer starts; done() records the outcome and latency."""
+    __slots__ = ("metrics", "labels", "downstream", "start")
+
+    def __init__(self, metrics: Metrics, kind: str, name: str, downstream: Optional[str]):
+        self.metrics = metrics
+        self.labels = {"kind": kind, "name": name}
+        self.downstream = downstream
+        metrics.gauge("mcp_calls_in_flight", "Tool, resource and agent calls running", **self.labels).inc()
+        if downstream:
+            metrics.gauge("mcp_downstream_calls_in_flight", "Calls running on each downstream", downstream=downstream).inc()
+        self.start = time.perf_counter()
+
+    def done(self, error: bool = False):
+        seconds = time.perf_counter() - self.start
+        m = self.metrics
+        m.gauge("mcp_calls_in_flight", **self.labels).dec()
+        m.counter("mcp_calls_total", "Tool, resource and agent calls", **self.labels).inc()
+        if error:
+            m.counter("mcp_call_errors_total", "Calls that raised or returned an error", **self.labels).inc()
+        m.histogram("mcp_call_seconds", "Call latency, until the last chunk for streams", **self.labels).observe(seconds)
+        if self.downstream:
+            d = self.downstream
+            m.gauge("mcp_downstream_calls_in_flight", downstream=d).dec()
+            m.counter("mcp_downstream_calls_total", "Calls proxied to each downstream", downstream=d).inc()
+            if error:
+                m.counter("mcp_downstream_errors_total", "Proxied calls that failed", downstream=d).inc()
+            m.histogram("mcp_downstream_call_seconds", "Latency of proxied calls, seen from the router", downstream=d).observe(seconds)
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+def serve_prometheus(metrics: Metrics, host: str, port: int):
+    """Serves metrics.prometheus() at /metrics over HTTP on a daemon thread. Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
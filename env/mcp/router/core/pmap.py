@@ -0,0 +1,177 @@
+# core/pmap.py
+# Persistent (immutable) map for the registry: a hash array mapped trie whose set() and delete()
+# return a new map sharing all but O(log n) nodes with the old one, so publishing a registry
+# version costs O(entries changed) rather than a copy of every dict. Iteration follows insertion
+# order, like a dict: a key keeps its position when its value is replaced.
+from typing import Any, Iterator, List, Optional, Tuple
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_BITS = 64
+
+def _hash(key) -> int:
+    return hash(key) & ((1 << _HASH_BITS) - 1)
+
+# A leaf is a tuple (key, hash, position, value); anything else in a node is a child node.
+
+class _Node:
+    __slots__ = ("bitmap", "items")
+
+    def __init__(self, bitmap: int, items: list):
+        self.bitmap = bitmap
+        self.items = items
+
+    def find(self, h: int, shift: int, key) -> Optional[tuple]:
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return None
+        item = self.items[bin(self.bitmap & (bit - 1)).count("1")]
+        if isinstance(item, tuple):
+            return item if item[0] == key else None
+        return item.find(h, shift + _BITS, key)
+
+    def assoc(self, shift: int, leaf: tuple) -> "_Node":
+        bit = 1 << ((leaf[1] >> shift) & _MASK)
+        index = bin(self.bitmap & (bit - 1)).count("1")
+        items = list(self.items)
+        if not self.bitmap & bit:
+            items.insert(index, leaf)
+            return _Node(self.bitmap | bit, items)
+        item = items[index]
+        if not isinstance(item, tuple):
+            items[index] = item.assoc(shift + _BITS, leaf)
+        elif item[0] == leaf[0]:
+            items[index] = leaf
+        else:
+            items[index] = _pair(item, leaf, shift + _BITS)
+        return _Node(self.bitmap, items)
+
+    def without(self, h: int, shift: int, key):
+        """The node without key (self if key is absent), or None once empty."""
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return self
+        index = bin(self.bitmap & (bit - 1)).count("1")
+        item = self.items[index]
+        if isinstance(item, tuple):
+            if item[0] != key:
+                return self
+            child = None
+        else:
+            child = item.without(h, shift + _BITS, key)
+            if child is item:
+                return self
+        items = list(self.items)
+        if child is None:
+            del items[index]
+            return _Node(self.bitmap & ~bit, items) if items else None
+        items[index] = child
+        return _Node(self.bitmap, items)
+
+    def leaves(self, out: list):
+        for item in self.items:
+            if isinstance(item, tuple):
+                out.append(item)
+            else:
+                item.leaves(out)
+
+class _Collision:
+    """Keys whose 64-bit hashes are equal."""
+    __slots__ = ("items",)
+
+    def __init__(self, items: list):
+        self.items = items
+
+    def find(self, h: int, shift: int, key) -> Optional[tuple]:
+        return next((leaf for leaf in self.items if leaf[0] == key), None)
+
+    def assoc(self, shift: int, leaf: tuple) -> "_Collision":
+        return _Collision([item for item in self.items if item[0] != leaf[0]] + [leaf])
+
+    def without(self, h: int, shift: int, key):
+        items = [item for item in self.items if item[0] != key]
+        if len(items) == len(self.items):
+            return self
+        return _Collision(items) if items else None
+
+    def leaves(self, out: list):
+        out.extend(self.items)
+
+def _pair(a: tuple, b: tuple, shift: int):
+    if shift >= _HASH_BITS:
+        return _Collision([a, b])
+    return _Node(0, []).assoc(shift, a).assoc(shift, b)
+
+class PMap:
+    __slots__ = ("_root", "_len", "_next", "_ordered")
+
+    def __init__(self, root=None, length: int = 0, next_position: int = 0):
+        self._root = root
+        self._len = length
+        self._next = next_position
+        self._ordered: Optional[List[tuple]] = None
+
+    def _find(self, key) -> Optional[tuple]:
+        return self._root.find(_hash(key), 0, key) if self._root is not None else None
+
+    def get(self, key, default=None):
+        leaf = self._find(key)
+        return leaf[3] if leaf is not None else default
+
+    def __getitem__(self, key):
+        leaf = self._find(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf[3]
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) is not None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def set(self, key, value) -> "PMap":
+        h = _hash(key)
+        old = self._root.find(h, 0, key) if self._root is not None else None
+        if old is not None:
+            if old[3] is value:
+                return self
+            return PMap(self._root.assoc(0, (key, h, old[2], value)), self._len, self._next)
+        root = self._root if self._root is not None else _Node(0, [])
+        return PMap(root.assoc(0, (key, h, self._next, value)), self._len + 1, self._next + 1)
+
+    def delete(self, key) -> "PMap":
+        """A map without key (this one if key is absent)."""
+        if self._root is None:
+            return self
+        root = self._root.without(_hash(key), 0, key)
+        if root is self._root:
+            return self
+        return PMap(root, self._len - 1, self._next)
+
+    def _leaves(self) -> List[tuple]:
+        # Computed once per map (maps never change), so repeated listings are cheap.
+        if self._ordered is None:
+            leaves: list = []
+            if self._root is not None:
+                self._root.leaves(leaves)
+            leaves.sort(key=lambda leaf: leaf[2])
+            self._ordered = leaves
+        return self._ordered
+
+    def __iter__(self) -> Iterator:
+        return (leaf[0] for leaf in self._leaves())
+
+    def keys(self) -> List[Any]:
+        return [leaf[0] for leaf in self._leaves()]
+
+    def values(self) -> List[Any]:
+        return [leaf[3] for leaf in self._leaves()]
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        return [(leaf[0], leaf[3]) for leaf in self._leaves()]
+
+    def __repr__(self) -> str:
+        return f"PMap({dict(self.items())!r})"
+
+EMPTY = PMap()
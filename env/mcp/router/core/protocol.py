@@ -0,0 +1,373 @@
+# core/protocol.py
+# Client-side plumbing shared by the downstream transports: a table of in-flight requests that
+# replies are matched against by id, and the multiplexed call/reader logic built on top of it.
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .codec import CODECS, JSON_LINES, hello_request
+from .registry import patch_listing
+from .tracing import CLIENT, tracer
+
+log = logging.getLogger(__name__)
+
+_ABANDONED = object()
+_RECENTLY_ABANDONED = 1024  # ids remembered after their slot is freed, to swallow late replies
+
+class PendingCalls:
+    """
+    In-flight request table. Each call gets a fresh integer id and a Future; replies are matched
+    back by their "id". A reply without an id resolves the oldest outstanding call, which keeps
+    servers that answer in order but do not echo ids working. A call given up on by its caller
+    frees its slot once the server has been seen to echo ids (a late reply is then recognised by
+    its id and swallowed); until then the slot is kept, abandoned, so the late reply is not matched
+    to the next call in line.
+
+    Streaming calls get a queue instead of a Future: progress frames ({"progress": ...}) are queued
+    as they arrive and the call stays open until its final frame.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[int, Any] = {}  # Future or queue.Queue, insertion ordered, oldest first
+        self._ids = itertools.count(1)
+        self._closed: Optional[BaseException] = None
+        self._echoes_ids = False
+        self._abandoned: Dict[int, None] = {}  # recently abandoned ids whose slots were freed, oldest first
+
+    def open(self) -> Tuple[int, Future]:
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise self._closed
+            req_id = next(self._ids)
+            self._calls[req_id] = fut
+        return req_id, fut
+
+    def open_stream(self) -> Tuple[int, "queue.Queue"]:
+        frames: queue.Queue = queue.Queue()
+        with self._lock:
+            if self._closed:
+                raise self._closed
+            req_id = next(self._ids)
+            self._calls[req_id] = frames
+        return req_id, frames
+
+    def resolve(self, msg: Dict[str, Any]) -> bool:
+        """Completes the call a reply belongs to. Returns False if no call was waiting for it."""
+        req_id = msg.pop("id", None)
+        final = "progress" not in msg
+        with self._lock:
+            if req_id is None:
+                if not self._calls:
+                    return False
+                req_id = next(iter(self._calls))
+            else:
+                self._echoes_ids = True
+                if req_id in self._abandoned:
+                    if final:
+                        del self._abandoned[req_id]
+                    return True
+            fut = self._calls.get(req_id)
+            if final:
+                self._calls.pop(req_id, None)
+        if fut is _ABANDONED:
+            return True
+        if isinstance(fut, queue.Queue):
+            fut.put(msg)
+            return True
+        if fut is None or fut.done() or not final:
+            return False
+        fut.set_result(msg)
+        return True
+
+    def abandon(self, req_id: int):
+        """Gives up on a call (e.g. after a timeout or when its stream is closed early)."""
+        with self._lock:
+            if req_id not in self._calls:
+                return
+            if not self._echoes_ids:
+                self._calls[req_id] = _ABANDONED
+                return
+            del self._calls[req_id]
+            self._abandoned[req_id] = None
+            if len(self._abandoned) > _RECENTLY_ABANDONED:
+                del self._abandoned[next(iter(self._abandoned))]
+
+    def fail_all(self, exc: BaseException, close: bool = False):
+        """Fails every outstanding call. With close=True, later open() calls raise exc too."""
+        with self._lock:
+            calls = list(self._calls.values())
+            self._calls.clear()
+            self._abandoned.clear()
+            if close:
+                self._closed = exc
+        for fut in calls:
+            if isinstance(fut, queue.Queue):
+                fut.put(exc)
+            elif fut is not _ABANDONED and not fut.done():
+                fut.set_exception(exc)
+
+    @property
+    def closed(self) -> bool:
+        """True once fail_all(..., close=True) ran, i.e. the connection is gone."""
+        return self._closed is not None
+
+    def __len__(self):
+        """Number of calls still waiting for a reply."""
+        with self._lock:
+            return sum(1 for fut in self._calls.values() if fut is not _ABANDONED)
+
+class FramedClient:
+    """
+    Client side of the router protocol, shared by TCPMCPClient and StdioMCPClient. Calls are tagged
+    with ids and multiplexed over one connection; a single reader thread decodes frames and resolves
+    the PendingCalls table. A hello handshake may switch both directions to a binary codec, and
+    enable_change_sync() keeps the fetched capabilities current from list_changed notifications.
+    Subclasses set self.name, implement _write() and run _read_frames() on their reader thread.
+    """
+    transport = "downstream"
+
+    def _init_framing(self, codecs: Optional[List[str]] = None):
+        """codecs: codec names to offer in the handshake, most preferred first (None: all supported)."""
+        self.codecs = codecs
+        self._codec = JSON_LINES
+        self._send_lock = threading.Lock()
+        self._pending = PendingCalls()
+        self._hello_id: Optional[int] = None
+        # Change sync (see enable_change_sync); list_diff runs off the reader thread, one at a time.
+        self._apply_changes: Optional[Callable[[Dict[str, Any], bool], None]] = None
+        self._synced_version: Optional[int] = None
+        self._sync_timeout: Optional[float] = None
+        self._sync_lock = threading.Lock()
+        self._sync_wanted = False
+        self._syncing = False
+
+    def _write(self, data: bytes):
+        """Writes one encoded frame. Called with self._send_lock held."""
+        raise NotImplementedError
+
+    def _send(self, message: Dict[str, Any]):
+        with self._send_lock:
+            self._write(self._codec.encode(message))
+
+    def _client_span(self, message: Dict[str, Any]):
+        # A span for one round trip; the downstream continues the trace from its traceparent.
+        return tracer().start_span(f"{self.transport} {message.get('type')}", CLIENT, attributes={
+            "mcp.downstream": self.name, "mcp.request.type": message.get("type", ""), "mcp.request.name": str(message.get("name", ""))})
+
+    def _request(self, message: Dict[str, Any], timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        span = self._client_span(message)
+        if span is None:
+            return self._round_trip(message, timeout)
+        resp = self._round_trip({**message, "traceparent": span.traceparent()}, timeout)
+        if resp is None:
+            span.set_error("no reply")
+        elif "error" in resp:
+            span.set_error(str(resp["error"]))
+        span.end()
+        return resp
+
+    def _round_trip(self, message: Dict[str, Any], timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        pending = self._pending
+        try:
+            req_id, fut = pending.open()
+        except ConnectionError as e:
+            log.error(f"{self.transport} call error: {e}")
+            return None
+        try:
+            self._send({**message, "id": req_id})
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            log.error(f"{self.transport} call to '{self.name}' timed out after {timeout}s: {message.get('type')} {message.get('name', '')}")
+            return None
+        except Exception as e:
+            log.error(f"{self.transport} call error:", exc_info=e)
+            return None
+        finally:
+            if not fut.done():
+                pending.abandon(req_id)
+
+    def _stream_request(self, message: Dict[str, Any], timeout: Optional[float]) -> Iterator[Any]:
+        """
+        Sends message with "stream" set and yields the chunks of the reply as they arrive. timeout
+        bounds the wait for each frame. Raises if the call fails; a downstream that returns a plain
+        result yields it as a single chunk.
+        """
+        pending = self._pending
+        req_id, frames = pending.open_stream()
+        span = self._client_span(message)
+        if span is not None:
+            message = {**message, "traceparent": span.traceparent()}
+        try:
+            self._send({**message, "id": req_id, "stream": True})
+            while True:
+                try:
+                    msg = frames.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"{self.transport} stream from '{self.name}' timed out after {timeout}s: {message.get('name', '')}")
+                if isinstance(msg, BaseException):
+                    raise msg
+                if "progress" in msg:
+                    yield msg["progress"]
+                    continue
+                if "error" in msg:
+                    raise RuntimeError(msg["error"])
+                if "result" in msg:
+                    yield msg["result"]
+                return
+        except Exception as e:
+            if span is not None:
+                span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            # No-op once the final frame arrived; otherwise later frames are swallowed.
+            pending.abandon(req_id)
+            if span is not None:
+                span.end()
+
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    @property
+    def codec(self) -> str:
+        return self._codec.name
+
+    def negotiate_codec(self, timeout: float = 5.0) -> str:
+        """
+        Offers this side's codecs to the downstream. If it accepts one, both directions switch to it
+        right after its reply; downstreams that do not know "hello" stay on JSON lines. Must run
+        before any other call on the connection. Returns the codec in use.
+        """
+        offered = self.codecs if self.codecs is not None else list(CODECS)
+        if not offered or offered == [JSON_LINES.name]:
+            return self._codec.name
+        pending = self._pending
+        try:
+            req_id, fut = pending.open()
+        except ConnectionError:
+            return self._codec.name
+        self._hello_id = req_id
+        try:
+            with self._send_lock:
+                self._write(JSON_LINES.encode({**hello_request(offered), "id": req_id}))
+            resp = fut.result(timeout=timeout)
+        except Exception as e:
+            log.info(f"Codec negotiation with '{self.name}' failed, staying on JSON lines: {e or type(e).__name__}")
+            resp = None
+        finally:
+            if not fut.done():
+                pending.abandon(req_id)
+        if resp and resp.get("ok"):
+            log.info(f"Using codec '{self._codec.name}' for '{self.name}'")
+        return self._codec.name
+
+    def enable_change_sync(self, apply: Callable[[Dict[str, Any], bool], None], timeout: Optional[float] = 5.0) -> bool:
+        """
+        Subscribes to the downstream's list_changed notifications. For each one, the diff since the
+        last applied listing version is fetched with list_diff and passed to apply(diff, False), and
+        self.capabilities is patched to match; if the downstream no longer has that version, its
+        full listing is passed as apply(listing, True) instead. Call once self.capabilities has been
+        fetched and registered. Returns False for downstreams without versioned listings or change
+        notifications; those keep the capabilities of the initial handshake.
+        """
+        capabilities = self.capabilities or {}
+        if "version" not in capabilities:
+            return False
+        self._apply_changes, self._synced_version, self._sync_timeout = apply, capabilities["version"], timeout
+        resp = self._request({"type": "subscribe_changes"}, timeout)
+        if not resp or not resp.get("ok"):
+            self._apply_changes = None
+            log.info(f"'{self.name}' does not send change notifications")
+            return False
+        if resp.get("version") != self._synced_version:
+            # Changed between the handshake and the subscription.
+            self._on_list_changed(resp.get("version"))
+        return True
+
+    def _on_list_changed(self, version: Optional[int]):
+        if self._apply_changes is None or version == self._synced_version:
+            return
+        with self._sync_lock:
+            self._sync_wanted = True
+            if self._syncing:
+                return
+            self._syncing = True
+        threading.Thread(target=self._sync_changes, name=f"sync-{self.name}", daemon=True).start()
+
+    def _sync_changes(self):
+        # Notifications that arrive meanwhile are coalesced into one more round.
+        while True:
+            with self._sync_lock:
+                if not self._sync_wanted or self._pending.closed:
+                    self._syncing = False
+                    return
+                self._sync_wanted = False
+            self._sync_once()
+
+    def _sync_once(self):
+        resp = self._request({"type": "list_diff", "since": self._synced_version}, self._sync_timeout)
+        if not resp or "error" in resp:
+            log.warning(f"Failed to fetch capability changes from '{self.name}': {resp and resp.get('error')}")
+            return
+        full = bool(resp.pop("full", False))
+        try:
+            self._apply_changes(resp, full)
+        except Exception as e:
+            log.error(f"Failed to apply capability changes from '{self.name}'", exc_info=e)
+            return
+        self.capabilities = resp if full else patch_listing(self.capabilities, resp)
+        self._synced_version = resp.get("version")
+        log.info(f"Synced capabilities of '{self.name}' to version {self._synced_version}" + (" (full listing)" if full else ""))
+
+    def _read_frames(self, read: Callable[[], bytes], pending: PendingCalls):
+        """Reader thread body: read() returns the next chunk of bytes, or b"" at end of stream."""
+        codec = JSON_LINES
+        reader = codec.frame_reader()
+        try:
+            while True:
+                frame = reader.next_frame()
+                if frame is None:
+                    chunk = read()
+                    if not chunk:
+                        break
+                    reader.feed(chunk)
+                    continue
+                if codec is JSON_LINES and not frame.strip():
+                    continue
+                try:
+                    msg = codec.decode(frame)
+                except Exception as e:
+                    log.error(f"Invalid frame from '{self.name}': {e}")
+                    continue
+                if not isinstance(msg, dict):
+                    log.error(f"Invalid frame from '{self.name}': not an object")
+                    continue
+                if self._hello_id is not None and msg.get("id") == self._hello_id:
+                    self._hello_id = None
+                    switched = CODECS.get(msg.get("codec")) if msg.get("ok") else None
+                    if switched is not None and switched is not codec:
+                        # The downstream switches right after this reply; so do both directions here.
+                        with self._send_lock:
+                            self._codec = switched
+                        rest = reader.rest()
+                        codec = switched
+                        reader = codec.frame_reader()
+                        reader.feed(rest)
+                self._on_message(msg, pending)
+        except (OSError, ValueError) as e:
+            log.debug(f"{self.transport} reader for '{self.name}' stopped: {e}")
+        finally:
+            self._on_disconnect(pending)
+
+    def _on_message(self, msg: Dict[str, Any], pending: PendingCalls):
+        if "id" not in msg and msg.get("type") == "list_changed":
+            # A notification, not a reply: it must not complete the oldest call.
+            self._on_list_changed(msg.get("version"))
+            return
+        if not pending.resolve(msg):
+            log.warning(f"Dropping unmatched reply from '{self.name}': {msg}")
+
+    def _on_disconnect(self, pending: PendingCalls):
+        pending.fail_all(ConnectionError(f"connection to '{self.name}' closed"), close=True)
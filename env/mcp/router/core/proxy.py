@@ -0,0 +1,96 @@
+# core/proxy.py
+# Registers prefixed proxy tools/resources/agents for a downstream server's capabilities.
+import logging
+from typing import Any, Callable, Dict, Iterator, Optional
+from .registry import KINDS, MCPRegistry, Tool, Resource, Agent
+
+log = logging.getLogger(__name__)
+
+def downstream_namespace(name: str) -> str:
+    """Registry namespace that owns the proxies of the downstream called name."""
+    return f"downstream:{name}"
+
+def downstream_name(namespace: Optional[str]) -> Optional[str]:
+    """The downstream whose proxies a namespace holds, or None for other namespaces."""
+    if namespace and namespace.startswith("downstream:"):
+        return namespace[len("downstream:"):]
+    return None
+
+def register_proxies(registry: MCPRegistry, namespace: str, prefix: str, capabilities: Dict[str, Any], call: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                     stream: Optional[Callable[[Dict[str, Any]], Iterator[Any]]] = None):
+    """
+    Replaces the proxies owned by namespace in one atomic registry update.
+    capabilities: a downstream list_all reply, e.g. {"tools": [{"name":"summarize"}], "resources":[...], "agents":[...]}
+    call: sends one request to the downstream and returns its reply
+    stream: sends a streaming request and returns an iterator over its chunks; used for tools the
+            downstream advertises as streaming
+    """
+    tools, resources, agents = make_proxies(prefix, capabilities, call, stream)
+    registry.register_namespace(namespace, tools=tools, resources=resources, agents=agents)
+
+def apply_capability_diff(registry: MCPRegistry, namespace: str, prefix: str, diff: Dict[str, Any], call: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                          stream: Optional[Callable[[Dict[str, Any]], Iterator[Any]]] = None):
+    """
+    Applies a downstream list_diff reply ({"added": {...}, "changed": {...}, "removed": {...}}) to the
+    proxies owned by namespace in one atomic registry update. Unchanged proxies are kept as they are.
+    """
+    upserts = {kind: diff.get("added", {}).get(kind, []) + diff.get("changed", {}).get(kind, []) for kind in KINDS}
+    tools, resources, agents = make_proxies(prefix, upserts, call, stream)
+    remove = {kind: [f"{prefix}{n}" for n in names] for kind, names in diff.get("removed", {}).items()}
+    registry.update_namespace(namespace, tools=tools, resources=resources, agents=agents, remove=remove)
+
+def proxy_sync(registry: MCPRegistry, namespace: str, prefix: str, call: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+               stream: Optional[Callable[[Dict[str, Any]], Iterator[Any]]] = None) -> Callable[[Dict[str, Any], bool], None]:
+    """An apply function for FramedClient.enable_change_sync that keeps namespace's proxies current."""
+    def apply(changes: Dict[str, Any], full: bool):
+        if full:
+            register_proxies(registry, namespace, prefix, changes, call, stream)
+        else:
+            apply_capability_diff(registry, namespace, prefix, changes, call, stream)
+    return apply
+
+def make_proxies(prefix: str, capabilities: Dict[str, Any], call: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                 stream: Optional[Callable[[Dict[str, Any]], Iterator[Any]]] = None):
+    """Builds the prefixed proxy tools, resources and agents for capabilities (see register_proxies)."""
+    def make_call(req_type: str, n: str):
+        def run(args):
+            return call({"type": req_type, "name": n, "args": args})
+        return run
+
+    def make_stream(n: str):
+        def run(args):
+            return stream({"type": "run_tool", "name": n, "args": args})
+        return run
+
+    tools, resources, agents = {}, {}, {}
+    for t in capabilities.get("tools", []):
+        name = f"{prefix}{t['name']}"
+        streaming = bool(t.get("streaming")) and stream is not None
+        tools[name] = Tool(
+            name=name,
+            description=t.get("description", ""),
+            parameters=t.get("parameters", []),
+            run_fn=make_stream(t["name"]) if streaming else make_call("run_tool", t["name"]),
+            cacheable=t.get("cacheable", False),
+            cache_ttl=t.get("cache_ttl", 30.0),
+            streaming=streaming,
+            invalidates=t.get("invalidates", False)
+        )
+    for r in capabilities.get("resources", []):
+        name = f"{prefix}{r['name']}"
+        resources[name] = Resource(
+            name=name,
+            description=r.get("description", ""),
+            access_fn=make_call("access_resource", r["name"]),
+            cacheable=r.get("cacheable", False),
+            cache_ttl=r.get("cache_ttl", 30.0)
+        )
+    for a in capabilities.get("agents", []):
+        name = f"{prefix}{a['name']}"
+        agents[name] = Agent(
+            name=name,
+            description=a.get("description", ""),
+            run_fn=make_call("run_agent", a["name"]),
+            invalidates=a.get("invalidates", False)
+        )
+    return tools, resources, agents
@@ -0,0 +1,66 @@
+# core/readiness.py
+# Waits for a downstream to become ready by retrying a probe with exponential backoff and jitter,
+# instead of sleeping for a fixed time and hoping. Shared by the stdio, TCP and docker transports.
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+log = logging.getLogger(__name__)
+
+class GiveUp(Exception):
+    """Raised by a probe when retrying cannot help (e.g. the downstream process exited)."""
+
+class ReadinessTimeout(TimeoutError):
+    pass
+
+class Readiness:
+    """How long a downstream took to become ready, and how many probes it took."""
+    __slots__ = ("seconds", "attempts")
+
+    def __init__(self, seconds: float, attempts: int):
+        self.seconds = seconds
+        self.attempts = attempts
+
+    def as_dict(self):
+        return {"seconds": round(self.seconds, 3), "attempts": self.attempts}
+
+def backoff_delays(initial: float = 0.02, factor: float = 2.0, max_delay: float = 1.0, jitter: float = 0.2,
+                   rng: Optional[random.Random] = None):
+    """Yields initial, initial*factor, ... capped at max_delay, each scaled by a random factor in
+    [1 - jitter, 1 + jitter] so that many downstreams started together do not probe in lockstep."""
+    rng = rng or random
+    delay = initial
+    while True:
+        yield delay * rng.uniform(1.0 - jitter, 1.0 + jitter)
+        delay = min(delay * factor, max_delay)
+
+def wait_ready(name: str, probe: Callable[[float], bool], timeout: float, initial: float = 0.02,
+               max_delay: float = 1.0, jitter: float = 0.2) -> Readiness:
+    """
+    Calls probe(remaining_seconds) until it returns True, sleeping with exponential backoff between
+    attempts. A probe that returns False or raises OSError/TimeoutError is retried until timeout;
+    GiveUp stops at once. Raises ReadinessTimeout with the last error when the deadline passes.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    last_error: Optional[BaseException] = None
+    attempts = 0
+    delays = backoff_delays(initial, max_delay=max_delay, jitter=jitter)
+    while True:
+        attempts += 1
+        try:
+            if probe(max(deadline - time.monotonic(), 0.001)):
+                ready = Readiness(time.monotonic() - start, attempts)
+                log.info(f"'{name}' ready after {ready.seconds:.3f}s ({attempts} attempt(s))")
+                return ready
+            last_error = None
+        except GiveUp:
+            raise
+        except (OSError, TimeoutError) as e:
+            last_error = e
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            detail = f": {last_error}" if last_error else ""
+            raise ReadinessTimeout(f"'{name}' not ready after {timeout}s ({attempts} attempt(s)){detail}")
+        time.sleep(min(next(delays), remaining))
@@ -1,92 +1,360 @@
 # core/registry.py
-from typing import Dict, Any, Callable
+from collections import deque
+from typing import Dict, Any, Callable, Deque, List, Optional, Tuple
+import json
+import logging
 import threading
+from .pmap import EMPTY, PMap
+
+log = logging.getLogger(__name__)
 
 class Tool:
-    def __init__(self, name: str, description: str, run_fn: Callable, parameters: list = []):
+    def __init__(self, name: str, description: str, run_fn: Callable, parameters: list = [], cacheable: bool = False, cache_ttl: float = 30.0,
+                 streaming: bool = False, invalidates: bool = False):
+        """
+        cacheable: results may be served from the router's result cache for cache_ttl seconds.
+        invalidates: running it may change what cacheable components of the same module or
+        downstream return, so it drops their cached results.
+        streaming: run_fn returns a generator or async iterator of chunks. Any tool may do so; the flag
+        is advertised so that routers proxying this tool stream it too.
+        """
         self.name = name
         self.description = description
         self.run = run_fn
         self.parameters = parameters
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.streaming = streaming
+        self.invalidates = invalidates
 
 class Resource:
-    def __init__(self, name: str, description: str, access_fn: Callable):
+    def __init__(self, name: str, description: str, access_fn: Callable, cacheable: bool = False, cache_ttl: float = 30.0):
         self.name = name
         self.description = description
         self.access = access_fn
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
 
 class Agent:
-    def __init__(self, name: str, description: str, run_fn: Callable):
+    def __init__(self, name: str, description: str, run_fn: Callable, invalidates: bool = False):
+        """invalidates: as for Tool."""
         self.name = name
         self.description = description
         self.run = run_fn
+        self.invalidates = invalidates
+
+KINDS = ("tools", "resources", "agents")
+
+def _with_hints(entry: Dict[str, Any], component) -> Dict[str, Any]:
+    # Only advertised when set, so downstream proxies can be cached and streamed too.
+    if getattr(component, "cacheable", False):
+        entry["cacheable"] = True
+        entry["cache_ttl"] = component.cache_ttl
+    if getattr(component, "streaming", False):
+        entry["streaming"] = True
+    if getattr(component, "invalidates", False):
+        entry["invalidates"] = True
+    return entry
+
+def describe_component(kind: str, name: str, component) -> Dict[str, Any]:
+    """The listing entry clients see for a component of the given kind."""
+    if kind == "tools":
+        return _with_hints({"name": name, "description": component.description, "parameters": component.parameters}, component)
+    if kind == "resources":
+        return _with_hints({"name": name, "description": component.description}, component)
+    return _with_hints({"name": name, "description": component.description}, component)
+
+def diff_listings(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """What changed between two listings: entries added or changed, and names removed, per kind."""
+    diff = {"added": {}, "changed": {}, "removed": {}}
+    for kind in KINDS:
+        before = {e["name"]: e for e in old.get(kind, [])}
+        after = {e["name"]: e for e in new.get(kind, [])}
+        added = [e for n, e in after.items() if n not in before]
+        changed = [e for n, e in after.items() if n in before and before[n] != e]
+        removed = [n for n in before if n not in after]
+        for key, entries in (("added", added), ("changed", changed), ("removed", removed)):
+            if entries:
+                diff[key][kind] = entries
+    return diff
+
+def patch_listing(listing: Dict[str, Any], diff: Dict[str, Any]) -> Dict[str, Any]:
+    """Applies a diff_listings() result to a listing, returning a new listing."""
+    patched = dict(listing)
+    for kind in KINDS:
+        removed = set(diff.get("removed", {}).get(kind, ()))
+        updates = {e["name"]: e for e in diff.get("changed", {}).get(kind, []) + diff.get("added", {}).get(kind, [])}
+        if not removed and not updates:
+            continue
+        entries = [updates.pop(e["name"], e) for e in listing.get(kind, []) if e["name"] not in removed]
+        patched[kind] = entries + list(updates.values())
+    if "version" in diff:
+        patched["version"] = diff["version"]
+    return patched
+
+class RegistryState:
+    """
+    One immutable, versioned view of the registry. Writers publish a new state instead of
+    mutating this one, so readers can use it without taking a lock. The per-kind maps are
+    persistent (see core/pmap.py), so a new state shares everything but the changed entries with
+    the previous one. The client listing and its JSON encoding are computed once per version.
+
+    namespaces maps an owner (e.g. "downstream:analytics" or "module:tools.docker_tools") to the
+    (kind, name) pairs it owns; owners maps (kind, name) back to the namespace that owns it.
+    """
+    __slots__ = ("version", "tools", "resources", "agents", "namespaces", "owners", "_listing", "_encoded")
+
+    def __init__(self, version: int, tools: PMap, resources: PMap, agents: PMap, namespaces: PMap, owners: PMap):
+        self.version = version
+        self.tools = tools
+        self.resources = resources
+        self.agents = agents
+        self.namespaces = namespaces
+        self.owners = owners
+        self._listing: Optional[Dict[str, Any]] = None
+        self._encoded: Optional[bytes] = None
+
+    def listing(self) -> Dict[str, Any]:
+        if self._listing is None:
+            self._listing = {
+                "tools": [describe_component("tools", k, v) for k, v in self.tools.items()],
+                "resources": [describe_component("resources", k, v) for k, v in self.resources.items()],
+                "agents": [describe_component("agents", k, v) for k, v in self.agents.items()],
+                "version": self.version,
+            }
+        return self._listing
+
+    def encoded_listing(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = json.dumps(self.listing()).encode("utf-8")
+        return self._encoded
+
+def _discard_owned(namespaces: PMap, namespace: str, key: Tuple[str, str]) -> PMap:
+    # Drops key from namespace's entries, and the namespace once it owns nothing.
+    names = namespaces.get(namespace)
+    if names is None or key not in names:
+        return namespaces
+    names = names.delete(key)
+    return namespaces.set(namespace, names) if names else namespaces.delete(namespace)
+
+class _Update:
+    """The maps of a state being built by one write, and the previous object of every (kind, name)
+    it touched (None if there was none), which is all diff_since() needs from the history."""
+    def __init__(self, state: RegistryState):
+        self.entries = {kind: getattr(state, kind) for kind in KINDS}
+        self.namespaces = state.namespaces
+        self.owners = state.owners
+        self.changes: Dict[Tuple[str, str], Any] = {}
+
+    def put(self, kind: str, name: str, obj, namespace: Optional[str]):
+        key = (kind, name)
+        self.changes.setdefault(key, self.entries[kind].get(name))
+        self.entries[kind] = self.entries[kind].set(name, obj)
+        previous_owner = self.owners.get(key)
+        if previous_owner is not None and previous_owner != namespace:
+            self.namespaces = _discard_owned(self.namespaces, previous_owner, key)
+        if namespace is None:
+            self.owners = self.owners.delete(key)
+        else:
+            self.owners = self.owners.set(key, namespace)
+
+    def drop(self, kind: str, name: str):
+        key = (kind, name)
+        self.changes.setdefault(key, self.entries[kind].get(name))
+        self.entries[kind] = self.entries[kind].delete(name)
+        owner = self.owners.get(key)
+        if owner is not None:
+            self.owners = self.owners.delete(key)
+            self.namespaces = _discard_owned(self.namespaces, owner, key)
 
 class MCPRegistry:
-    def __init__(self):
-        self._tools: Dict[str, Tool] = {}
-        self._resources: Dict[str, Resource] = {}
-        self._agents: Dict[str, Agent] = {}
+    def __init__(self, history: int = 64):
+        """history: how many recent versions (including the current one) diff_since() can diff from."""
+        self._state = RegistryState(0, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY)
+        # (version, previous objects of the entries it changed) for the versions after the oldest kept one.
+        self._history: Deque[Tuple[int, Dict[Tuple[str, str], Any]]] = deque(maxlen=max(0, history - 1))
+        # Serializes writers only; readers go through the current immutable state.
         self._lock = threading.RLock()
+        self._listeners: List[Callable[[Optional[str]], None]] = []
 
-    # Tools
-    def register_tool(self, name: str, tool: Tool):
+    def add_listener(self, callback: Callable[[Optional[str]], None]):
+        """callback(namespace) is called after every change, with the namespace that changed (None if unowned)."""
+        self._listeners.append(callback)
+
+    def _notify(self, namespace: Optional[str]):
+        for callback in list(self._listeners):
+            try:
+                callback(namespace)
+            except Exception as e:
+                log.error(f"registry listener error: {e}", exc_info=True)
+
+    def _publish(self, update: _Update):
+        # Caller holds self._lock.
+        self._state = RegistryState(self._state.version + 1, update.entries["tools"], update.entries["resources"],
+                                    update.entries["agents"], update.namespaces, update.owners)
+        self._history.append((self._state.version, update.changes))
+
+    @property
+    def version(self) -> int:
+        return self._state.version
+
+    def state(self) -> RegistryState:
+        return self._state
+
+    def diff_since(self, version: int) -> Optional[Dict[str, Any]]:
+        """The listing diff from version to the current one (see diff_listings), tagged with both
+        versions. None when version is no longer in the history (the caller needs a full listing)."""
         with self._lock:
-            self._tools[name] = tool
+            current = self._state
+            history = list(self._history)
+        oldest = history[0][0] - 1 if history else current.version
+        if not isinstance(version, int) or not oldest <= version <= current.version:
+            return None
+        before: Dict[Tuple[str, str], Any] = {}
+        for changed_in, changes in history:
+            if changed_in > version:
+                for key, obj in changes.items():
+                    before.setdefault(key, obj)
+        diff = {"added": {}, "changed": {}, "removed": {}}
+        for (kind, name), old in before.items():
+            new = getattr(current, kind).get(name)
+            old_entry = describe_component(kind, name, old) if old is not None else None
+            new_entry = describe_component(kind, name, new) if new is not None else None
+            if old_entry == new_entry:
+                continue
+            if old_entry is None:
+                diff["added"].setdefault(kind, []).append(new_entry)
+            elif new_entry is None:
+                diff["removed"].setdefault(kind, []).append(name)
+            else:
+                diff["changed"].setdefault(kind, []).append(new_entry)
+        return {"since": version, "version": current.version, **diff}
 
-    def remove_tool(self, name: str):
+    def _set(self, kind: str, name: str, obj, namespace: Optional[str]):
         with self._lock:
-            if name in self._tools:
-                del self._tools[name]
+            update = _Update(self._state)
+            previous_owner = update.owners.get((kind, name))
+            update.put(kind, name, obj, namespace)
+            if namespace is not None:
+                update.namespaces = update.namespaces.set(namespace, update.namespaces.get(namespace, EMPTY).set((kind, name), True))
+            self._publish(update)
+        self._notify(namespace)
+        if previous_owner is not None and previous_owner != namespace:
+            self._notify(previous_owner)
 
-    def list_tools(self):
+    def _remove(self, kind: str, name: str):
         with self._lock:
-            return list(self._tools.keys())
+            update = _Update(self._state)
+            if name not in update.entries[kind]:
+                return
+            owner = update.owners.get((kind, name))
+            update.drop(kind, name)
+            self._publish(update)
+        self._notify(owner)
+
+    # Tools
+    def register_tool(self, name: str, tool: Tool, namespace: Optional[str] = None):
+        self._set("tools", name, tool, namespace)
+
+    def remove_tool(self, name: str):
+        self._remove("tools", name)
+
+    def list_tools(self):
+        return list(self._state.tools.keys())
 
     def get_tool(self, name: str):
-        with self._lock:
-            return self._tools.get(name)
+        return self._state.tools.get(name)
 
     # Resources
-    def register_resource(self, name: str, resource: Resource):
-        with self._lock:
-            self._resources[name] = resource
+    def register_resource(self, name: str, resource: Resource, namespace: Optional[str] = None):
+        self._set("resources", name, resource, namespace)
 
     def remove_resource(self, name: str):
-        with self._lock:
-            if name in self._resources:
-                del self._resources[name]
+        self._remove("resources", name)
 
     def list_resources(self):
-        with self._lock:
-            return list(self._resources.keys())
+        return list(self._state.resources.keys())
 
     def get_resource(self, name: str):
-        with self._lock:
-            return self._resources.get(name)
+        return self._state.resources.get(name)
 
     # Agents
-    def register_agent(self, name: str, agent: Agent):
-        with self._lock:
-            self._agents[name] = agent
+    def register_agent(self, name: str, agent: Agent, namespace: Optional[str] = None):
+        self._set("agents", name, agent, namespace)
 
     def remove_agent(self, name: str):
-        with self._lock:
-            if name in self._agents:
-                del self._agents[name]
+        self._remove("agents", name)
 
     def list_agents(self):
-        with self._lock:
-            return list(self._agents.keys())
+        return list(self._state.agents.keys())
 
     def get_agent(self, name: str):
+        return self._state.agents.get(name)
+
+    # Namespaces
+    def register_namespace(self, namespace: str, tools: Optional[Dict[str, Tool]] = None,
+                           resources: Optional[Dict[str, Resource]] = None, agents: Optional[Dict[str, Agent]] = None) -> Dict[str, list]:
+        """
+        Atomically replaces everything owned by namespace with the given entries, publishing a single
+        new version. The work done is proportional to the size of the namespace, not the registry.
+        Returns the names that were removed, per kind.
+        """
+        new = {"tools": tools or {}, "resources": resources or {}, "agents": agents or {}}
+        removed: Dict[str, list] = {kind: [] for kind in KINDS}
         with self._lock:
-            return self._agents.get(name)
+            update = _Update(self._state)
+            for kind, name in update.namespaces.get(namespace, EMPTY):
+                if name not in new[kind]:
+                    update.drop(kind, name)
+                    removed[kind].append(name)
+            owned = EMPTY
+            for kind in KINDS:
+                for name, obj in new[kind].items():
+                    update.put(kind, name, obj, namespace)
+                    owned = owned.set((kind, name), True)
+            if not update.changes:
+                return removed
+            update.namespaces = update.namespaces.set(namespace, owned) if owned else update.namespaces.delete(namespace)
+            self._publish(update)
+        self._notify(namespace)
+        return removed
 
-    # Full snapshot (for listing to clients)
-    def snapshot(self):
+    def update_namespace(self, namespace: str, tools: Optional[Dict[str, Tool]] = None, resources: Optional[Dict[str, Resource]] = None,
+                         agents: Optional[Dict[str, Agent]] = None, remove: Optional[Dict[str, List[str]]] = None):
+        """
+        Atomically adds or replaces the given entries in namespace and removes the names in remove
+        (per kind, only those namespace owns), leaving its other entries alone. Publishes one version.
+        """
+        upserts = {"tools": tools or {}, "resources": resources or {}, "agents": agents or {}}
+        remove = remove or {}
         with self._lock:
-            return {
-                "tools": [{"name": k, "description": v.description, "parameters": v.parameters} for k, v in self._tools.items()],
-                "resources": [{"name": k, "description": v.description} for k, v in self._resources.items()],
-                "agents": [{"name": k, "description": v.description} for k, v in self._agents.items()]
-            }
+            update = _Update(self._state)
+            for kind in KINDS:
+                for name in remove.get(kind, ()):
+                    if update.owners.get((kind, name)) == namespace and name not in upserts[kind]:
+                        update.drop(kind, name)
+            owned = update.namespaces.get(namespace, EMPTY)
+            for kind in KINDS:
+                for name, obj in upserts[kind].items():
+                    update.put(kind, name, obj, namespace)
+                    owned = owned.set((kind, name), True)
+            if not update.changes:
+                return
+            update.namespaces = update.namespaces.set(namespace, owned) if owned else update.namespaces.delete(namespace)
+            self._publish(update)
+        self._notify(namespace)
+
+    def remove_namespace(self, namespace: str) -> Dict[str, list]:
+        """Atomically removes everything owned by namespace. Returns the removed names, per kind."""
+        return self.register_namespace(namespace)
+
+    def list_namespace(self, namespace: str) -> Dict[str, list]:
+        owned = self._state.namespaces.get(namespace, EMPTY)
+        return {kind: [name for k, name in owned if k == kind] for kind in KINDS}
+
+    def list_namespaces(self):
+        return list(self._state.namespaces.keys())
+
+    # Full snapshot (for listing to clients). Cached per version: do not mutate the result.
+    def snapshot(self):
+        return self._state.listing()
@@ -0,0 +1,159 @@
+# core/replica_pool.py
+# A pool of identical local stdio downstreams behind one set of prefixed proxies.
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+from .registry import MCPRegistry, patch_listing
+from .stdio_client import StdioMCPClient
+from .proxy import register_proxies, proxy_sync, downstream_namespace
+
+log = logging.getLogger(__name__)
+
+class StdioReplicaPool:
+    def __init__(self, name: str, cmd: list, registry: MCPRegistry, prefix: str, replicas: int,
+                 call_timeout: float = 300.0, supervise_interval: float = 1.0):
+        """
+        Starts `replicas` copies of cmd. Calls go to the live replica with the fewest outstanding
+        requests; replicas that exit are restarted by a supervisor thread.
+        """
+        if replicas < 1:
+            raise ValueError("replicas must be >= 1")
+        self.name = name
+        self.cmd = cmd
+        self.registry = registry
+        self.prefix = prefix
+        self.call_timeout = call_timeout
+        self.supervise_interval = supervise_interval
+        self._replicas: List[Optional[StdioMCPClient]] = [None] * replicas
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+        self._stopped = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+        self.restarts = 0
+        self.capabilities: Optional[Dict[str, Any]] = None
+        self.readiness = None
+        self._leader: Optional[int] = None
+
+    def start(self, timeout: float = 10.0):
+        """Starts the replicas concurrently, so timeout bounds the whole pool's handshake rather than
+        each replica's in turn."""
+        count = len(self._replicas)
+        with ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"pool-{self.name}-start") as pool:
+            futures = [pool.submit(self._start_replica, i, timeout) for i in range(count)]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            for f in futures:
+                if f.exception() is None:
+                    f.result().stop()
+            raise errors[0]
+        self._replicas = [f.result() for f in futures]
+        # The first replica that answered is followed for capability changes.
+        leader = next((i for i, r in enumerate(self._replicas) if r.capabilities), None)
+        capabilities = self._replicas[leader].capabilities if leader is not None else None
+        self.capabilities = capabilities
+        ready = [r.readiness for r in self._replicas if r.readiness is not None]
+        # The pool is ready when its slowest replica is.
+        self.readiness = max(ready, key=lambda r: r.seconds) if ready else None
+        if capabilities:
+            log.info(f"Registering capabilities from '{self.name}' ({len(self._replicas)} replicas)")
+            register_proxies(self.registry, downstream_namespace(self.name), self.prefix, capabilities,
+                             lambda m: self.call(m, timeout=self.call_timeout),
+                             lambda m: self.stream(m, timeout=self.call_timeout))
+            self._follow(leader)
+        else:
+            log.warning(f"Failed to get capabilities from stdio pool '{self.name}'")
+        self._supervisor = threading.Thread(target=self._supervise, name=f"pool-{self.name}", daemon=True)
+        self._supervisor.start()
+
+    def _start_replica(self, index: int, timeout: float = 10.0) -> StdioMCPClient:
+        client = StdioMCPClient(name=f"{self.name}#{index}", cmd=self.cmd, registry=self.registry,
+                                prefix=self.prefix, call_timeout=self.call_timeout)
+        client.start(register=False, timeout=timeout)
+        return client
+
+    def _follow(self, index: int):
+        """Keeps the pool's proxies in step with the list_changed notifications of replica index."""
+        self._leader = index
+        sync = proxy_sync(self.registry, downstream_namespace(self.name), self.prefix,
+                          lambda m: self.call(m, timeout=self.call_timeout),
+                          lambda m: self.stream(m, timeout=self.call_timeout))
+
+        def apply(changes: Dict[str, Any], full: bool):
+            sync(changes, full)
+            self.capabilities = changes if full else patch_listing(self.capabilities, changes)
+
+        replica = self._replicas[index]
+        listed = lambda caps: {k: v for k, v in (caps or {}).items() if k != "version"}
+        if listed(replica.capabilities) != listed(self.capabilities):
+            # A restarted leader may have come back with a different listing.
+            apply(replica.capabilities, True)
+        replica.enable_change_sync(apply, timeout=self.call_timeout)
+
+    def _pick(self) -> Optional[StdioMCPClient]:
+        with self._lock:
+            live = [r for r in self._replicas if r is not None and r.is_alive()]
+        if not live:
+            return None
+        # Least outstanding requests; rotate the starting point so ties spread evenly.
+        offset = next(self._rr) % len(live)
+        live = live[offset:] + live[:offset]
+        return min(live, key=lambda r: r.in_flight())
+
+    def call(self, message: Dict[str, Any], timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        replica = self._pick()
+        if replica is None:
+            log.error(f"No live replicas for stdio pool '{self.name}'")
+            return None
+        return replica.call(message, timeout=timeout)
+
+    def stream(self, message: Dict[str, Any], timeout: float = 10.0) -> Iterator[Any]:
+        replica = self._pick()
+        if replica is None:
+            raise ConnectionError(f"no live replicas for stdio pool '{self.name}'")
+        return replica.stream(message, timeout=timeout)
+
+    def _supervise(self):
+        while not self._stopped.wait(self.supervise_interval):
+            for i, replica in enumerate(list(self._replicas)):
+                if self._stopped.is_set():
+                    return
+                if replica is not None and replica.is_alive():
+                    continue
+                log.warning(f"Replica {i} of stdio pool '{self.name}' is down, restarting")
+                if replica is not None:
+                    replica.stop()
+                try:
+                    fresh = self._start_replica(i)
+                except Exception as e:
+                    log.error(f"Failed to restart replica {i} of stdio pool '{self.name}'", exc_info=e)
+                    continue
+                with self._lock:
+                    if self._stopped.is_set():
+                        fresh.stop()
+                        return
+                    self._replicas[i] = fresh
+                    self.restarts += 1
+                if i == self._leader and fresh.capabilities:
+                    self._follow(i)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            replicas = list(self._replicas)
+        return {
+            "replicas": len(replicas),
+            "alive": sum(1 for r in replicas if r is not None and r.is_alive()),
+            "in_flight": [r.in_flight() if r is not None else 0 for r in replicas],
+            "restarts": self.restarts,
+        }
+
+    def stop(self):
+        log.info(f"Stopping stdio pool '{self.name}'")
+        self._stopped.set()
+        with self._lock:
+            replicas = list(self._replicas)
+            self._replicas = [None] * len(replicas)
+        for replica in replicas:
+            if replica is not None:
+                replica.stop()
@@ -0,0 +1,124 @@
+# core/result_cache.py
+# Router-level TTL + LRU cache for results of tools and resources that opt in with `cacheable`.
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+MISS = object()
+
+class _Entry:
+    __slots__ = ("value", "size", "expires", "component", "namespace")
+
+    def __init__(self, value, size: int, expires: float, component, namespace: Optional[str]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.component = component
+        self.namespace = namespace
+
+class ResultCache:
+    """
+    Keys are (kind, name, canonical JSON of args). Each entry remembers the component object that
+    produced it, so a result is never served once that name points at a reloaded or re-registered
+    component. Entries of a namespace are also dropped eagerly when it changes. Memory is bounded
+    by the encoded size of the cached results; the least recently used entries go first.
+    """
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], _Entry]" = OrderedDict()
+        self._by_namespace: Dict[str, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(kind: str, name: str, args: Any) -> Optional[Tuple[str, str, str]]:
+        try:
+            return (kind, name, json.dumps(args, sort_keys=True, separators=(",", ":")))
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, key, component) -> Any:
+        """Returns the cached value, or MISS."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= now or entry.component is not component:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key, value, ttl: float, component, namespace: Optional[str] = None):
+        try:
+            size = len(json.dumps(value))
+        except (TypeError, ValueError):
+            return
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(value, size, time.monotonic() + ttl, component, namespace)
+            self._bytes += size
+            if namespace is not None:
+                self._by_namespace.setdefault(namespace, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        # Caller holds self._lock.
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.namespace is not None:
+            keys = self._by_namespace.get(entry.namespace)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_namespace[entry.namespace]
+
+    def invalidate_namespace(self, namespace: Optional[str]):
+        if namespace is None:
+            return
+        with self._lock:
+            keys = self._by_namespace.get(namespace)
+            if not keys:
+                return
+            for key in list(keys):
+                self._drop(key)
+                self.invalidations += 1
+        log.debug(f"Invalidated cached results of {namespace}")
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_namespace.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
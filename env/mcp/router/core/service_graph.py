@@ -0,0 +1,198 @@
+# core/service_graph.py
+# Run-time dependency graph of the environment's services (Makefile *_RUN_DEPS plus compose
+# depends_on), their build-time graph (Makefile *_BUILD_DEPS: images built FROM other services'
+# images), and a launcher that starts independent services in parallel.
+import logging
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+log = logging.getLogger(__name__)
+
+COMPOSE_FILES = ("docker-compose.yaml", "docker-compose.yml", "compose.yaml", "compose.yml")
+
+_MAKE_ASSIGN = re.compile(r"^\s*([A-Za-z0-9_.-]+)_(RUN|BUILD)_DEPS\s*(\+?=|:=|::=|\?=)\s*(.*?)\s*$")
+_MAKE_INCLUDE = re.compile(r"^\s*-?include\s+(.+?)\s*$")
+
+def find_project_root(start: Optional[Path] = None) -> Optional[Path]:
+    """The nearest directory at or above start (default: the working directory) with a compose file."""
+    start = Path(start or Path.cwd()).resolve()
+    for directory in (start, *start.parents):
+        if any((directory / name).is_file() for name in COMPOSE_FILES):
+            return directory
+    return None
+
+def makefile_run_deps(path: Path) -> Dict[str, List[str]]:
+    """<service>_RUN_DEPS assignments of a Makefile and the files it includes (relative to its directory)."""
+    deps: Dict[str, List[str]] = {}
+    _read_makefile(Path(path), Path(path).parent, "RUN", deps, set())
+    return deps
+
+def makefile_build_deps(path: Path) -> Dict[str, List[str]]:
+    """<service>_BUILD_DEPS assignments, read like makefile_run_deps."""
+    deps: Dict[str, List[str]] = {}
+    _read_makefile(Path(path), Path(path).parent, "BUILD", deps, set())
+    return deps
+
+def _read_makefile(path: Path, base: Path, kind: str, deps: Dict[str, List[str]], seen: Set[Path]):
+    path = path.resolve()
+    if path in seen or not path.is_file():
+        return
+    seen.add(path)
+    for line in path.read_text().splitlines():
+        line = line.split("#", 1)[0]
+        match = _MAKE_ASSIGN.match(line)
+        if match:
+            service, assigned, op, value = match.groups()
+            if assigned != kind or op == "?=" and service in deps:
+                continue
+            names = value.split()
+            deps[service] = deps.get(service, []) + names if op == "+=" else names
+            continue
+        match = _MAKE_INCLUDE.match(line)
+        if match:
+            for included in match.group(1).split():
+                _read_makefile(base / included, base, kind, deps, seen)
+
+def compose_services(path: Path) -> Dict[str, List[str]]:
+    """Service names of a compose file, each with its depends_on services."""
+    import yaml  # PyYAML, see requirements.txt
+
+    data = yaml.safe_load(Path(path).read_text()) or {}
+    services = {}
+    for name, spec in (data.get("services") or {}).items():
+        depends_on = (spec or {}).get("depends_on") or []
+        services[name] = list(depends_on.keys()) if isinstance(depends_on, dict) else list(depends_on)
+    return services
+
+def load_service_graph(root: Path) -> Dict[str, List[str]]:
+    """service -> services it needs running first, merged from the compose file and the Makefile in root."""
+    root = Path(root)
+    graph: Dict[str, List[str]] = {}
+    compose_file = next((root / name for name in COMPOSE_FILES if (root / name).is_file()), None)
+    if compose_file:
+        graph.update(compose_services(compose_file))
+    if (root / "Makefile").is_file():
+        for service, deps in makefile_run_deps(root / "Makefile").items():
+            graph.setdefault(service, [])
+            graph[service] += [d for d in deps if d not in graph[service]]
+    for deps in list(graph.values()):
+        for dep in deps:
+            graph.setdefault(dep, [])
+    return graph
+
+def load_build_graph(root: Path) -> Dict[str, List[str]]:
+    """service -> services whose images its own image is built from (Makefile *_BUILD_DEPS), for
+    every service of load_service_graph(root)."""
+    root = Path(root)
+    graph: Dict[str, List[str]] = {service: [] for service in load_service_graph(root)}
+    if (root / "Makefile").is_file():
+        for service, deps in makefile_build_deps(root / "Makefile").items():
+            graph.setdefault(service, [])
+            graph[service] += [d for d in deps if d not in graph[service]]
+    for deps in list(graph.values()):
+        for dep in deps:
+            graph.setdefault(dep, [])
+    return graph
+
+def build_closure(graph: Dict[str, List[str]], build_graph: Dict[str, List[str]],
+                  targets: Iterable[str]) -> Dict[str, List[str]]:
+    """The build subgraph for launching targets: every service they need running, plus the services
+    those images are built from (which need not run). Raises ValueError like dependency_closure."""
+    return dependency_closure(build_graph, dependency_closure(graph, targets))
+
+def dependency_closure(graph: Dict[str, List[str]], targets: Iterable[str]) -> Dict[str, List[str]]:
+    """The subgraph of targets and everything they transitively need. Raises ValueError for unknown
+    services and dependency cycles."""
+    sub: Dict[str, List[str]] = {}
+    visiting: List[str] = []
+
+    def visit(service: str):
+        if service in sub:
+            return
+        if service in visiting:
+            cycle = visiting[visiting.index(service):] + [service]
+            raise ValueError(f"dependency cycle: {' -> '.join(cycle)}")
+        if service not in graph:
+            raise ValueError(f"unknown service: {service}")
+        visiting.append(service)
+        for dep in graph[service]:
+            visit(dep)
+        visiting.pop()
+        sub[service] = list(graph[service])
+
+    for target in targets:
+        visit(target)
+    return sub
+
+def launch_stack(graph: Dict[str, List[str]], targets: Iterable[str], launch: Callable[[str], Dict[str, Any]],
+                 max_parallel: int = 8) -> Dict[str, Any]:
+    """
+    Launches targets and their dependencies. A service is launched as soon as all of its dependencies
+    have launched successfully, so independent services start in parallel (up to max_parallel at a
+    time). launch(service) returns a dict whose "status" is "success" or an error status (any other
+    value, e.g. "error" or "timeout"); services whose dependencies did not succeed are skipped. Returns per-service timings and the critical path: the chain of
+    dependencies that determined when the last service was up.
+    """
+    sub = dependency_closure(graph, targets)
+    results: Dict[str, Dict[str, Any]] = {}
+    start = time.monotonic()
+
+    def run(service: str) -> Dict[str, Any]:
+        began = time.monotonic()
+        try:
+            outcome = launch(service)
+        except Exception as e:
+            log.error(f"Launching '{service}' failed: {e}", exc_info=True)
+            outcome = {"status": "error", "message": str(e)}
+        finished = time.monotonic()
+        return {"status": outcome.get("status", "error"), "started_at": round(began - start, 3),
+                "finished_at": round(finished - start, 3), "seconds": round(finished - began, 3),
+                "message": outcome.get("message", "")}
+
+    pending = dict(sub)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="launch") as pool:
+        while pending or running:
+            for service, deps in list(pending.items()):
+                failed = [d for d in deps if d in results and results[d]["status"] != "success"]
+                if failed:
+                    results[service] = {"status": "skipped", "message": f"dependencies failed: {', '.join(failed)}"}
+                    del pending[service]
+                elif all(results.get(d, {}).get("status") == "success" for d in deps):
+                    log.info(f"Launching '{service}'" + (f" (after {', '.join(deps)})" if deps else ""))
+                    running[pool.submit(run, service)] = service
+                    del pending[service]
+            if not running:
+                # Nothing can make progress (e.g. a dependency outside the graph); don't spin.
+                for service in pending:
+                    results[service] = {"status": "skipped", "message": "dependencies never became ready"}
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    total = round(time.monotonic() - start, 3)
+    critical = critical_path(sub, results)
+    ok = all(r["status"] == "success" for r in results.values())
+    log.info(f"Stack of {len(results)} service(s) {'up' if ok else 'failed'} in {total:.2f}s; critical path: {' -> '.join(critical)}")
+    return {
+        "status": "success" if ok else "error",
+        "total_seconds": total,
+        "services": {s: results[s] for s in sub},
+        "critical_path": critical,
+        "critical_path_seconds": round(sum(results[s]["seconds"] for s in critical), 3),
+    }
+
+def critical_path(graph: Dict[str, List[str]], results: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Walks back from the service that finished last through the dependency that finished last."""
+    launched = {s: r for s, r in results.items() if "finished_at" in r}
+    if not launched:
+        return []
+    path = [max(launched, key=lambda s: launched[s]["finished_at"])]
+    while True:
+        deps = [d for d in graph.get(path[-1], []) if d in launched]
+        if not deps:
+            return list(reversed(path))
+        path.append(max(deps, key=lambda d: launched[d]["finished_at"]))
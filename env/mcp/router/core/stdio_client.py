@@ -3,28 +3,44 @@
 import logging
 import subprocess
 import threading
-import json
 import time
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Iterator, List, Optional
 from .registry import MCPRegistry
+from .protocol import FramedClient, PendingCalls
+from .proxy import register_proxies, proxy_sync, downstream_namespace
+from .readiness import GiveUp, Readiness, ReadinessTimeout, wait_ready
 
 log = logging.getLogger(__name__)
 
-class StdioMCPClient:
-    def __init__(self, name: str, cmd: list, registry: MCPRegistry, prefix: str):
+class StdioMCPClient(FramedClient):
+    transport = "stdio"
+
+    def __init__(self, name: str, cmd: list, registry: MCPRegistry, prefix: str, call_timeout: float = 300.0,
+                 codecs: Optional[List[str]] = None):
         """
         cmd: list for subprocess (e.g. ["python", "my_mcp_server.py", "--stdio"])
         prefix: e.g. 'ANALYTICS_'
+        call_timeout: deadline in seconds for proxied tool/resource/agent calls
+        codecs: codecs offered in the handshake (None: all supported, ["json"]: skip the handshake)
         """
         self.name = name
         self.cmd = cmd
         self.proc: Optional[subprocess.Popen] = None
         self._reader_thread: Optional[threading.Thread] = None
+        self._stdout_thread: Optional[threading.Thread] = None
         self.registry = registry
         self.prefix = prefix
+        self.call_timeout = call_timeout
         self._alive = False
+        self.capabilities: Optional[Dict[str, Any]] = None
+        self.readiness: Optional[Readiness] = None
+        # Concurrent callers share stdin under a lock; one stdout reader matches replies by id.
+        self._init_framing(codecs)
 
-    def start(self):
+    def start(self, register: bool = True, timeout: float = 10.0):
+        """Starts the subprocess and fetches its capabilities; with register=False no proxies are registered.
+        timeout bounds the capabilities handshake; the downstream is probed until it answers instead of
+        being given a fixed head start."""
         log.info(f"Starting stdio client '{self.name}' with command: {' '.join(self.cmd)}")
         self.proc = subprocess.Popen(
             self.cmd,
@@ -34,91 +50,89 @@ class StdioMCPClient:
             bufsize=0
         )
         self._alive = True
-        self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._init_framing(self.codecs)
+        proc = self.proc
+        self._reader_thread = threading.Thread(target=self._read_loop, name=f"stdio-{self.name}-stderr", daemon=True)
         self._reader_thread.start()
-        # Give the process a moment, then init handshake
-        time.sleep(0.2)
-        self._do_init()
+        self._stdout_thread = threading.Thread(target=self._read_frames, args=(lambda: proc.stdout.read(65536), self._pending),
+                                               name=f"stdio-{self.name}", daemon=True)
+        self._stdout_thread.start()
+        self._do_init(register, timeout)
 
-    def _do_init(self):
-        # ask the server to list tools/resources/agents
-        res = self.call({"type": "list_all"})
-        if not res:
-            log.warning(f"Failed to get capabilities from stdio client '{self.name}'")
-            return
-        
-        log.info(f"Registering capabilities from '{self.name}'")
-        # expects res like: {"tools": [{"name":"summarize"}], "resources":[...], "agents":[...]}
-        for t in res.get("tools", []):
-            name = f"{self.prefix}{t['name']}"
-            # create a proxy tool that calls this server when invoked
-            def make_run(n):
-                def run(args):
-                    return self.call({"type": "run_tool", "name": n, "args": args})
-                return run
-            tool_obj = None
-            # lazy Tool object to store proxy run
-            from .registry import Tool
-            tool_obj = Tool(
-                name=name, 
-                description=t.get("description", ""), 
-                parameters=t.get("parameters", []), 
-                run_fn=make_run(t["name"])
-            )
-            self.registry.register_tool(name, tool_obj)
+    def _do_init(self, register: bool = True, timeout: float = 10.0):
+        negotiated = False
+
+        def handshake(remaining: float) -> bool:
+            nonlocal negotiated
+            deadline = time.monotonic() + remaining
+            if self._pending.closed:
+                raise GiveUp(f"exited with code {self.proc.poll() if self.proc else None}")
+            if not negotiated:
+                # Requests written before the process reads stdin just wait in the pipe.
+                negotiated = True
+                self.negotiate_codec(timeout=remaining)
+            # ask the server to list tools/resources/agents
+            res = self.call({"type": "list_all"}, timeout=max(deadline - time.monotonic(), 0.001))
+            if res is None and self._pending.closed:
+                raise GiveUp(f"exited with code {self.proc.poll() if self.proc else None}")
+            self.capabilities = res
+            return res is not None
 
-        for r in res.get("resources", []):
-            name = f"{self.prefix}{r['name']}"
-            from .registry import Resource
-            def make_access(n):
-                def access(args):
-                    return self.call({"type": "access_resource", "name": n, "args": args})
-                return access
-            res_obj = Resource(name=name, description=r.get("description", ""), access_fn=make_access(r["name"]))
-            self.registry.register_resource(name, res_obj)
+        try:
+            self.readiness = wait_ready(self.name, handshake, timeout)
+        except (GiveUp, ReadinessTimeout) as e:
+            log.warning(f"Failed to get capabilities from stdio client '{self.name}': {e}")
+            return
+        res = self.capabilities
+        if register:
+            log.info(f"Registering capabilities from '{self.name}'")
+            namespace = downstream_namespace(self.name)
+            call = lambda m: self.call(m, timeout=self.call_timeout)
+            stream = lambda m: self.stream(m, timeout=self.call_timeout)
+            register_proxies(self.registry, namespace, self.prefix, res, call, stream)
+            self.enable_change_sync(proxy_sync(self.registry, namespace, self.prefix, call, stream), timeout=timeout)
 
-        for a in res.get("agents", []):
-            name = f"{self.prefix}{a['name']}"
-            from .registry import Agent
-            def make_run(n):
-                def run(args):
-                    return self.call({"type": "run_agent", "name": n, "args": args})
-                return run
-            agent_obj = Agent(name=name, description=a.get("description", ""), run_fn=make_run(a["name"]))
-            self.registry.register_agent(name, agent_obj)
+    def _write(self, data: bytes):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
 
     def call(self, message: Dict[str, Any], timeout: float = 10.0) -> Optional[Dict[str, Any]]:
-        if not self.proc or self.proc.stdin is None or self.proc.stdout is None:
+        """Sends a request and waits up to timeout seconds for its reply. Safe to call from many threads."""
+        proc = self.proc
+        if not proc or proc.stdin is None or proc.stdout is None:
             return None
-        try:
-            raw = json.dumps(message).encode("utf-8") + b"\n"
-            self.proc.stdin.write(raw)
-            self.proc.stdin.flush()
+        return self._request(message, timeout)
 
-            # simple single-line response semantics
-            line = self.proc.stdout.readline()
-            if not line:
-                return None
-            return json.loads(line.decode("utf-8"))
-        except Exception as e:
-            log.error("stdio call error:", exc_info=e)
-            return None
+    def stream(self, message: Dict[str, Any], timeout: Optional[float] = 10.0) -> Iterator[Any]:
+        """Sends a streaming request; timeout bounds the wait for each chunk."""
+        proc = self.proc
+        if not proc or proc.stdin is None or proc.stdout is None:
+            raise ConnectionError(f"stdio downstream '{self.name}' is not running")
+        return self._stream_request(message, timeout)
+
+    def _on_disconnect(self, pending: PendingCalls):
+        # The subprocess exited (or closed stdout): fail outstanding calls right away.
+        if self._alive and self.proc is not None:
+            log.warning(f"stdio downstream '{self.name}' exited with code {self.proc.poll()}")
+        pending.fail_all(ConnectionError(f"stdio downstream '{self.name}' exited"), close=True)
 
     def _read_loop(self):
         # optional: read stderr and print for debugging
-        if not self.proc:
+        proc = self.proc
+        if not proc:
             return
-        while self._alive:
+        while True:
             try:
-                err = self.proc.stderr.readline()
+                err = proc.stderr.readline()
                 if not err:
-                    time.sleep(0.1)
-                    continue
-                if err:
-                    log.info(f"[{self.name} stderr] {err.decode('utf-8').rstrip()}")
+                    break
+                log.info(f"[{self.name} stderr] {err.decode('utf-8').rstrip()}")
             except Exception:
                 break
 
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
     def stop(self):
         log.info(f"Stopping stdio client '{self.name}'")
         self._alive = False
@@ -132,3 +146,4 @@ class StdioMCPClient:
                 except Exception:
                     pass
             self.proc = None
+        self._pending.fail_all(ConnectionError(f"stdio downstream '{self.name}' stopped"), close=True)
@@ -0,0 +1,49 @@
+# core/streaming.py
+# Helpers for tools that return their result in chunks, as a generator or an async iterator.
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from typing import Any, Callable, Iterator as TypingIterator, List, Optional
+
+def is_stream(result: Any) -> bool:
+    """True for results the router sends as a sequence of chunks instead of one value."""
+    return isinstance(result, (Iterator, AsyncIterator))
+
+def iter_chunks(result: Any) -> TypingIterator[Any]:
+    """
+    Iterates a stream result synchronously. This runs on executor threads, so async iterators are
+    driven on a private event loop. Closing the returned generator closes the underlying stream.
+    """
+    if isinstance(result, Iterator):
+        yield from result
+        return
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                chunk = loop.run_until_complete(result.__anext__())
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        aclose = getattr(result, "aclose", None)
+        if aclose is not None:
+            loop.run_until_complete(aclose())
+        loop.close()
+
+def on_close(result: Any, done: Callable[[Optional[BaseException]], None]) -> TypingIterator[Any]:
+    """Wraps a stream result so done(error) is called once it is exhausted, fails or is closed
+    (error is None unless it failed)."""
+    chunks = iter_chunks(result)
+    error = None
+    try:
+        yield from chunks
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        chunks.close()
+        done(error)
+
+def collect(result: Any) -> List[Any]:
+    """All chunks of a stream result, for callers that did not ask for streaming."""
+    return list(iter_chunks(result))
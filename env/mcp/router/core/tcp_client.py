@@ -1,96 +1,115 @@
 # core/tcp_client.py
-# Connect to a remote MCP server over TCP socket using simple JSON per-line frames.
+# Connect to a remote MCP server over TCP socket using simple JSON per-line frames
+# (or a binary codec negotiated at connect time).
 import logging
 import socket
-import json
 import threading
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from .registry import MCPRegistry
+from .protocol import FramedClient, PendingCalls
+from .proxy import register_proxies, proxy_sync, downstream_namespace
+from .readiness import Readiness, wait_ready
 
 log = logging.getLogger(__name__)
 
-class TCPMCPClient:
-    def __init__(self, name: str, host: str, port: int, registry: MCPRegistry, prefix: str):
+class TCPMCPClient(FramedClient):
+    transport = "tcp"
+
+    def __init__(self, name: str, host: str, port: int, registry: MCPRegistry, prefix: str, codecs: Optional[List[str]] = None,
+                 call_timeout: float = 300.0):
+        """call_timeout: deadline in seconds for proxied tool/resource/agent calls."""
         self.name = name
         self.host = host
         self.port = port
         self.registry = registry
         self.prefix = prefix
+        self.call_timeout = call_timeout
         self.sock: Optional[socket.socket] = None
-        self._lock = threading.RLock()
+        # Calls are multiplexed: sends are serialized, replies are matched by id by the reader thread.
+        self._init_framing(codecs)
+        self._reader_thread: Optional[threading.Thread] = None
+        self.capabilities: Optional[Dict[str, Any]] = None
+        self.readiness: Optional[Readiness] = None
 
-    def connect(self, timeout=5.0):
+    def connect(self, timeout=5.0, register: bool = True):
+        """Connects and fetches the capabilities; with register=False no proxies are registered yet."""
         log.info(f"Connecting to TCP client '{self.name}' at {self.host}:{self.port}")
         s = socket.create_connection((self.host, self.port), timeout=timeout)
+        s.settimeout(None)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.sock = s
+        self._init_framing(self.codecs)
+        self._reader_thread = threading.Thread(target=self._read_frames, args=(lambda: s.recv(65536), self._pending),
+                                               name=f"tcp-{self.name}", daemon=True)
+        self._reader_thread.start()
+        self.negotiate_codec(timeout=timeout)
         # do handshake
-        resp = self.call({"type":"list_all"})
-        if resp:
-            log.info(f"Registering capabilities from '{self.name}'")
-            for t in resp.get("tools", []):
-                name = f"{self.prefix}{t['name']}"
-                from .registry import Tool
-                def make_run(n):
-                    def run(args):
-                        return self.call({"type":"run_tool", "name": n, "args": args})
-                    return run
-                tool_obj = Tool(
-                    name=name, 
-                    description=t.get("description",""), 
-                    parameters=t.get("parameters", []), 
-                    run_fn=make_run(t["name"])
-                )
-                self.registry.register_tool(name, tool_obj)
-            for r in resp.get("resources", []):
-                name = f"{self.prefix}{r['name']}"
-                from .registry import Resource
-                def make_access(n):
-                    def access(args):
-                        return self.call({"type":"access_resource", "name": n, "args": args})
-                    return access
-                res_obj = Resource(name=name, description=r.get("description",""), access_fn=make_access(r["name"]))
-                self.registry.register_resource(name, res_obj)
-            for a in resp.get("agents", []):
-                name = f"{self.prefix}{a['name']}"
-                from .registry import Agent
-                def make_run(n):
-                    def run(args):
-                        return self.call({"type":"run_agent", "name": n, "args": args})
-                    return run
-                agent_obj = Agent(name=name, description=a.get("description",""), run_fn=make_run(a["name"]))
-                self.registry.register_agent(name, agent_obj)
-        else:
+        resp = self.call({"type":"list_all"}, timeout=timeout)
+        self.capabilities = resp
+        if not resp:
             log.warning(f"Failed to get capabilities from TCP client '{self.name}'")
+        elif register:
+            self.register_capabilities()
         return True
 
-    def call(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def register_capabilities(self):
+        """Registers prefixed proxies for the capabilities fetched by connect(), under self.name, and
+        keeps them current as the downstream reports changes."""
+        log.info(f"Registering capabilities from '{self.name}'")
+        namespace = downstream_namespace(self.name)
+        call = lambda m: self.call(m, timeout=self.call_timeout)
+        stream = lambda m: self.stream(m, timeout=self.call_timeout)
+        register_proxies(self.registry, namespace, self.prefix, self.capabilities, call, stream)
+        self.enable_change_sync(proxy_sync(self.registry, namespace, self.prefix, call, stream))
+
+    def is_connected(self) -> bool:
+        return self.sock is not None and not self._pending.closed
+
+    def connect_when_ready(self, timeout: float = 30.0, register: bool = True) -> Readiness:
+        """Connects, retrying with backoff until the downstream accepts and answers the handshake
+        (e.g. a container whose port is published before the server inside listens). Raises
+        readiness.ReadinessTimeout after timeout seconds."""
+        def probe(remaining: float) -> bool:
+            try:
+                self.connect(timeout=remaining, register=register)
+            except OSError:
+                self.close()
+                raise
+            if self.capabilities is None:
+                self.close()
+                return False
+            return True
+
+        self.readiness = wait_ready(self.name, probe, timeout)
+        return self.readiness
+
+    def _write(self, data: bytes):
+        self.sock.sendall(data)
+
+    def call(self, message: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Sends a request and waits for its reply. Many calls may be in flight at once.
+        timeout=None waits until the reply arrives or the connection drops."""
         if not self.sock:
             raise RuntimeError("not connected")
-        with self._lock:
-            try:
-                data = json.dumps(message).encode("utf-8") + b"\n"
-                self.sock.sendall(data)
-                # read until newline
-                buf = b""
-                while True:
-                    chunk = self.sock.recv(4096)
-                    if not chunk:
-                        break
-                    buf += chunk
-                    if b"\n" in buf:
-                        line, rest = buf.split(b"\n", 1)
-                        # we don't handle rest bytes currently
-                        return json.loads(line.decode("utf-8"))
-                return None
-            except Exception as e:
-                log.error("tcp call error:", exc_info=e)
-                return None
+        return self._request(message, timeout)
+
+    def stream(self, message: Dict[str, Any], timeout: Optional[float] = None) -> Iterator[Any]:
+        """Sends a streaming request and returns an iterator over its chunks."""
+        if not self.sock:
+            raise RuntimeError("not connected")
+        return self._stream_request(message, timeout)
 
     def close(self):
         log.info(f"Closing TCP client '{self.name}'")
+        sock, self.sock = self.sock, None
+        try:
+            if sock:
+                sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
         try:
-            if self.sock:
-                self.sock.close()
+            if sock:
+                sock.close()
         except Exception:
             pass
-        self.sock = None
+        self._pending.fail_all(ConnectionError(f"connection to '{self.name}' closed"), close=True)
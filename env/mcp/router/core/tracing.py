@@ -0,0 +1,279 @@
+# core/tracing.py
+# Minimal distributed tracing: spans with W3C trace context, propagated to downstreams as a
+# "traceparent" field of each request, and exported in batches as OTLP/HTTP JSON (e.g. to the
+# stack's otel-collector on :4318) or as JSON lines. Disabled until configure() is called.
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+INTERNAL, SERVER, CLIENT = 1, 2, 3  # OTLP span kinds
+DEFAULT_OTLP_ENDPOINT = "http://otel-collector:4318/v1/traces"
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("mcp_span", default=None)
+
+def parse_traceparent(value: Any) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) of a W3C traceparent header, or None if invalid."""
+    match = _TRACEPARENT.match(value) if isinstance(value, str) else None
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+class Span:
+    __slots__ = ("tracer", "name", "kind", "trace_id", "span_id", "parent_id", "sampled", "start_ns", "end_ns",
+                 "attributes", "error")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: int, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 start_ns: Optional[int] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes) if attributes and sampled else {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.error = message
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if self.sampled:
+            self.tracer.exporter.submit(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {"traceId": self.trace_id, "spanId": self.span_id, "name": self.name, "kind": self.kind,
+                "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+                "status": {"code": 2, "message": self.error} if self.error is not None else {"code": 0}}
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Flat form written by JsonlExporter."""
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+                "kind": {INTERNAL: "internal", SERVER: "server", CLIENT: "client"}[self.kind],
+                "start_ns": self.start_ns, "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+                "attributes": self.attributes, "error": self.error}
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class SpanExporter:
+    """Queues finished spans and exports them in batches from a background thread. Spans are
+    dropped (and counted) when the queue is full, so a slow collector never blocks calls."""
+    def __init__(self, max_queue: int = 4096, max_batch: int = 512, interval: float = 2.0):
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.interval = interval
+        self.exported = 0
+        self.dropped = 0
+        self._queue: List[Span] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="span-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span):
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(span)
+            if len(self._queue) >= self.max_batch:
+                self._cond.notify_all()
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or len(self._queue) >= self.max_batch, self.interval)
+                batch, self._queue = self._queue, []
+                stopped = self._stopped
+            self._export(batch)
+            if stopped:
+                return
+
+    def _export(self, batch: List[Span]):
+        for i in range(0, len(batch), self.max_batch):
+            chunk = batch[i:i + self.max_batch]
+            try:
+                self.export(chunk)
+                self.exported += len(chunk)
+            except Exception as e:
+                self.dropped += len(chunk)
+                log.warning(f"Exporting {len(chunk)} span(s) failed: {e}")
+
+    def flush(self):
+        """Exports everything queued so far (on the calling thread)."""
+        with self._cond:
+            batch, self._queue = self._queue, []
+        self._export(batch)
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5.0)
+
+class OTLPExporter(SpanExporter):
+    """Posts spans as OTLP/HTTP JSON to a collector's /v1/traces endpoint."""
+    def __init__(self, endpoint: str = DEFAULT_OTLP_ENDPOINT, service_name: str = "mcp-router", timeout: float = 5.0, **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def export(self, spans: List[Span]):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "mcp-router"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+        req = urllib.request.Request(self.endpoint, data=json.dumps(body).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+class JsonlExporter(SpanExporter):
+    """Appends one JSON object per span to a local file, for offline use."""
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(s.to_dict()) + "\n" for s in spans))
+
+class Tracer:
+    """
+    Creates spans, parented on the current span unless a parent is given. Root spans are sampled
+    with probability sample_rate (decided from the trace id, so every service makes the same
+    call for a trace); spans with a parent follow its sampling decision. Unsampled spans still
+    carry ids, so downstreams learn not to sample either, but are never exported.
+    """
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(self, name: str, kind: int = INTERNAL, parent: Optional[Any] = None, start_ns: Optional[int] = None,
+                   attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """parent: a Span, a traceparent string, or None for the current span. Returns None when
+        tracing is disabled."""
+        if self.exporter is None:
+            return None
+        if parent is None:
+            parent = _current.get()
+        if isinstance(parent, Span):
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        else:
+            context = parse_traceparent(parent)
+            if context:
+                trace_id, parent_id, sampled = context
+            else:
+                trace_id, parent_id = f"{random.getrandbits(128) or 1:032x}", None
+                sampled = int(trace_id[16:], 16) < self.sample_rate * 2 ** 64
+        return Span(self, name, kind, trace_id, parent_id, sampled, start_ns, attributes)
+
+    @contextlib.contextmanager
+    def span(self, name: str, kind: int = INTERNAL, parent: Optional[Any] = None, start_ns: Optional[int] = None,
+             attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+        """Starts a span, makes it current and ends it on exit, marking it failed on an exception."""
+        span = self.start_span(name, kind, parent, start_ns, attributes)
+        if span is None:
+            yield None
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def activate(span: Optional[Span]):
+        """Makes span current (without ending it) for the duration of the block."""
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    def shutdown(self):
+        if self.exporter:
+            self.exporter.shutdown()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+_tracer = Tracer()
+
+def tracer() -> Tracer:
+    """The process-wide tracer (disabled until configure() is called)."""
+    return _tracer
+
+def configure(otlp_endpoint: Optional[str] = None, jsonl_path: Optional[str] = None, sample_rate: float = 1.0,
+              service_name: Optional[str] = None) -> Tracer:
+    """Enables tracing with an OTLP or JSON lines exporter (OTLP wins if both are given); with
+    neither, tracing is disabled. service_name defaults to $OTEL_SERVICE_NAME or "mcp-router"."""
+    global _tracer
+    _tracer.shutdown()
+    service_name = service_name or os.environ.get("OTEL_SERVICE_NAME") or "mcp-router"
+    if otlp_endpoint:
+        exporter: Optional[SpanExporter] = OTLPExporter(otlp_endpoint, service_name)
+        log.info(f"Exporting traces to {otlp_endpoint} as '{service_name}' (sample rate {sample_rate})")
+    elif jsonl_path:
+        exporter = JsonlExporter(jsonl_path)
+        log.info(f"Writing traces to {jsonl_path} (sample rate {sample_rate})")
+    else:
+        exporter = None
+    _tracer = Tracer(exporter, sample_rate)
+    return _tracer
+
+def otlp_endpoint_from_env() -> str:
+    """The traces endpoint from $OTEL_EXPORTER_OTLP_TRACES_ENDPOINT or $OTEL_EXPORTER_OTLP_ENDPOINT,
+    else the stack's collector."""
+    endpoint = os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    if endpoint:
+        return endpoint
+    base = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+    return base.rstrip("/") + "/v1/traces" if base else DEFAULT_OTLP_ENDPOINT
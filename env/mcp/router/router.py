@@ -2,13 +2,38 @@
 import argparse
 import time
 import logging
-from core.mcp_server import MCPServer
+from core.mcp_server import MCPServer, ENGINES, DEFAULT_BACKLOG
+from core.file_watcher import WATCH_MODES
+from core.descriptor_cache import default_cache_path
+from core.downstream_config import load_downstream_config
 from core.logger import setup_logging
+from core.tracing import configure as configure_tracing, otlp_endpoint_from_env, tracer
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=3456)
+    parser.add_argument("--engine", choices=ENGINES, default="threaded", help="Connection engine: a thread per connection, or a single asyncio event loop.")
+    parser.add_argument("--workers", type=int, default=32, help="Size of the executor that runs blocking tool/resource/agent calls.")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG, help="Listen backlog: connections the kernel queues before they are accepted.")
+    parser.add_argument("--max-connections", type=int, help="Open connections at most; more are answered with an overloaded error and closed.")
+    parser.add_argument("--max-in-flight", type=int, help="Requests being handled at once, over all connections; more are rejected as overloaded.")
+    parser.add_argument("--max-in-flight-per-conn", type=int, help="Requests being handled at once per connection; more are rejected as overloaded.")
+    parser.add_argument("--max-queue", type=int, help="Requests waiting for a free worker; more are rejected as overloaded.")
+    parser.add_argument("--cache-mb", type=float, default=32, help="Memory budget of the result cache for cacheable tools/resources, in MiB.")
+    parser.add_argument("--watch", choices=WATCH_MODES, default="auto", help="How to detect component file changes: inotify, polling, or auto (inotify when available).")
+    parser.add_argument("--lazy-load", action="store_true", help="Register components of modules with a MANIFEST (or cached descriptors) without importing them; import on first use.")
+    parser.add_argument("--warm-modules", action="store_true", help="With --lazy-load, import deferred modules in the background once the server is listening.")
+    parser.add_argument("--descriptor-cache", default=str(default_cache_path()), help="File that remembers the components of each module, so --lazy-load can defer modules without a MANIFEST.")
+    parser.add_argument("--no-descriptor-cache", action="store_true", help="Do not read or write the descriptor cache.")
+    parser.add_argument("--downstreams", help="YAML file of local, tcp and docker downstreams to connect at startup.")
+    parser.add_argument("--warm-pool-size", type=int, default=0, help="Keep this many started containers per docker downstream image, so connecting claims one instead of running docker (0 disables the pool).")
+    parser.add_argument("--warm-pool-ttl", type=float, default=600, help="Seconds after the last connect of an image before its warm containers are removed.")
+    parser.add_argument("--warm-image", action="append", default=[], help="With --warm-pool-size, start warming this image at startup (repeatable).")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics at http://<host>:<port>/metrics (the stats request works without it).")
+    parser.add_argument("--trace-otlp", nargs="?", const=otlp_endpoint_from_env(), metavar="URL", help="Export trace spans as OTLP/HTTP JSON (default URL: $OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces, else the otel-collector service).")
+    parser.add_argument("--trace-file", help="Append trace spans to this JSON lines file instead (for offline use).")
+    parser.add_argument("--trace-sample", type=float, default=1.0, help="Fraction of new traces to record; requests that carry a traceparent follow their caller's decision.")
     parser.add_argument("--debug", action="store_true", help="Enable debug mode (sets log level to DEBUG).")
     parser.add_argument("--log-level", default="INFO", help="Set the log level (e.g., DEBUG, INFO, WARNING).")
     parser.add_argument("--log-file", help="Path to a file to write logs to.")
@@ -17,17 +42,33 @@ def main():
     # Configure logging
     setup_logging(debug=args.debug, log_level=args.log_level, log_file=args.log_file)
 
+    # Fail before starting anything if the downstream config is invalid
+    downstreams = load_downstream_config(args.downstreams) if args.downstreams else None
+
     # MCPServer now handles registry, downstream manager, and tool loading
-    server = MCPServer(host=args.host, port=args.port)
+    server = MCPServer(host=args.host, port=args.port, engine=args.engine, max_workers=args.workers,
+                       cache_bytes=int(args.cache_mb * 1024 * 1024), watch=args.watch,
+                       lazy_load=args.lazy_load, warm_modules=args.warm_modules,
+                       descriptor_cache=None if args.no_descriptor_cache else args.descriptor_cache,
+                       metrics_port=args.metrics_port, backlog=args.backlog, max_connections=args.max_connections,
+                       max_in_flight=args.max_in_flight, max_in_flight_per_conn=args.max_in_flight_per_conn,
+                       max_queue=args.max_queue)
+    configure_tracing(otlp_endpoint=args.trace_otlp, jsonl_path=args.trace_file, sample_rate=args.trace_sample)
     server.start()
+    if args.warm_pool_size > 0:
+        server.downstream_manager.enable_warm_pool(size=args.warm_pool_size, ttl=args.warm_pool_ttl)
+        for image in args.warm_image:
+            server.downstream_manager.prewarm(image)
+    if downstreams:
+        server.downstream_manager.connect_all(downstreams["downstreams"], parallelism=downstreams["parallelism"])
 
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         logging.info("Shutting down.")
+        server.stop()
+        tracer().shutdown()
 
 if __name__ == "__main__":
     main()
-
-
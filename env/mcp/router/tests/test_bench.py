@@ -0,0 +1,39 @@
+import unittest
+import sys
+import threading
+from pathlib import Path
+
+# Add the router and bench directories to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "bench"))
+
+from core.registry import MCPRegistry
+from core.tcp_client import TCPMCPClient
+from fake_downstream import FakeDownstream, serve_tcp
+from run_bench import parse_mix, percentiles
+
+class TestFakeDownstream(unittest.TestCase):
+    def test_proxied_payload(self):
+        ready = threading.Event()
+        port = []
+        threading.Thread(target=serve_tcp, args=(FakeDownstream(latency_ms=5, payload_bytes=100), "127.0.0.1", 0),
+                         kwargs={"ready": lambda p: port.append(p) or ready.set()}, daemon=True).start()
+        self.assertTrue(ready.wait(5))
+        registry = MCPRegistry()
+        client = TCPMCPClient("fake", "127.0.0.1", port[0], registry, "FAKE_")
+        client.connect()
+        self.addCleanup(client.close)
+        self.assertEqual(registry.get_tool("FAKE_payload").run({}), {"ok": True, "result": "x" * 100})
+        self.assertEqual(registry.get_tool("FAKE_echo").run({"a": 1}), {"ok": True, "result": {"a": 1}})
+
+class TestResults(unittest.TestCase):
+    def test_mix_and_percentiles(self):
+        self.assertEqual(parse_mix("list_all=1,tcp"), {"list_all": 1.0, "tcp": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("nope=1")
+        lat = percentiles([i / 1000 for i in range(1, 101)])
+        self.assertEqual((lat["p50"], lat["p99"], lat["max"]), (51.0, 100.0, 100.0))
+        self.assertIsNone(percentiles([])["p50"])
+
+if __name__ == '__main__':
+    unittest.main()
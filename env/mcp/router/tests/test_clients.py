@@ -0,0 +1,286 @@
+import unittest
+import sys
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.registry import MCPRegistry, Tool
+from core.mcp_server import MCPServer
+from core.protocol import PendingCalls
+from core.tcp_client import TCPMCPClient
+from core.stdio_client import StdioMCPClient
+from core.replica_pool import StdioReplicaPool
+
+# Minimal stdio downstream: answers every request on its own thread, echoing the request id.
+FAKE_STDIO_SERVER = r"""
+import json, sys, threading, time, os
+lock = threading.Lock()
+def reply(req):
+    if req["type"] == "list_all":
+        resp = {"tools": [{"name": "sleep", "description": "sleep"}], "resources": [], "agents": []}
+    elif req["type"] != "run_tool":
+        resp = {"error": "Unknown request type"}
+    elif req.get("args", {}).get("exit"):
+        os._exit(3)
+    else:
+        time.sleep(req["args"].get("seconds", 0))
+        resp = {"ok": True, "result": req["args"], "pid": os.getpid()}
+    resp["id"] = req.get("id")
+    with lock:
+        sys.stdout.write(json.dumps(resp) + "\n")
+        sys.stdout.flush()
+for line in sys.stdin:
+    threading.Thread(target=reply, args=(json.loads(line),), daemon=True).start()
+"""
+
+class TestPendingCalls(unittest.TestCase):
+    def test_match_by_id_and_fifo_fallback(self):
+        pending = PendingCalls()
+        id1, f1 = pending.open()
+        id2, f2 = pending.open()
+        self.assertTrue(pending.resolve({"id": id2, "ok": True}))
+        self.assertEqual(f2.result(), {"ok": True})
+        # untagged replies complete the oldest call
+        self.assertTrue(pending.resolve({"ok": "legacy"}))
+        self.assertEqual(f1.result(), {"ok": "legacy"})
+        self.assertFalse(pending.resolve({"id": 99}))
+
+    def test_fail_all(self):
+        pending = PendingCalls()
+        _, fut = pending.open()
+        pending.fail_all(ConnectionError("gone"), close=True)
+        with self.assertRaises(ConnectionError):
+            fut.result()
+        with self.assertRaises(ConnectionError):
+            pending.open()
+
+    def test_stream_stays_open_until_final_frame(self):
+        pending = PendingCalls()
+        req_id, frames = pending.open_stream()
+        self.assertTrue(pending.resolve({"id": req_id, "progress": 1, "seq": 0}))
+        self.assertEqual(len(pending), 1)
+        self.assertTrue(pending.resolve({"id": req_id, "ok": True, "done": True}))
+        self.assertEqual(len(pending), 0)
+        self.assertEqual([frames.get_nowait() for _ in range(2)], [{"progress": 1, "seq": 0}, {"ok": True, "done": True}])
+
+    def test_abandoned_calls_free_their_slots(self):
+        pending = PendingCalls()
+        req_id, _ = pending.open()
+        self.assertTrue(pending.resolve({"id": req_id, "ok": True}))
+        for _ in range(3):
+            req_id, _ = pending.open()
+            pending.abandon(req_id)  # the downstream never answers
+        self.assertEqual(len(pending._calls), 0)
+        # a late reply is recognised and swallowed rather than reported as unmatched
+        self.assertTrue(pending.resolve({"id": req_id, "ok": True}))
+        self.assertFalse(pending.resolve({"id": req_id, "ok": True}))
+
+    def test_abandoned_slot_kept_until_ids_are_echoed(self):
+        pending = PendingCalls()
+        id1, _ = pending.open()
+        _, f2 = pending.open()
+        pending.abandon(id1)
+        # an in-order server's reply to the abandoned call must not complete the next one
+        self.assertTrue(pending.resolve({"ok": "late"}))
+        self.assertTrue(pending.resolve({"ok": "second"}))
+        self.assertEqual(f2.result(), {"ok": "second"})
+        self.assertEqual(len(pending._calls), 0)
+
+class TestTCPMCPClient(unittest.TestCase):
+    def setUp(self):
+        self.server = MCPServer(host="127.0.0.1", port=0, max_workers=16)
+        self.server.dynamic_loader.load_components = lambda: None
+        self.server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.server.registry.register_tool("sleep", Tool(
+            name="sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"n": args["n"]}
+        ))
+        self.server.registry.register_tool("lines", Tool(
+            name="lines",
+            description="Stream numbered lines",
+            run_fn=lambda args: (f"line {i}" for i in range(args["n"])),
+            streaming=True
+        ))
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.registry = MCPRegistry()
+        self.client = TCPMCPClient("down", "127.0.0.1", self.server.port, self.registry, "DOWN_")
+        self.client.connect()
+        self.addCleanup(self.client.close)
+
+    def test_registers_prefixed_proxies(self):
+        self.assertIn("DOWN_sleep", self.registry.list_tools())
+        result = self.registry.get_tool("DOWN_sleep").run({"seconds": 0, "n": 1})
+        self.assertEqual(result, {"ok": True, "result": {"n": 1}})
+
+    def test_concurrent_calls_are_multiplexed(self):
+        proxy = self.registry.get_tool("DOWN_sleep")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda n: proxy.run({"seconds": 0.3, "n": n}), range(10)))
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual([r["result"]["n"] for r in results], list(range(10)))
+
+    def test_streaming_proxy(self):
+        proxy = self.registry.get_tool("DOWN_lines")
+        self.assertTrue(proxy.streaming)
+        self.assertEqual(list(proxy.run({"n": 3})), ["line 0", "line 1", "line 2"])
+        chunks = proxy.run({"n": 1000})
+        self.assertEqual(next(chunks), "line 0")
+        chunks.close()  # the rest of the stream is swallowed
+        self.assertEqual(self.registry.get_tool("DOWN_sleep").run({"seconds": 0, "n": 2})["result"], {"n": 2})
+
+    def test_call_timeout(self):
+        self.assertIsNone(self.client.call({"type": "run_tool", "name": "sleep", "args": {"seconds": 0.5, "n": 0}}, timeout=0.05))
+
+    def test_proxy_call_timeout(self):
+        self.client.call_timeout = 0.05
+        self.assertIsNone(self.registry.get_tool("DOWN_sleep").run({"seconds": 0.5, "n": 0}))
+        self.assertEqual(self.client.in_flight(), 0)
+        self.assertEqual(len(self.client._pending._calls), 0)
+
+    def test_close_fails_calls(self):
+        self.client.close()
+        with self.assertRaises(RuntimeError):
+            self.client.call({"type": "list_all"})
+
+    def wait_for(self, predicate, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    def test_capability_changes_are_synced_as_diffs(self):
+        downstream = self.server.registry
+        downstream.register_tool("echo", Tool(name="echo", description="Echo", run_fn=lambda args: args))
+        downstream.register_tool("lines", Tool(name="lines", description="Stream lines", run_fn=lambda args: iter(()), streaming=True))
+        downstream.remove_tool("sleep")
+        self.assertTrue(self.wait_for(lambda: self.client.capabilities["version"] == downstream.version))
+        self.assertEqual(sorted(self.registry.list_tools()), ["DOWN_echo", "DOWN_lines"])
+        self.assertEqual(self.registry.get_tool("DOWN_lines").description, "Stream lines")
+        self.assertEqual(self.registry.get_tool("DOWN_echo").run({"x": 1}), {"ok": True, "result": {"x": 1}})
+        self.assertEqual(sorted(t["name"] for t in self.client.capabilities["tools"]), ["echo", "lines"])
+
+    def test_unchanged_proxies_are_kept(self):
+        lines_proxy = self.registry.get_tool("DOWN_lines")
+        self.server.registry.register_tool("echo", Tool(name="echo", description="Echo", run_fn=lambda args: args))
+        self.assertTrue(self.wait_for(lambda: "DOWN_echo" in self.registry.list_tools()))
+        self.assertIs(self.registry.get_tool("DOWN_lines"), lines_proxy)
+
+    def test_stale_version_gets_the_full_listing(self):
+        self.client._synced_version = -1
+        self.server.registry.register_tool("echo", Tool(name="echo", description="Echo", run_fn=lambda args: args))
+        self.assertTrue(self.wait_for(lambda: "DOWN_echo" in self.registry.list_tools()))
+        self.assertEqual(self.client.capabilities["version"], self.server.registry.version)
+        self.assertNotIn("full", self.client.capabilities)
+
+class TestStdioMCPClient(unittest.TestCase):
+    def setUp(self):
+        self.registry = MCPRegistry()
+        self.client = StdioMCPClient("local", [sys.executable, "-c", FAKE_STDIO_SERVER], self.registry, "LOCAL_")
+        self.client.start()
+        self.addCleanup(self.client.stop)
+
+    def test_concurrent_callers(self):
+        proxy = self.registry.get_tool("LOCAL_sleep")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda n: proxy.run({"seconds": 0.3, "n": n}), range(8)))
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual([r["result"]["n"] for r in results], list(range(8)))
+
+    def test_timeout_is_enforced(self):
+        start = time.monotonic()
+        self.assertIsNone(self.client.call({"type": "run_tool", "name": "sleep", "args": {"seconds": 2}}, timeout=0.2))
+        self.assertLess(time.monotonic() - start, 1.0)
+        # the late reply must not be handed to the next caller
+        self.assertEqual(self.client.call({"type": "run_tool", "name": "sleep", "args": {"n": 1}})["result"], {"n": 1})
+
+    def test_exit_fails_outstanding_calls(self):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            slow = pool.submit(self.client.call, {"type": "run_tool", "name": "sleep", "args": {"seconds": 5}}, 30)
+            time.sleep(0.1)
+            start = time.monotonic()
+            self.client.call({"type": "run_tool", "name": "sleep", "args": {"exit": True}}, timeout=30)
+            self.assertIsNone(slow.result())
+            self.assertLess(time.monotonic() - start, 2.0)
+        self.assertEqual(self.client.proc.wait(timeout=2), 3)
+        self.assertFalse(self.client.is_alive())
+
+class TestStdioReplicaPool(unittest.TestCase):
+    def setUp(self):
+        self.registry = MCPRegistry()
+        self.pool = StdioReplicaPool("pool", [sys.executable, "-c", FAKE_STDIO_SERVER], self.registry, "POOL_",
+                                     replicas=3, supervise_interval=0.1)
+        self.pool.start()
+        self.addCleanup(self.pool.stop)
+
+    def test_one_set_of_proxies_spread_over_replicas(self):
+        self.assertEqual(self.registry.list_tools(), ["POOL_sleep"])
+        proxy = self.registry.get_tool("POOL_sleep")
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda n: proxy.run({"seconds": 0.2, "n": n}), range(6)))
+        self.assertEqual(len({r["pid"] for r in results}), 3)
+
+    def test_dead_replica_is_restarted(self):
+        self.pool.call({"type": "run_tool", "name": "sleep", "args": {"exit": True}}, timeout=2)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and (self.pool.restarts == 0 or self.pool.stats()["alive"] < 3):
+            time.sleep(0.05)
+        self.assertEqual(self.pool.restarts, 1)
+        self.assertEqual(self.pool.stats()["alive"], 3)
+
+    def test_replicas_start_concurrently(self):
+        slow = "import time; time.sleep(0.5)\n" + FAKE_STDIO_SERVER
+        pool = StdioReplicaPool("slow", [sys.executable, "-c", slow], MCPRegistry(), "SLOW_", replicas=3)
+        began = time.monotonic()
+        pool.start(timeout=5)
+        self.addCleanup(pool.stop)
+        self.assertEqual(pool.stats()["alive"], 3)
+        self.assertLess(time.monotonic() - began, 1.2)  # one at a time takes at least 1.5s
+
+class TestTCPMCPClientLegacyServer(unittest.TestCase):
+    """A downstream that answers in order without echoing ids, and sends several replies per packet."""
+    def setUp(self):
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.addCleanup(self.listener.close)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self.listener.accept()
+        f = conn.makefile("rwb")
+        f.readline()  # codec hello, which this server does not know
+        f.write(b'{"error": "Unknown request type"}\n')
+        f.flush()
+        f.readline()  # handshake
+        f.write(b'{"tools": [{"name": "t"}], "resources": [], "agents": []}\n')
+        f.flush()
+        lines = [json.loads(f.readline()) for _ in range(3)]
+        f.write(b"".join((json.dumps({"ok": True, "result": l["args"]}) + "\n").encode("utf-8") for l in lines))
+        f.flush()
+        f.readline()
+        conn.close()
+
+    def test_in_order_replies_without_ids(self):
+        registry = MCPRegistry()
+        client = TCPMCPClient("legacy", "127.0.0.1", self.listener.getsockname()[1], registry, "LEGACY_")
+        client.connect()
+        self.addCleanup(client.close)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futs = []
+            for n in range(3):
+                futs.append(pool.submit(registry.get_tool("LEGACY_t").run, {"n": n}))
+                time.sleep(0.05)
+            self.assertEqual([f.result()["result"]["n"] for f in futs], [0, 1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import sys
+import json
+import socket
+import struct
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.codec import (CODECS, Encoded, FrameTooLarge, JSON_LINES, LengthPrefixedFrameReader,
+                        LineFrameReader, choose_codec, msgpack)
+from core.registry import MCPRegistry, Tool
+from core.mcp_server import MCPServer
+from core.tcp_client import TCPMCPClient
+
+def _frames(reader):
+    out = []
+    while (frame := reader.next_frame()) is not None:
+        out.append(frame)
+    return out
+
+class TestFrameReaders(unittest.TestCase):
+
+    def test_line_frames_split_across_reads(self):
+        reader = LineFrameReader()
+        reader.feed(b'{"a":')
+        self.assertEqual(_frames(reader), [])
+        reader.feed(b'1}\n{"b":2}\n{"c"')
+        self.assertEqual(_frames(reader), [b'{"a":1}', b'{"b":2}'])
+        self.assertEqual(reader.pending_bytes(), 4)
+        reader.feed(b':3}\n')
+        self.assertEqual(_frames(reader), [b'{"c":3}'])
+
+    def test_length_prefixed_frames(self):
+        reader = LengthPrefixedFrameReader()
+        data = struct.pack(">I", 3) + b"abc" + struct.pack(">I", 0) + struct.pack(">I", 5) + b"de"
+        reader.feed(data[:2])
+        self.assertEqual(_frames(reader), [])
+        reader.feed(data[2:])
+        self.assertEqual(_frames(reader), [b"abc", b""])
+        reader.feed(b"fgh")
+        self.assertEqual(_frames(reader), [b"defgh"])
+
+    def test_rest_after_switch(self):
+        reader = LineFrameReader()
+        reader.feed(b'{"type":"hello"}\n' + struct.pack(">I", 2) + b"{}")
+        self.assertEqual(reader.next_frame(), b'{"type":"hello"}')
+        framed = LengthPrefixedFrameReader()
+        framed.feed(reader.rest())
+        self.assertEqual(_frames(framed), [b"{}"])
+
+    def test_oversized_frames_are_rejected(self):
+        reader = LengthPrefixedFrameReader(max_frame=10)
+        reader.feed(struct.pack(">I", 11))
+        with self.assertRaises(FrameTooLarge):
+            reader.next_frame()
+        reader = LineFrameReader(max_frame=10)
+        reader.feed(b"x" * 11)
+        with self.assertRaises(FrameTooLarge):
+            reader.next_frame()
+
+class TestCodecs(unittest.TestCase):
+
+    def test_round_trip_and_tagged_encoded_replies(self):
+        encoded = Encoded(b'{"tools": []}', {"tools": []})
+        for name, codec in CODECS.items():
+            reader = codec.frame_reader()
+            reader.feed(codec.encode({"type": "x", "s": "a\nb"}) + codec.encode_reply(encoded, 7, True))
+            self.assertEqual([codec.decode(f) for f in _frames(reader)], [{"type": "x", "s": "a\nb"}, {"id": 7, "tools": []}], name)
+
+    def test_choose_codec(self):
+        self.assertIs(choose_codec(["bogus", "json-lp"]), CODECS["json-lp"])
+        self.assertIs(choose_codec(None), JSON_LINES)
+
+class TestCodecNegotiation(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MCPServer(host="127.0.0.1", port=0)
+        self.server.dynamic_loader.load_components = lambda: None
+        self.server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.server.registry.register_tool("logs", Tool(name="logs", description="",
+                                                        run_fn=lambda args: {"text": "line\n" * args["n"]}))
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def _client(self, codecs):
+        registry = MCPRegistry()
+        client = TCPMCPClient("down", "127.0.0.1", self.server.port, registry, "DOWN_", codecs=codecs)
+        client.connect()
+        self.addCleanup(client.close)
+        return client, registry
+
+    def test_json_frames(self):
+        client, registry = self._client(["json-lp", "json"])
+        self.assertEqual(client.codec, "json-lp")
+        self.assertEqual(registry.get_tool("DOWN_logs").run({"n": 3}), {"ok": True, "result": {"text": "line\n" * 3}})
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        client, registry = self._client(["msgpack"])
+        self.assertEqual(client.codec, "msgpack")
+        self.assertEqual(registry.get_tool("DOWN_logs").run({"n": 2})["result"], {"text": "line\nline\n"})
+
+    def test_json_lines_without_handshake(self):
+        client, registry = self._client(["json"])
+        self.assertEqual(client.codec, "json")
+        self.assertEqual(registry.get_tool("DOWN_logs").run({"n": 1})["result"], {"text": "line\n"})
+
+    def test_unknown_codecs_fall_back_to_json_lines(self):
+        sock = socket.create_connection(("127.0.0.1", self.server.port), timeout=5)
+        self.addCleanup(sock.close)
+        f = sock.makefile("rwb")
+        f.write(b'{"type": "hello", "codecs": ["cbor"]}\n{"type": "list_tools"}\n')
+        f.flush()
+        self.assertEqual(json.loads(f.readline())["codec"], "json")
+        self.assertIn("logs", json.loads(f.readline())["tools"])
+
+if __name__ == '__main__':
+    unittest.main()
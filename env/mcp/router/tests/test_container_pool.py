@@ -0,0 +1,133 @@
+import unittest
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.container_pool import WarmContainerPool
+from core.downstream_manager import DownstreamManager
+from core.registry import MCPRegistry, Tool
+from core.mcp_server import MCPServer
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+class TestWarmContainerPool(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.launched = []
+        self.destroyed = []
+
+    def launch(self, image, extra_args):
+        with self.lock:
+            instance = {"image": image, "args": extra_args, "n": len(self.launched), "alive": True}
+            self.launched.append(instance)
+            return instance
+
+    def make_pool(self, **kwargs):
+        pool = WarmContainerPool(self.launch, self.destroyed.append, alive=lambda i: i["alive"], **kwargs)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_first_claim_misses_then_pool_refills(self):
+        pool = self.make_pool(size=2, ttl=60)
+        self.assertIsNone(pool.claim("img", ["--env", "X=1"]))
+        self.assertTrue(wait_for(lambda: pool.idle_count("img", ["--env", "X=1"]) == 2))
+        instance = pool.claim("img", ["--env", "X=1"])
+        self.assertEqual(instance["args"], ["--env", "X=1"])
+        # Other arguments are a different pool.
+        self.assertIsNone(pool.claim("img"))
+        self.assertTrue(wait_for(lambda: pool.idle_count("img", ["--env", "X=1"]) == 2))
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertEqual(stats["claim_latency"]["count"], 1)
+
+    def test_dead_instances_are_skipped(self):
+        pool = self.make_pool(size=2, ttl=60, max_launches=1)
+        pool.prewarm("img")
+        self.assertTrue(wait_for(lambda: pool.idle_count("img") == 2))
+        first, second = self.launched[:2]
+        first["alive"] = False
+        self.assertIs(pool.claim("img"), second)
+        self.assertIn(first, self.destroyed)
+
+    def test_idle_instances_are_reaped_after_ttl(self):
+        pool = self.make_pool(size=1, ttl=0.3)
+        pool.prewarm("img")
+        self.assertTrue(wait_for(lambda: pool.idle_count("img") == 1))
+        self.assertTrue(wait_for(lambda: pool.idle_count("img") == 0 and len(self.destroyed) == 1))
+        self.assertEqual(pool.stats()["reaped"], 1)
+        # A reaped image is not refilled until it is used again.
+        time.sleep(0.3)
+        self.assertEqual(len(self.launched), 1)
+
+    def test_failed_launch_is_retried_later(self):
+        def failing(image, extra_args):
+            raise RuntimeError("no such image")
+        pool = WarmContainerPool(failing, self.destroyed.append, size=1, ttl=60, retry_delay=30)
+        self.addCleanup(pool.shutdown)
+        pool.prewarm("img")
+        self.assertTrue(wait_for(lambda: pool.stats()["launch_failures"] == 1))
+        time.sleep(0.2)
+        self.assertEqual(pool.stats()["launch_failures"], 1)
+
+    def test_shutdown_destroys_idle_instances(self):
+        pool = WarmContainerPool(self.launch, self.destroyed.append, size=2, ttl=60)
+        pool.prewarm("img")
+        self.assertTrue(wait_for(lambda: pool.idle_count("img") == 2))
+        pool.shutdown()
+        self.assertEqual(sorted(i["n"] for i in self.destroyed), [0, 1])
+
+class TestDownstreamManagerWarmPool(unittest.TestCase):
+    """The docker commands are replaced by router instances listening on free ports."""
+
+    def setUp(self):
+        self.registry = MCPRegistry()
+        self.manager = DownstreamManager(self.registry)
+        self.servers = {}
+        self.manager._start_container = self.start_container
+        self.manager._remove_container = lambda cid: self.servers.pop(cid).stop()
+        self.addCleanup(self.cleanup)
+
+    def cleanup(self):
+        for name in self.manager.list_downstreams()["remote"]:
+            self.manager.disconnect_remote(name)
+        self.manager.close_warm_pool()
+        for server in list(self.servers.values()):
+            server.stop()
+
+    def start_container(self, image, extra_args, timeout):
+        server = MCPServer(host="127.0.0.1", port=0)
+        server.dynamic_loader.load_components = lambda: None
+        server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        server.registry.register_tool("whoami", Tool(name="whoami", description="", run_fn=lambda args: {"image": image}))
+        server.start()
+        cid = f"c{len(self.servers)}-{image}"
+        self.servers[cid] = server
+        return cid, server._sock.getsockname()[1]
+
+    def test_connect_claims_warm_container(self):
+        pool = self.manager.enable_warm_pool(size=1, ttl=60, timeout=10)
+        cold_cid, _ = self.manager.connect_remote_docker("first", "search")
+        self.assertTrue(wait_for(lambda: pool.idle_count("search") == 1))
+        cid, client = self.manager.connect_remote_docker("second", "search")
+        self.assertNotEqual(cid, cold_cid)
+        self.assertEqual(client.name, "second")
+        self.assertEqual(self.registry.get_tool("SECOND_whoami").run({}), {"ok": True, "result": {"image": "search"}})
+        self.assertEqual(self.manager.readiness()["second"]["attempts"], 0)
+        stats = self.manager.warm_pool_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["cold_start_latency"]["count"], 1)
+        self.assertTrue(self.manager.disconnect_remote("second"))
+        self.assertNotIn(cid, self.servers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.descriptor_cache import DescriptorCache
+from core.dynamic_loader import DynamicLoader
+from core.registry import MCPRegistry
+
+TOOL_SOURCE = '''
+from core.registry import Tool
+
+def make_tools(registry, downstream):
+    return {"CACHED_echo": Tool(name="CACHED_echo", description="Echo", parameters=[{"name": "x"}],
+                                run_fn=lambda args: args, cacheable=True, cache_ttl=5)}
+'''
+
+class TestDescriptorCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.file = self.root / "mod.py"
+        self.file.write_text("X = 1\n")
+        self.cache_path = self.root / "cache" / "descriptors.json"
+
+    def test_persisted_and_validated_by_stat_then_hash(self):
+        cache = DescriptorCache(self.cache_path)
+        cache.store(self.file, {"tools": [{"name": "a"}]})
+        cache.save()
+        reopened = DescriptorCache(self.cache_path)
+        self.assertEqual(reopened.lookup(self.file), {"tools": [{"name": "a"}]})
+        # Same content with a new mtime (e.g. a checkout) still hits.
+        st = self.file.stat()
+        os.utime(self.file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(reopened.lookup(self.file), {"tools": [{"name": "a"}]})
+        self.file.write_text("X = 2\n")
+        self.assertIsNone(reopened.lookup(self.file))
+
+    def test_unwritable_location_is_ignored(self):
+        blocker = self.root / "file"
+        blocker.write_text("")
+        cache = DescriptorCache(blocker / "descriptors.json")
+        cache.store(self.file, {"tools": []})
+        cache.save()  # logs a warning instead of raising
+
+class TestLazyStartFromCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.tools_dir = root / "tools"
+        self.tools_dir.mkdir()
+        (self.tools_dir / "cached_mod.py").write_text(TOOL_SOURCE)
+        self.cache_path = root / "descriptors.json"
+        self.dirs = (self.tools_dir, root / "resources", root / "agents")
+        self.addCleanup(sys.modules.pop, "tools.cached_mod", None)
+
+    def start(self):
+        registry = MCPRegistry()
+        loader = DynamicLoader(registry, None, *self.dirs, lazy=True, descriptor_cache=DescriptorCache(self.cache_path))
+        loader.load_components()
+        return registry, loader
+
+    def test_second_start_defers_import(self):
+        registry, loader = self.start()
+        self.assertIn("tools.cached_mod", loader.import_times)
+        listing = registry.snapshot()["tools"]
+        sys.modules.pop("tools.cached_mod")
+
+        registry, loader = self.start()
+        self.assertNotIn("tools.cached_mod", sys.modules)
+        self.assertEqual(registry.snapshot()["tools"], listing)
+        self.assertEqual(registry.get_tool("CACHED_echo").run({"x": 1}), {"x": 1})
+        self.assertIn("tools.cached_mod", sys.modules)
+
+if __name__ == '__main__':
+    unittest.main()
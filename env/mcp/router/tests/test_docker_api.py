@@ -0,0 +1,241 @@
+import unittest
+import sys
+import json
+import os
+import queue
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.docker_api import DockerAPI, DockerAPIError, UnsupportedArgs, run_config
+from core.docker_state import ServiceStateTracker
+from core.downstream_manager import DownstreamManager
+from core.registry import MCPRegistry
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Just enough of the Engine API, with keep-alive, to run, list, log and remove containers."""
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.connections = 0
+        self.requests = []
+        self.images = {"present:latest"}
+        self.containers = {}
+        self.events = queue.Queue()  # None ends the events stream
+        super().__init__(path, FakeHandler)
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.requests.append((method, url.path, query, body))
+        parts = url.path.strip("/").split("/")
+        containers = self.server.containers
+        if url.path == "/_ping":
+            return self.reply(200, b"OK", "text/plain")
+        if url.path == "/images/create":
+            self.server.images.add(f"{query['fromImage']}:{query['tag']}")
+            return self.reply(200, b'{"status":"Pulling"}\r\n{"status":"Downloaded"}\r\n')
+        if url.path == "/containers/create":
+            image = body["Image"] if ":" in body["Image"] else body["Image"] + ":latest"
+            if image not in self.server.images:
+                return self.reply(404, {"message": f"No such image: {image}"})
+            cid = f"c{len(containers)}"
+            containers[cid] = {"Id": cid, "State": "created", "Config": body, "Labels": body.get("Labels", {})}
+            return self.reply(201, {"Id": cid, "Warnings": []})
+        if url.path == "/containers/json":
+            wanted = json.loads(query.get("filters", "{}")).get("label", [])
+            found = [c for c in containers.values()
+                     if all(k in c["Labels"] and (not eq or c["Labels"][k] == v)
+                            for k, eq, v in (label.partition("=") for label in wanted))]
+            return self.reply(200, [{"Id": c["Id"], "State": c["State"], "Created": 1, "Labels": c["Labels"],
+                                     "Names": ["/" + c["Id"]], "Status": c.get("Status", "")} for c in found])
+        if url.path == "/events":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            while True:
+                event = self.server.events.get()
+                if event is None:
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                data = json.dumps(event).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+        cid = parts[1] if len(parts) > 1 else None
+        if cid not in containers:
+            return self.reply(404, {"message": f"No such container: {cid}"})
+        if method == "DELETE":
+            del containers[cid]
+            return self.reply(204)
+        if parts[2:] == ["start"]:
+            containers[cid]["State"] = "running"
+            return self.reply(204)
+        if parts[2:] == ["json"]:
+            return self.reply(200, {"Id": cid, "Config": {"Tty": False}})
+        if parts[2:] == ["logs"]:
+            frames = b"".join(struct.pack(">BxxxL", stream, len(data)) + data
+                              for stream, data in ((1, b"hello\nwor"), (2, b"ld\n"), (1, b"bye\n")))
+            return self.reply(200, frames, "application/vnd.docker.multiplexed-stream")
+        return self.reply(404, {"message": "page not found"})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+class TestDockerAPI(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.daemon = FakeDaemon(os.path.join(tmp.name, "docker.sock"))
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+        self.addCleanup(self.daemon.server_close)
+        self.addCleanup(self.daemon.shutdown)
+        self.api = DockerAPI(self.daemon.server_address)
+        self.addCleanup(self.api.close)
+
+    def test_requests_share_one_connection(self):
+        self.assertTrue(self.api.available())
+        for _ in range(5):
+            self.assertTrue(self.api.ping())
+        self.assertEqual(self.api.list_containers(), [])
+        self.assertEqual((self.api.connections_opened, self.daemon.connections), (1, 1))
+
+    def test_run_pulls_missing_image_then_starts(self):
+        name, body = run_config("myorg/search", ["--env", "X=1", "-l", "role=search", "--name=search-1"], ports={3456: 40000})
+        cid = self.api.run_container(body, name=name)
+        self.assertEqual(self.daemon.containers[cid]["State"], "running")
+        paths = [(method, path) for method, path, _, _ in self.daemon.requests]
+        self.assertEqual(paths, [("POST", "/containers/create"), ("POST", "/images/create"),
+                                 ("POST", "/containers/create"), ("POST", f"/containers/{cid}/start")])
+        create = self.daemon.requests[-2]
+        self.assertEqual(create[2], {"name": "search-1"})
+        self.assertEqual(create[3]["Env"], ["X=1"])
+        self.assertEqual(create[3]["HostConfig"]["PortBindings"], {"3456/tcp": [{"HostPort": "40000"}]})
+        self.assertEqual([c["Id"] for c in self.api.list_containers({"label": ["role=search"]})], [cid])
+        self.assertTrue(self.api.remove_container(cid))
+        self.assertFalse(self.api.remove_container(cid))
+        self.assertEqual(self.daemon.connections, 1)
+
+    def test_logs_are_demultiplexed(self):
+        cid = self.api.run_container(run_config("present")[1])
+        self.assertEqual(b"".join(self.api.logs(cid, tail="10")), b"hello\nworld\nbye\n")
+        # The connection goes back to the pool once the log is read to the end.
+        self.api.ping()
+        self.assertEqual(self.daemon.connections, 1)
+
+    def test_errors_carry_the_daemon_message(self):
+        with self.assertRaises(DockerAPIError) as ctx:
+            self.api.start_container("missing")
+        self.assertEqual(ctx.exception.status, 404)
+        self.assertIn("No such container: missing", str(ctx.exception))
+
+    def test_unsupported_run_args(self):
+        for args in (["--privileged"], ["-p", "80:80"], ["--env"]):
+            with self.subTest(args=args), self.assertRaises(UnsupportedArgs):
+                run_config("img", args)
+
+    def test_manager_uses_the_api(self):
+        manager = DownstreamManager(MCPRegistry(), docker=self.api)
+        cid, host_port = manager._start_container("present", ["-e", "A=b"], timeout=5)
+        self.assertEqual(self.daemon.containers[cid]["Config"]["HostConfig"]["PortBindings"],
+                         {"3456/tcp": [{"HostPort": str(host_port)}]})
+        manager._remove_container(cid)
+        self.assertNotIn(cid, self.daemon.containers)
+
+def container_event(cid, action, **attributes):
+    attributes.setdefault("com.docker.compose.service", "web")
+    return {"Type": "container", "Action": action, "Actor": {"ID": cid, "Attributes": attributes}, "time": 0}
+
+class TestServiceStateTracker(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.daemon = FakeDaemon(os.path.join(tmp.name, "docker.sock"))
+        self.daemon.containers["c0"] = {"Id": "c0", "State": "running", "Labels": {"com.docker.compose.service": "web"}}
+        self.daemon.containers["c1"] = {"Id": "c1", "State": "exited", "Status": "Exited (3) 1 hour ago",
+                                        "Labels": {"com.docker.compose.service": "db"}}
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+        self.addCleanup(self.daemon.server_close)
+        self.addCleanup(self.daemon.shutdown)
+        self.tracker = ServiceStateTracker(DockerAPI(self.daemon.server_address))
+        self.tracker.start()
+        self.addCleanup(self.tracker.stop)
+
+    def test_initial_states_come_from_the_container_list(self):
+        services = self.tracker.services()
+        self.assertEqual(sorted(services), ["db", "web"])
+        self.assertEqual(services["web"]["state"], "running")
+        self.assertEqual((services["db"]["state"], services["db"]["exit_code"]), ("exited", 3))
+        deadline = time.monotonic() + 5
+        while not self.tracker.connected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        _, _, query, _ = next(r for r in self.daemon.requests if r[1] == "/events")
+        self.assertEqual(json.loads(query["filters"]), {"type": ["container"], "label": ["com.docker.compose.service"]})
+
+    def test_waiters_wake_on_events(self):
+        self.daemon.events.put(container_event("c0", "die", exitCode="1"))
+        state = self.tracker.wait_for("web", lambda s: s["state"] == "exited", timeout=5)
+        self.assertEqual((state["state"], state["exit_code"]), ("exited", 1))
+
+        threading.Timer(0.1, self.daemon.events.put, [container_event("c0", "start")]).start()
+        began = time.monotonic()
+        state = self.tracker.wait_for("web", lambda s: s["state"] == "running", timeout=5)
+        self.assertLess(time.monotonic() - began, 2)
+        self.assertEqual((state["state"], state["restarts"]), ("running", 1))
+
+        self.daemon.events.put(container_event("c0", "health_status: healthy"))
+        self.assertEqual(self.tracker.wait_for("web", lambda s: s["health"], timeout=5)["health"], "healthy")
+        self.daemon.events.put(container_event("c0", "destroy"))
+        self.assertIsNone(self.tracker.wait_for("web", lambda s: s is None, timeout=5))
+
+    def test_mark_tells_stale_states_from_new_ones(self):
+        # db's "exited" predates the mark, e.g. a container that is being started again.
+        mark = self.tracker.mark()
+        fresh = lambda s: s is not None and s["seq"] > mark and s["state"] in ("running", "exited")
+        self.assertLessEqual(self.tracker.wait_for("db", fresh, timeout=0.1)["seq"], mark)  # timed out: stale
+        self.daemon.events.put(container_event("c1", "start", **{"com.docker.compose.service": "db"}))
+        self.assertEqual(self.tracker.wait_for("db", fresh, timeout=5)["state"], "running")
+        self.daemon.events.put(container_event("c2", "create"))
+        self.assertEqual(self.tracker.wait_for("web", lambda s: s is not None, timeout=5, container_id="c0")["container_id"], "c0")
+
+    def test_wait_times_out_with_last_state(self):
+        state = self.tracker.wait_for("web", lambda s: s["state"] == "exited", timeout=0.1)
+        self.assertEqual(state["state"], "running")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.downstream_config import load_downstream_config
+from core.downstream_manager import DownstreamManager
+from core.registry import MCPRegistry, Tool
+from core.mcp_server import MCPServer
+
+FAKE_SERVER = r"""
+import json, sys
+for line in sys.stdin:
+    req = json.loads(line)
+    if req["type"] == "list_all":
+        resp = {"tools": [{"name": "ping"}], "resources": [], "agents": []}
+    else:
+        resp = {"error": "Unknown request type"}
+    resp["id"] = req.get("id")
+    sys.stdout.write(json.dumps(resp) + "\n")
+    sys.stdout.flush()
+"""
+
+class TestLoadDownstreamConfig(unittest.TestCase):
+    def load(self, text):
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+            f.write(text)
+        self.addCleanup(Path(f.name).unlink)
+        return load_downstream_config(f.name)
+
+    def test_normalizes_entries(self):
+        config = self.load("""
+parallelism: 4
+timeout: 12
+downstreams:
+  - {name: analytics, type: local, cmd: "python analytics.py --stdio", replicas: 2}
+  - {name: github, type: tcp, host: github, port: 3456, timeout: 3}
+  - {name: search, type: docker, image: "myorg/search:latest"}
+""")
+        self.assertEqual(config["parallelism"], 4)
+        self.assertEqual(config["downstreams"], [
+            {"name": "analytics", "type": "local", "timeout": 12.0, "cmd": ["python", "analytics.py", "--stdio"], "replicas": 2},
+            {"name": "github", "type": "tcp", "timeout": 3.0, "host": "github", "port": 3456},
+            {"name": "search", "type": "docker", "timeout": 12.0, "image": "myorg/search:latest", "extra_args": []},
+        ])
+
+    def test_rejects_invalid_entries(self):
+        for text in ("downstreams: [{name: a, type: ftp}]",
+                     "downstreams: [{name: a, type: tcp, host: h}]",
+                     "downstreams: [{name: a, type: local, cmd: [x]}, {name: a, type: local, cmd: [y]}]",
+                     "parallelism: 0"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                self.load(text)
+
+class TestConnectAll(unittest.TestCase):
+    def setUp(self):
+        self.registry = MCPRegistry()
+        self.manager = DownstreamManager(self.registry)
+        self.server = MCPServer(host="127.0.0.1", port=0)
+        self.server.dynamic_loader.load_components = lambda: None
+        self.server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.server.registry.register_tool("echo", Tool(name="echo", description="", run_fn=lambda args: args))
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        for name in self.manager.list_downstreams()["local"]:
+            self.manager.disconnect_local(name)
+        for name in self.manager.list_downstreams()["remote"]:
+            self.manager.disconnect_remote(name)
+
+    def test_connects_concurrently_and_reports_failures(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+        specs = [{"name": f"local{i}", "type": "local", "cmd": [sys.executable, "-c", FAKE_SERVER], "timeout": 5.0} for i in range(4)]
+        specs += [
+            {"name": "svc", "type": "tcp", "host": "127.0.0.1", "port": self.server.port, "timeout": 5.0},
+            {"name": "gone", "type": "tcp", "host": "127.0.0.1", "port": closed_port, "timeout": 1.0},
+        ]
+        start = time.monotonic()
+        report = self.manager.connect_all(specs, parallelism=6)
+        elapsed = time.monotonic() - start
+        self.assertEqual(report["ready"], ["local0", "local1", "local2", "local3", "svc"])
+        self.assertEqual(list(report["failed"]), ["gone"])
+        self.assertEqual(set(report["timings"]), {s["name"] for s in specs})
+        # Sequential startup would take at least the sum of the per-downstream times.
+        self.assertLess(elapsed, sum(report["timings"].values()))
+        self.assertIn("LOCAL2_ping", self.registry.list_tools())
+        self.assertEqual(self.registry.get_tool("SVC_echo").run({"a": 1})["result"], {"a": 1})
+
+if __name__ == '__main__':
+    unittest.main()
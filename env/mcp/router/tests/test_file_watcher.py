@@ -0,0 +1,150 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.file_watcher import FileWatcher, InotifyBackend
+from core.dynamic_loader import DynamicLoader
+from core.registry import MCPRegistry
+
+def _inotify_available():
+    try:
+        InotifyBackend([]).close()
+        return True
+    except OSError:
+        return False
+
+class _WatcherTests:
+    mode = None
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.batches = []
+        self.changed = threading.Event()
+        self.watcher = FileWatcher([self.dir], self._on_change, mode=self.mode, debounce=0.15, poll_interval=0.05)
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+
+    def _on_change(self, paths):
+        self.batches.append(paths)
+        self.changed.set()
+
+    def wait_batch(self):
+        self.assertTrue(self.changed.wait(5), "no change reported")
+        self.changed.clear()
+        return self.batches[-1]
+
+    def test_burst_of_saves_is_coalesced(self):
+        target = self.dir / "tool.py"
+        for i in range(5):
+            target.write_text(f"X = {i}\n")
+            time.sleep(0.02)
+        self.assertEqual(self.wait_batch(), {target})
+        time.sleep(0.3)
+        self.assertEqual(len(self.batches), 1)
+
+    def test_delete_and_rename(self):
+        old, new = self.dir / "old.py", self.dir / "new.py"
+        old.write_text("X = 1\n")
+        self.wait_batch()
+        os.rename(old, new)
+        self.assertEqual(self.wait_batch(), {old, new})
+        new.unlink()
+        self.assertEqual(self.wait_batch(), {new})
+
+    def test_directory_created_later_is_watched(self):
+        later = self.dir / "later" / "resources"
+        watcher = FileWatcher([later], self._on_change, mode=self.mode, debounce=0.15, poll_interval=0.05)
+        watcher.start()
+        self.addCleanup(watcher.stop)
+        time.sleep(0.1)
+        later.mkdir(parents=True)
+        (later / "res.py").write_text("X = 1\n")
+        self.assertTrue(self.wait_for_path(later / "res.py"))
+        (later / "res.py").write_text("X = 2\n")
+        self.assertTrue(self.wait_for_path(later / "res.py"))
+
+    def wait_for_path(self, path):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if self.changed.wait(0.1):
+                self.changed.clear()
+                if path in (self.batches[-1] or ()):
+                    return True
+        return False
+
+@unittest.skipUnless(_inotify_available(), "inotify is not available")
+class TestInotifyWatcher(_WatcherTests, unittest.TestCase):
+    mode = "inotify"
+
+class TestPollingWatcher(_WatcherTests, unittest.TestCase):
+    mode = "poll"
+
+TOOL_SOURCE = '''
+from core.registry import Tool
+
+def make_tools(registry, downstream):
+    return {{"WATCHED_{name}": Tool(name="WATCHED_{name}", description="", run_fn=lambda args: {value!r})}}
+'''
+
+class TestDynamicLoaderWatching(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        self.tools_dir = root / "tools"
+        self.tools_dir.mkdir()
+        self.registry = MCPRegistry()
+        self.loader = DynamicLoader(self.registry, None, self.tools_dir, root / "resources", root / "agents")
+        self.addCleanup(lambda: [sys.modules.pop(m, None) for m in ("tools.watched", "tools.renamed")])
+
+    def write(self, name, tool, value):
+        (self.tools_dir / name).write_text(TOOL_SOURCE.format(name=tool, value=value))
+
+    def wait_for(self, predicate):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(0.02)
+        self.fail("timed out waiting for the registry to change")
+
+    def test_reload_rename_and_delete(self):
+        self.write("watched.py", "a", 1)
+        self.loader.load_components()
+        self.assertEqual(self.registry.get_tool("WATCHED_a").run({}), 1)
+        self.assertIn("tools.watched", sys.modules)
+        self.loader.watch_for_changes(debounce=0.05, poll_interval=0.05)
+        self.addCleanup(self.loader.stop_watching)
+
+        self.write("watched.py", "b", 2)
+        self.wait_for(lambda: self.registry.get_tool("WATCHED_b") is not None)
+        self.assertIsNone(self.registry.get_tool("WATCHED_a"))
+
+        # A broken save keeps the last good version registered.
+        (self.tools_dir / "watched.py").write_text("def make_tools(:\n")
+        time.sleep(0.3)
+        self.assertEqual(self.registry.get_tool("WATCHED_b").run({}), 2)
+
+        self.write("watched.py", "b", 3)
+        self.wait_for(lambda: self.registry.get_tool("WATCHED_b").run({}) == 3)
+
+        os.rename(self.tools_dir / "watched.py", self.tools_dir / "renamed.py")
+        self.wait_for(lambda: "module:tools.watched" not in self.registry.list_namespaces())
+        self.assertEqual(self.registry.list_namespace("module:tools.renamed")["tools"], ["WATCHED_b"])
+        self.assertNotIn("tools.watched", sys.modules)
+
+        (self.tools_dir / "renamed.py").unlink()
+        self.wait_for(lambda: self.registry.get_tool("WATCHED_b") is None)
+        self.assertNotIn("tools.renamed", sys.modules)
+
+if __name__ == '__main__':
+    unittest.main()
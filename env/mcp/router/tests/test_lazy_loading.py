@@ -0,0 +1,109 @@
+import unittest
+import sys
+import tempfile
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.dynamic_loader import DynamicLoader, read_manifest
+from core.registry import MCPRegistry
+
+ROUTER_DIR = Path(__file__).parent.parent
+
+LAZY_SOURCE = '''
+import time
+from core.registry import Tool
+
+MANIFEST = {"tools": [{"name": "LAZY_slow", "description": "Slow to import", "parameters": [], "cacheable": True}]}
+
+with open({counter!r}, "a") as f:
+    f.write("imported\\n")
+time.sleep(0.2)  # a heavy import
+with open({counter!r}, "a") as f:
+    f.write("ready\\n")
+
+def make_tools(registry, downstream):
+    return {"LAZY_slow": Tool(name="LAZY_slow", description="Slow to import", run_fn=lambda args: {"args": args}, cacheable=True)}
+'''
+
+EAGER_SOURCE = '''
+from core.registry import Tool
+
+def make_tools(registry, downstream):
+    return {"EAGER_fast": Tool(name="EAGER_fast", description="", run_fn=lambda args: "fast")}
+'''
+
+class TestLazyLoading(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        tools_dir = root / "tools"
+        tools_dir.mkdir()
+        self.counter = root / "imports.log"
+        (tools_dir / "lazy_mod.py").write_text(LAZY_SOURCE.replace("{counter!r}", repr(str(self.counter))))
+        (tools_dir / "eager_mod.py").write_text(EAGER_SOURCE)
+        self.registry = MCPRegistry()
+        self.loader = DynamicLoader(self.registry, None, tools_dir, root / "resources", root / "agents", lazy=True)
+        self.addCleanup(lambda: [sys.modules.pop(m, None) for m in ("tools.lazy_mod", "tools.eager_mod")])
+
+    def test_stubs_are_registered_without_importing(self):
+        start = time.monotonic()
+        self.loader.load_components()
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertNotIn("tools.lazy_mod", sys.modules)
+        self.assertIn("tools.eager_mod", sys.modules)
+        listing = {t["name"]: t for t in self.registry.snapshot()["tools"]}
+        self.assertEqual(listing["LAZY_slow"]["description"], "Slow to import")
+        self.assertTrue(listing["LAZY_slow"]["cacheable"])
+
+        # Concurrent first calls import the module once.
+        stub = self.registry.get_tool("LAZY_slow")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda n: stub.run({"n": n}), range(4)))
+        self.assertEqual(results, [{"args": {"n": n}} for n in range(4)])
+        self.assertEqual(self.counter.read_text().splitlines(), ["imported", "ready"])
+        self.assertIn("tools.lazy_mod", self.loader.import_times)
+        self.assertIsNot(self.registry.get_tool("LAZY_slow"), stub)
+
+    def test_reload_waits_for_a_first_call(self):
+        self.loader.load_components()
+        lazy_file = self.loader.tools_dir / "lazy_mod.py"
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(self.registry.get_tool("LAZY_slow").run, {})
+            while not self.counter.exists():
+                time.sleep(0.01)  # the first call is importing the module
+            lazy_file.write_text(lazy_file.read_text() + "\n# edited\n")
+            self.loader.apply_changes({lazy_file})
+            self.assertEqual(first.result(), {"args": {}})
+        self.assertEqual(self.counter.read_text().splitlines(), ["imported", "ready", "imported", "ready"])
+        self.assertEqual(self.registry.get_tool("LAZY_slow").run({}), {"args": {}})
+
+    def test_warm_in_background(self):
+        self.loader.load_components()
+        self.loader.warm_in_background().join(timeout=5)
+        self.assertIn("tools.lazy_mod", sys.modules)
+        self.assertEqual(self.registry.get_tool("LAZY_slow").run({}), {"args": {}})
+
+class TestManifests(unittest.TestCase):
+    def test_shipped_manifests_match_components(self):
+        """Modules that declare a MANIFEST must register exactly what it lists."""
+        for py_file in sorted((ROUTER_DIR / "tools").glob("*.py")):
+            manifest = read_manifest(py_file)
+            if manifest is None:
+                continue
+            with self.subTest(module=py_file.name):
+                registry = MCPRegistry()
+                loader = DynamicLoader(registry, None, ROUTER_DIR / "tools", ROUTER_DIR / "resources", ROUTER_DIR / "agents")
+                loader._load_module("tool", "tools", py_file, "make_tools", loader._tool_map)
+                listing = {t["name"]: t for t in registry.snapshot()["tools"]}
+                declared = {t["name"]: {"name": t["name"], "description": t["description"], "parameters": t["parameters"],
+                                        **{k: t[k] for k in ("cacheable", "cache_ttl", "streaming", "invalidates") if t.get(k)}}
+                            for t in manifest["tools"]}
+                self.assertEqual(listing, declared)
+
+if __name__ == '__main__':
+    unittest.main()
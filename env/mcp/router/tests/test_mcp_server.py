@@ -0,0 +1,235 @@
+import unittest
+import sys
+import json
+import socket
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.registry import Tool
+from core.mcp_server import MCPServer
+
+def _request(conn_file, req):
+    conn_file.write((json.dumps(req) + "\n").encode("utf-8"))
+    conn_file.flush()
+    return json.loads(conn_file.readline().decode("utf-8"))
+
+class _EngineTests:
+    engine = None
+
+    def setUp(self):
+        self.server = MCPServer(host="127.0.0.1", port=0, engine=self.engine, max_workers=4)
+        self.server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.server.start()
+        self.server.registry.register_tool("TEST_echo", Tool(
+            name="TEST_echo",
+            description="Echo args back",
+            run_fn=lambda args: {"echo": args}
+        ))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def connect(self):
+        sock = socket.create_connection(("127.0.0.1", self.server.port), timeout=5)
+        self.addCleanup(sock.close)
+        return sock.makefile("rwb")
+
+    def test_run_tool(self):
+        f = self.connect()
+        resp = _request(f, {"type": "run_tool", "name": "TEST_echo", "args": {"x": 1}})
+        self.assertEqual(resp, {"ok": True, "result": {"echo": {"x": 1}}})
+
+    def test_list_all_and_errors_on_same_connection(self):
+        f = self.connect()
+        listing = _request(f, {"type": "list_all"})
+        self.assertIn("TEST_echo", [t["name"] for t in listing["tools"]])
+        self.assertEqual(_request(f, {"type": "bogus"}), {"error": "unknown request type: bogus"})
+        self.assertEqual(_request(f, {"type": "run_tool", "name": "nope"}), {"error": "tool not found: nope"})
+
+    def test_list_all_if_version(self):
+        f = self.connect()
+        listing = _request(f, {"id": 1, "type": "list_all"})
+        self.assertEqual(listing["id"], 1)
+        version = listing["version"]
+        self.assertEqual(_request(f, {"type": "list_all", "if_version": version}), {"not_modified": True, "version": version})
+        self.server.registry.register_tool("TEST_new", Tool(name="TEST_new", description="new", run_fn=lambda args: {}))
+        listing = _request(f, {"type": "list_all", "if_version": version})
+        self.assertEqual(listing["version"], version + 1)
+        self.assertIn("TEST_new", [t["name"] for t in listing["tools"]])
+
+    def test_many_connections(self):
+        files = [self.connect() for _ in range(20)]
+        for i, f in enumerate(files):
+            resp = _request(f, {"type": "run_tool", "name": "TEST_echo", "args": {"i": i}})
+            self.assertEqual(resp["result"], {"echo": {"i": i}})
+
+    def test_pipelined_requests_reply_out_of_order(self):
+        self.server.registry.register_tool("TEST_sleep", Tool(
+            name="TEST_sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"slept": args["seconds"]}
+        ))
+        f = self.connect()
+        f.write((json.dumps({"id": "slow", "type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 0.5}}) + "\n").encode("utf-8"))
+        f.write((json.dumps({"id": 7, "type": "run_tool", "name": "TEST_echo", "args": {"n": 7}}) + "\n").encode("utf-8"))
+        f.flush()
+        first = json.loads(f.readline())
+        second = json.loads(f.readline())
+        self.assertEqual(first, {"id": 7, "ok": True, "result": {"echo": {"n": 7}}})
+        self.assertEqual(second, {"id": "slow", "ok": True, "result": {"slept": 0.5}})
+
+    def test_requests_without_id_stay_in_order(self):
+        f = self.connect()
+        for i in range(5):
+            f.write((json.dumps({"type": "run_tool", "name": "TEST_echo", "args": {"i": i}}) + "\n").encode("utf-8"))
+        f.flush()
+        self.assertEqual([json.loads(f.readline())["result"]["echo"]["i"] for _ in range(5)], list(range(5)))
+
+    def test_batch(self):
+        self.server.registry.register_tool("TEST_sleep", Tool(
+            name="TEST_sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"slept": args["seconds"]}
+        ))
+        f = self.connect()
+        start = time.monotonic()
+        resp = _request(f, {"id": "b", "type": "batch", "requests": [
+            {"type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 0.3}},
+            {"type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 0.3}},
+            {"type": "run_tool", "name": "TEST_echo", "args": {"a": 1}},
+            {"type": "access_resource", "name": "nope"},
+            {"type": "list_all"},
+        ]})
+        self.assertLess(time.monotonic() - start, 0.55)
+        self.assertEqual(resp["id"], "b")
+        self.assertEqual(resp["results"], [
+            {"ok": True, "result": {"slept": 0.3}},
+            {"ok": True, "result": {"slept": 0.3}},
+            {"ok": True, "result": {"echo": {"a": 1}}},
+            {"error": "resource not found: nope"},
+            {"error": "unsupported batch request type: list_all"},
+        ])
+
+    def test_batch_deadline(self):
+        self.server.registry.register_tool("TEST_sleep", Tool(
+            name="TEST_sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"slept": args["seconds"]}
+        ))
+        f = self.connect()
+        resp = _request(f, {"type": "batch", "deadline": 0.1, "requests": [
+            {"type": "run_tool", "name": "TEST_echo", "args": {}},
+            {"type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 0.5}},
+        ]})
+        self.assertEqual(resp["results"][0], {"ok": True, "result": {"echo": {}}})
+        self.assertTrue(resp["results"][1]["timeout"])
+
+    def test_streamed_results(self):
+        def count(args):
+            for i in range(args["n"]):
+                yield {"line": i}
+        self.server.registry.register_tool("TEST_count", Tool(name="TEST_count", description="", run_fn=count, streaming=True))
+        f = self.connect()
+        f.write((json.dumps({"id": 5, "type": "run_tool", "name": "TEST_count", "args": {"n": 3}, "stream": True}) + "\n").encode("utf-8"))
+        f.flush()
+        frames = [json.loads(f.readline()) for _ in range(4)]
+        self.assertEqual(frames, [
+            {"id": 5, "progress": {"line": 0}, "seq": 0},
+            {"id": 5, "progress": {"line": 1}, "seq": 1},
+            {"id": 5, "progress": {"line": 2}, "seq": 2},
+            {"id": 5, "ok": True, "done": True, "chunks": 3},
+        ])
+        # Without "stream" the chunks are collected into one reply.
+        self.assertEqual(_request(f, {"type": "run_tool", "name": "TEST_count", "args": {"n": 2}}),
+                         {"ok": True, "result": [{"line": 0}, {"line": 1}]})
+        listing = _request(f, {"type": "list_all"})
+        self.assertTrue(next(t for t in listing["tools"] if t["name"] == "TEST_count")["streaming"])
+
+    def test_async_iterator_results_and_stream_errors(self):
+        async def chunks(args):
+            yield "a"
+            yield "b"
+            if args.get("fail"):
+                raise RuntimeError("broken pipe")
+        self.server.registry.register_tool("TEST_async", Tool(name="TEST_async", description="", run_fn=chunks))
+        f = self.connect()
+        self.assertEqual(_request(f, {"type": "run_tool", "name": "TEST_async", "args": {}})["result"], ["a", "b"])
+        f.write((json.dumps({"type": "run_tool", "name": "TEST_async", "args": {"fail": True}, "stream": True}) + "\n").encode("utf-8"))
+        f.flush()
+        frames = [json.loads(f.readline()) for _ in range(3)]
+        self.assertEqual([fr.get("progress") for fr in frames[:2]], ["a", "b"])
+        self.assertEqual(frames[2], {"error": "stream error: broken pipe", "chunks": 2})
+
+    def test_admission_limits(self):
+        self.server.registry.register_tool("TEST_sleep", Tool(
+            name="TEST_sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"slept": args["seconds"]}
+        ))
+        admission = self.server.admission
+        admission.max_in_flight_per_conn, admission.max_queue = 3, 1
+        sleep = {"type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 0.3}}
+        # a's 4th request is over its per-connection limit; with 4 workers busy and 1 request
+        # queued, b's 3rd finds the queue full.
+        a, b = self.connect(), self.connect()
+        for i in range(4):
+            a.write((json.dumps({"id": i, **sleep}) + "\n").encode("utf-8"))
+        a.flush()
+        self.assertEqual(json.loads(a.readline()), {"id": 3, "error": "overloaded: too many requests in flight on this connection",
+                                                    "overloaded": True, "retryable": True, "reason": "connection_in_flight"})
+        for i in range(4, 7):
+            b.write((json.dumps({"id": i, **sleep}) + "\n").encode("utf-8"))
+        b.flush()
+        rejected = json.loads(b.readline())
+        self.assertEqual((rejected["id"], rejected["reason"], rejected["retryable"]), (6, "queue", True))
+        # stats is answered even over the limits.
+        a.write((json.dumps({"id": "s", "type": "stats"}) + "\n").encode("utf-8"))
+        a.flush()
+        replies = {r["id"]: r for r in (json.loads(a.readline()) for _ in range(4))}
+        rejections = {s["reason"]: s["value"] for s in replies["s"]["metrics"]["mcp_rejected_total"]["series"]}
+        self.assertEqual(rejections, {"connection_in_flight": 1, "queue": 1})
+        self.assertEqual([replies[i]["result"] for i in range(3)], [{"slept": 0.3}] * 3)
+        self.assertEqual([json.loads(b.readline())["result"] for _ in range(2)], [{"slept": 0.3}] * 2)
+        self.assertEqual(_request(a, {"type": "stats"})["admission"]["in_flight"], 1)
+
+    def test_max_connections(self):
+        self.server.admission.max_connections = 1
+        first = self.connect()
+        self.assertTrue(_request(first, {"type": "run_tool", "name": "TEST_echo", "args": {}})["ok"])
+        second = self.connect()
+        self.assertEqual(json.loads(second.readline())["reason"], "connections")
+        self.assertEqual(second.readline(), b"")
+        self.assertTrue(_request(first, {"type": "list_all"})["tools"])
+
+class TestThreadedEngine(_EngineTests, unittest.TestCase):
+    engine = "threaded"
+
+class TestAsyncioEngine(_EngineTests, unittest.TestCase):
+    engine = "asyncio"
+
+    def test_blocking_tool_does_not_block_other_connections(self):
+        self.server.registry.register_tool("TEST_sleep", Tool(
+            name="TEST_sleep",
+            description="Sleep for a while",
+            run_fn=lambda args: time.sleep(args["seconds"]) or {"slept": args["seconds"]}
+        ))
+        slow = self.connect()
+        slow.write((json.dumps({"type": "run_tool", "name": "TEST_sleep", "args": {"seconds": 1.0}}) + "\n").encode("utf-8"))
+        slow.flush()
+        start = time.monotonic()
+        fast = self.connect()
+        resp = _request(fast, {"type": "run_tool", "name": "TEST_echo", "args": {}})
+        self.assertTrue(resp["ok"])
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(json.loads(slow.readline())["result"], {"slept": 1.0})
+
+class TestEngineSelection(unittest.TestCase):
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            MCPServer(engine="forking")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import random
+import time
+import urllib.request
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.metrics import Histogram, Metrics
+from core.mcp_server import MCPServer
+from core.registry import Tool
+from core.tcp_client import TCPMCPClient
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_are_within_one_bucket(self):
+        h = Histogram()
+        values = [random.uniform(0.001, 0.1) for _ in range(5000)]
+        for v in values:
+            h.observe(v)
+        values.sort()
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * len(values)) - 1]
+            self.assertLess(abs(h.percentile(q) - exact) / exact, 0.5)
+        self.assertEqual(h.count, 5000)
+        self.assertLessEqual(h.percentile(0.99), max(values))
+        self.assertIsNone(Histogram().percentile(0.5))
+
+    def test_prometheus_text(self):
+        m = Metrics()
+        m.counter("calls_total", "Calls", name='a"b').inc(2)
+        m.histogram("latency_seconds", "Latency", (0.1, 1.0), name="x").observe(0.5)
+        text = m.prometheus()
+        self.assertIn("# TYPE calls_total counter\ncalls_total{name=\"a\\\"b\"} 2\n", text)
+        self.assertIn('latency_seconds_bucket{name="x",le="0.1"} 0\n', text)
+        self.assertIn('latency_seconds_bucket{name="x",le="+Inf"} 1\n', text)
+        self.assertIn('latency_seconds_count{name="x"} 1\n', text)
+        with self.assertRaises(ValueError):
+            m.gauge("calls_total")
+
+class TestServerStats(unittest.TestCase):
+    def setUp(self):
+        self.downstream = MCPServer(host="127.0.0.1", port=0)
+        self.downstream.dynamic_loader.load_components = lambda: None
+        self.downstream.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.downstream.registry.register_tool("slow", Tool(name="slow", description="", run_fn=lambda args: time.sleep(0.05) or "done"))
+        self.downstream.registry.register_tool("fail", Tool(name="fail", description="", run_fn=lambda args: 1 / 0))
+        self.downstream.start()
+        self.addCleanup(self.downstream.stop)
+        self.router = MCPServer(host="127.0.0.1", port=0, metrics_port=0)
+        self.router.dynamic_loader.load_components = lambda: None
+        self.router.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        self.router.start()
+        self.addCleanup(self.router.stop)
+        self.client = TCPMCPClient("down", "127.0.0.1", self.downstream.port, self.router.registry, "DOWN_")
+        self.client.connect()
+        self.addCleanup(self.client.close)
+
+    def series(self, stats, family, **labels):
+        return next(s for s in stats["metrics"][family]["series"] if all(s.get(k) == v for k, v in labels.items()))
+
+    def test_calls_are_recorded_per_component_and_downstream(self):
+        for _ in range(3):
+            self.router._reply({"type": "run_tool", "name": "DOWN_slow"})
+        self.router._reply({"type": "run_tool", "name": "DOWN_fail"})
+        stats = self.router._handle_request({"type": "stats"})
+        latency = self.series(stats, "mcp_call_seconds", kind="tools", name="DOWN_slow")
+        self.assertEqual(latency["count"], 3)
+        self.assertGreaterEqual(latency["p50"], 0.04)
+        self.assertEqual(self.series(stats, "mcp_call_errors_total", name="DOWN_fail")["value"], 1)
+        self.assertEqual(self.series(stats, "mcp_calls_in_flight", name="DOWN_slow")["value"], 0)
+        self.assertEqual(self.series(stats, "mcp_downstream_calls_total", downstream="down")["value"], 4)
+        self.assertEqual(self.series(stats, "mcp_downstream_errors_total", downstream="down")["value"], 1)
+        self.assertEqual(self.series(stats, "mcp_requests_total", type="run_tool")["value"], 4)
+        # The downstream saw one connection and counted the request frames it received.
+        down = self.downstream._handle_request({"type": "stats"})
+        self.assertEqual(self.series(down, "mcp_connections_open")["value"], 1)
+        self.assertGreater(self.series(down, "mcp_request_bytes")["count"], 4)
+
+    def test_prometheus_endpoint(self):
+        self.router._reply({"type": "run_tool", "name": "DOWN_slow"})
+        port = self.router._metrics_http.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+            self.assertTrue(resp.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            text = resp.read().decode()
+        self.assertIn('mcp_downstream_call_seconds_count{downstream="down"} 1', text)
+        self.assertEqual(self.router._handle_request({"type": "stats", "format": "prometheus"})["text"].count("# TYPE mcp_call_seconds histogram"), 1)
+
+if __name__ == '__main__':
+    unittest.main()
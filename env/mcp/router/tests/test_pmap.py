@@ -0,0 +1,112 @@
+import unittest
+import sys
+import random
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.pmap import EMPTY, PMap, _Collision, _Node
+
+class Key:
+    """A key with a chosen hash, to force collisions."""
+    def __init__(self, name, h):
+        self.name = name
+        self.h = h
+
+    def __hash__(self):
+        return self.h
+
+    def __eq__(self, other):
+        return isinstance(other, Key) and other.name == self.name
+
+    def __repr__(self):
+        return f"Key({self.name!r}, {self.h:#x})"
+
+def nodes(m: PMap) -> list:
+    """Every internal node of m."""
+    found, todo = [], [m._root] if m._root is not None else []
+    while todo:
+        node = todo.pop()
+        found.append(node)
+        todo.extend(item for item in node.items if not isinstance(item, tuple))
+    return found
+
+class TestPMap(unittest.TestCase):
+    def check(self, m: PMap, d: dict):
+        self.assertEqual(len(m), len(d))
+        self.assertEqual(m.items(), list(d.items()))  # same contents, in insertion order
+        self.assertEqual(list(m), list(d))
+        for key, value in d.items():
+            self.assertIn(key, m)
+            self.assertIs(m[key], value)
+
+    def fuzz(self, keys: list, steps: int, seed: int):
+        m, d, versions = EMPTY, {}, []
+        rng = random.Random(seed)
+        for step in range(steps):
+            key = rng.choice(keys)
+            if rng.random() < 0.6:
+                value = object()
+                m, d[key] = m.set(key, value), value
+            else:
+                m = m.delete(key)
+                d.pop(key, None)
+                self.assertNotIn(key, m)
+                self.assertIsNone(m.get(key))
+            if step % 97 == 0:
+                self.check(m, d)
+                versions.append((m, dict(d)))
+        self.check(m, d)
+        # Every earlier version is unchanged by the writes after it.
+        for old, expected in versions:
+            self.check(old, expected)
+
+    def test_matches_a_dict(self):
+        self.fuzz([("tools", f"T{i}") for i in range(300)] + list(range(-50, 50)), 5000, seed=7)
+
+    def test_hash_collisions(self):
+        # Full 64-bit collisions end in a collision node; partial ones share a path down to the bit
+        # where they differ (here only the top bits, so the deepest levels of the trie).
+        keys = [Key(f"same{i}", 12345) for i in range(6)]
+        keys += [Key(f"high{i}", 0x2A | (i << 58)) for i in range(6)]
+        keys += [Key(f"neg{i}", -1 - (i % 2)) for i in range(4)]
+        self.fuzz(keys, 3000, seed=3)
+        m = EMPTY
+        for key in keys[:6]:
+            m = m.set(key, key.name)
+        self.assertTrue(any(isinstance(node, _Collision) for node in nodes(m)))
+        for key in keys[:6]:
+            m = m.delete(key)
+        self.assertEqual((len(m), m.items()), (0, []))
+
+    def test_replacing_keeps_position(self):
+        m = EMPTY.set("a", 1).set("b", 2).set("c", 3).set("a", 4)
+        self.assertEqual(m.items(), [("a", 4), ("b", 2), ("c", 3)])
+        m = m.delete("a").set("a", 5)
+        self.assertEqual(m.keys(), ["b", "c", "a"])
+
+    def test_no_op_writes_return_the_same_map(self):
+        value = object()
+        m = EMPTY.set("a", value)
+        self.assertIs(m.set("a", value), m)
+        self.assertIs(m.delete("missing"), m)
+        self.assertIs(EMPTY.delete("a"), EMPTY)
+        with self.assertRaises(KeyError):
+            m["missing"]
+
+    def test_structural_sharing(self):
+        m = EMPTY
+        for i in range(5000):
+            m = m.set(f"k{i}", i)
+        before = {id(node) for node in nodes(m)}
+        for changed in (m.set("new", 0), m.set("k42", -1), m.delete("k42")):
+            fresh = [node for node in nodes(changed) if id(node) not in before]
+            # Only the path from the root to the changed leaf is copied (5000 keys: about 3 levels).
+            self.assertLessEqual(len(fresh), 4)
+            self.assertIsInstance(changed._root, _Node)
+        self.assertEqual(m["k42"], 42)
+        self.assertEqual(len(m), 5000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import sys
+import random
+import socket
+import threading
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.readiness import GiveUp, ReadinessTimeout, backoff_delays, wait_ready
+from core.registry import MCPRegistry, Tool
+from core.mcp_server import MCPServer
+from core.stdio_client import StdioMCPClient
+from core.tcp_client import TCPMCPClient
+
+SLOW_STDIO_SERVER = r"""
+import json, sys, time
+time.sleep(0.5)  # slow imports
+for line in sys.stdin:
+    req = json.loads(line)
+    resp = {"tools": [{"name": "t"}]} if req["type"] == "list_all" else {"error": "Unknown request type"}
+    resp["id"] = req.get("id")
+    sys.stdout.write(json.dumps(resp) + "\n")
+    sys.stdout.flush()
+"""
+
+class TestBackoff(unittest.TestCase):
+    def test_delays_grow_to_cap_with_jitter(self):
+        delays = backoff_delays(initial=0.1, factor=2.0, max_delay=0.5, jitter=0.2, rng=random.Random(1))
+        values = [next(delays) for _ in range(6)]
+        for value, base in zip(values, [0.1, 0.2, 0.4, 0.5, 0.5, 0.5]):
+            self.assertGreaterEqual(value, base * 0.8)
+            self.assertLessEqual(value, base * 1.2)
+
+    def test_retries_until_ready(self):
+        calls = []
+        def probe(remaining):
+            calls.append(remaining)
+            if len(calls) < 3:
+                raise ConnectionRefusedError("not yet")
+            return True
+        ready = wait_ready("svc", probe, timeout=5, initial=0.01)
+        self.assertEqual(ready.attempts, 3)
+        self.assertLess(ready.seconds, 1)
+
+    def test_timeout_and_give_up(self):
+        with self.assertRaises(ReadinessTimeout) as ctx:
+            wait_ready("svc", lambda remaining: False, timeout=0.1, initial=0.01)
+        self.assertIn("not ready after 0.1s", str(ctx.exception))
+        start = time.monotonic()
+        with self.assertRaises(GiveUp):
+            wait_ready("svc", lambda remaining: (_ for _ in ()).throw(GiveUp("exited")), timeout=5)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+class TestTransportReadiness(unittest.TestCase):
+    def test_tcp_server_that_starts_late(self):
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        server = MCPServer(host="127.0.0.1", port=port)
+        server.dynamic_loader.load_components = lambda: None
+        server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+        server.registry.register_tool("echo", Tool(name="echo", description="", run_fn=lambda args: args))
+        timer = threading.Timer(0.3, server.start)
+        timer.start()
+        self.addCleanup(server.stop)
+        self.addCleanup(timer.cancel)
+        registry = MCPRegistry()
+        client = TCPMCPClient("late", "127.0.0.1", port, registry, "LATE_")
+        self.addCleanup(client.close)
+        ready = client.connect_when_ready(timeout=5)
+        self.assertGreater(ready.attempts, 1)
+        self.assertGreaterEqual(ready.seconds, 0.25)
+        self.assertIn("LATE_echo", registry.list_tools())
+
+    def test_stdio_waits_for_slow_start_and_gives_up_on_exit(self):
+        registry = MCPRegistry()
+        client = StdioMCPClient("slow", [sys.executable, "-c", SLOW_STDIO_SERVER], registry, "SLOW_")
+        self.addCleanup(client.stop)
+        client.start(timeout=5)
+        self.assertGreaterEqual(client.readiness.seconds, 0.4)
+        self.assertIn("SLOW_t", registry.list_tools())
+
+        dead = StdioMCPClient("dead", [sys.executable, "-c", "import sys; sys.exit(3)"], registry, "DEAD_")
+        self.addCleanup(dead.stop)
+        start = time.monotonic()
+        dead.start(timeout=5)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertIsNone(dead.capabilities)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import sys
+import json
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.registry import MCPRegistry, Tool, Resource, Agent, patch_listing
+
+def _tool(name):
+    return Tool(name=name, description=f"{name} tool", run_fn=lambda args: args)
+
+class TestRegistrySnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MCPRegistry()
+
+    def test_writes_publish_new_versions(self):
+        self.assertEqual(self.registry.version, 0)
+        self.registry.register_tool("A_one", _tool("A_one"))
+        self.registry.register_resource("A_res", Resource(name="A_res", description="res", access_fn=lambda args: 1))
+        self.registry.register_agent("A_agent", Agent(name="A_agent", description="agent", run_fn=lambda args: 1))
+        self.assertEqual(self.registry.version, 3)
+        self.registry.remove_tool("missing")
+        self.assertEqual(self.registry.version, 3)
+        self.registry.remove_tool("A_one")
+        self.assertEqual(self.registry.version, 4)
+        self.assertIsNone(self.registry.get_tool("A_one"))
+
+    def test_old_states_are_not_mutated(self):
+        self.registry.register_tool("A_one", _tool("A_one"))
+        old = self.registry.state()
+        self.registry.register_tool("A_two", _tool("A_two"))
+        self.assertEqual(list(old.tools), ["A_one"])
+        self.assertEqual(self.registry.list_tools(), ["A_one", "A_two"])
+
+    def test_listing_is_cached_per_version(self):
+        self.registry.register_tool("A_one", _tool("A_one"))
+        state = self.registry.state()
+        self.assertIs(self.registry.snapshot(), self.registry.snapshot())
+        self.assertIs(state.encoded_listing(), state.encoded_listing())
+        self.assertEqual(json.loads(state.encoded_listing()), {
+            "tools": [{"name": "A_one", "description": "A_one tool", "parameters": []}],
+            "resources": [],
+            "agents": [],
+            "version": 1,
+        })
+        self.registry.register_tool("A_two", _tool("A_two"))
+        self.assertEqual(len(self.registry.snapshot()["tools"]), 2)
+
+class TestRegistryNamespaces(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MCPRegistry()
+        self.registry.register_tool("ENV_local", _tool("ENV_local"))
+
+    def test_register_and_remove_namespace_atomically(self):
+        version = self.registry.version
+        self.registry.register_namespace("downstream:env",
+                                         tools={"ENV_remote": _tool("ENV_remote"), "ENV_other": _tool("ENV_other")},
+                                         resources={"ENV_res": Resource(name="ENV_res", description="", access_fn=lambda a: 1)})
+        self.assertEqual(self.registry.version, version + 1)
+        self.assertEqual(sorted(self.registry.list_namespace("downstream:env")["tools"]), ["ENV_other", "ENV_remote"])
+        removed = self.registry.remove_namespace("downstream:env")
+        self.assertEqual(self.registry.version, version + 2)
+        self.assertEqual(sorted(removed["tools"]), ["ENV_other", "ENV_remote"])
+        self.assertEqual(removed["resources"], ["ENV_res"])
+        # entries outside the namespace are untouched even when they share the prefix
+        self.assertEqual(self.registry.list_tools(), ["ENV_local"])
+        self.assertEqual(self.registry.list_resources(), [])
+        self.assertNotIn("downstream:env", self.registry.list_namespaces())
+
+    def test_reregister_replaces_namespace(self):
+        self.registry.register_namespace("module:tools.a", tools={"A_one": _tool("A_one"), "A_two": _tool("A_two")})
+        removed = self.registry.register_namespace("module:tools.a", tools={"A_two": _tool("A_two"), "A_three": _tool("A_three")})
+        self.assertEqual(removed["tools"], ["A_one"])
+        self.assertEqual(sorted(self.registry.list_tools()), ["A_three", "A_two", "ENV_local"])
+
+    def test_entry_taken_over_by_another_namespace_is_kept(self):
+        self.registry.register_namespace("downstream:a", tools={"X_tool": _tool("X_tool")})
+        self.registry.register_namespace("downstream:b", tools={"X_tool": _tool("X_tool")})
+        self.assertEqual(self.registry.remove_namespace("downstream:a")["tools"], [])
+        self.assertIn("X_tool", self.registry.list_tools())
+        self.registry.remove_tool("X_tool")
+        self.assertEqual(self.registry.list_namespace("downstream:b")["tools"], [])
+
+    def test_removing_unknown_namespace_is_a_no_op(self):
+        version = self.registry.version
+        self.assertEqual(self.registry.remove_namespace("downstream:nope"), {"tools": [], "resources": [], "agents": []})
+        self.assertEqual(self.registry.version, version)
+
+class TestRegistryDiffs(unittest.TestCase):
+    def setUp(self):
+        self.registry = MCPRegistry(history=4)
+        self.registry.register_namespace("downstream:env", tools={"ENV_a": _tool("ENV_a"), "ENV_b": _tool("ENV_b")})
+
+    def test_diff_since_patches_the_old_listing(self):
+        old = self.registry.state().listing()
+        version = self.registry.version
+        self.registry.update_namespace("downstream:env", tools={"ENV_b": Tool(name="ENV_b", description="new", run_fn=lambda a: a),
+                                                                "ENV_c": _tool("ENV_c")},
+                                       remove={"tools": ["ENV_a", "ENV_unknown"]})
+        self.assertEqual(self.registry.version, version + 1)
+        diff = self.registry.diff_since(version)
+        self.assertEqual(diff["removed"], {"tools": ["ENV_a"]})
+        self.assertEqual([e["name"] for e in diff["added"]["tools"]], ["ENV_c"])
+        self.assertEqual(diff["changed"]["tools"][0]["description"], "new")
+        self.assertEqual(patch_listing(old, diff), self.registry.state().listing())
+        self.assertEqual(sorted(self.registry.list_namespace("downstream:env")["tools"]), ["ENV_b", "ENV_c"])
+
+    def test_versions_beyond_the_history_need_a_full_listing(self):
+        version = self.registry.version
+        for n in range(4):
+            self.registry.register_tool(f"T{n}", _tool(f"T{n}"))
+        self.assertIsNone(self.registry.diff_since(version))
+        self.assertEqual(self.registry.diff_since(self.registry.version)["added"], {})
+
+    def test_diff_collapses_several_versions(self):
+        self.registry = MCPRegistry(history=8)
+        self.registry.register_namespace("downstream:env", tools={"ENV_a": _tool("ENV_a"), "ENV_b": _tool("ENV_b")})
+        old = self.registry.state().listing()
+        version = self.registry.version
+        self.registry.remove_tool("ENV_a")
+        self.registry.register_tool("ENV_a", _tool("ENV_a"))  # back as it was
+        self.registry.register_tool("ENV_d", _tool("ENV_d"))
+        self.registry.remove_tool("ENV_d")  # never seen by the caller
+        diff = self.registry.diff_since(version)
+        self.assertEqual((diff["version"], diff["added"], diff["changed"], diff["removed"]), (version + 4, {}, {}, {}))
+        self.assertEqual(patch_listing(old, diff)["tools"], old["tools"])
+
+    def test_update_without_changes_publishes_nothing(self):
+        version = self.registry.version
+        self.registry.update_namespace("downstream:env", remove={"tools": ["ENV_missing"]})
+        self.assertEqual(self.registry.version, version)
+
+if __name__ == '__main__':
+    unittest.main()
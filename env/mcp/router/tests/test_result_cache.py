@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.registry import Tool
+from core.mcp_server import MCPServer
+from core.result_cache import ResultCache, MISS
+from tools import project_tools
+
+class TestResultCache(unittest.TestCase):
+
+    def test_ttl_and_component_identity(self):
+        cache = ResultCache()
+        tool = object()
+        key = cache.make_key("tools", "A_t", {"b": 1, "a": 2})
+        self.assertEqual(key, cache.make_key("tools", "A_t", {"a": 2, "b": 1}))
+        cache.put(key, {"v": 1}, ttl=60, component=tool)
+        self.assertEqual(cache.get(key, tool), {"v": 1})
+        self.assertIs(cache.get(key, object()), MISS)  # reloaded component
+        cache.put(key, {"v": 1}, ttl=0.01, component=tool)
+        time.sleep(0.02)
+        self.assertIs(cache.get(key, tool), MISS)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_lru_eviction_by_size(self):
+        cache = ResultCache(max_bytes=100)
+        tool = object()
+        keys = [cache.make_key("tools", "t", {"i": i}) for i in range(4)]
+        for key in keys[:3]:
+            cache.put(key, "x" * 28, ttl=60, component=tool)  # 30 bytes encoded
+        cache.get(keys[0], tool)
+        cache.put(keys[3], "x" * 28, ttl=60, component=tool)
+        self.assertIs(cache.get(keys[1], tool), MISS)
+        self.assertIsNot(cache.get(keys[0], tool), MISS)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 100)
+
+class TestServerResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MCPServer()
+        self.calls = 0
+
+        def count(args):
+            self.calls += 1
+            return {"calls": self.calls}
+
+        self.registry = self.server.registry
+        self.registry.register_namespace("module:tools.test", tools={
+            "TEST_read": Tool(name="TEST_read", description="", run_fn=count, cacheable=True, cache_ttl=60),
+            "TEST_write": Tool(name="TEST_write", description="", run_fn=lambda args: {"ok": True}, invalidates=True),
+            "TEST_echo": Tool(name="TEST_echo", description="", run_fn=lambda args: args),
+        })
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_tool(self, name, args=None):
+        return self.server._handle_request({"type": "run_tool", "name": name, "args": args or {}})
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.run_tool("TEST_read"), {"ok": True, "result": {"calls": 1}})
+        self.assertEqual(self.run_tool("TEST_read"), {"ok": True, "result": {"calls": 1}, "cached": True})
+        self.assertEqual(self.run_tool("TEST_read", {"x": 1})["result"], {"calls": 2})
+        stats = self.server._handle_request({"type": "cache_stats"})["cache"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_side_effecting_call_in_same_namespace_invalidates(self):
+        self.run_tool("TEST_read")
+        self.run_tool("TEST_echo")
+        self.assertTrue(self.run_tool("TEST_read").get("cached"))
+        self.run_tool("TEST_write")
+        self.assertEqual(self.run_tool("TEST_read")["result"], {"calls": 2})
+
+    def test_namespace_reload_and_removal_invalidate(self):
+        self.run_tool("TEST_read")
+        self.registry.remove_namespace("module:tools.test")
+        self.assertEqual(self.server.result_cache.stats()["entries"], 0)
+        self.assertEqual(self.run_tool("TEST_read"), {"error": "tool not found: TEST_read"})
+
+    def test_errors_are_not_cached(self):
+        self.registry.register_tool("TEST_fail", Tool(name="TEST_fail", description="", cacheable=True,
+                                                      run_fn=lambda args: {"status": "error"}))
+        self.run_tool("TEST_fail")
+        self.assertNotIn("cached", self.run_tool("TEST_fail"))
+
+class TestProjectToolsInvalidate(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MCPServer()
+        self.addCleanup(self.server.stop)
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        for patcher in (mock.patch.object(project_tools, "get_projects_root", return_value=Path(root.name)),
+                        mock.patch.dict(os.environ, {"USER": "tester"})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server.registry.register_namespace("module:tools.project_tools", tools=project_tools.make_tools(self.server.registry, None))
+
+    def run_tool(self, name, args=None):
+        return self.server._handle_request({"type": "run_tool", "name": name, "args": args or {}})
+
+    def test_created_project_is_listed(self):
+        self.assertEqual(self.run_tool("PROJECT_get_projects")["result"], {"projects": []})
+        self.run_tool("PROJECT_create_project_directory", {"project_name": "demo"})
+        self.assertEqual(self.run_tool("PROJECT_get_projects")["result"], {"projects": ["demo"]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,7 +25,15 @@ class TestRouterTools(unittest.TestCase):
         
         result = self.registry.get_tool(tool_name).run(args)
         self.assertEqual(result, {"ok": True, "connected": "test_local"})
-        self.downstream_manager.connect_local.assert_called_once_with("test_local", ["python", "server.py", "--stdio"])
+        self.downstream_manager.connect_local.assert_called_once_with("test_local", ["python", "server.py", "--stdio"], replicas=1)
+
+    def test_connect_local_server_with_replicas(self):
+        tool_name = "ROUTER_connect_local_server"
+        args = {"name": "test_local", "cmd": ["python", "server.py", "--stdio"], "replicas": 3}
+
+        result = self.registry.get_tool(tool_name).run(args)
+        self.assertEqual(result, {"ok": True, "connected": "test_local"})
+        self.downstream_manager.connect_local.assert_called_once_with("test_local", ["python", "server.py", "--stdio"], replicas=3)
 
     def test_connect_remote_server(self):
         tool_name = "ROUTER_connect_remote_server"
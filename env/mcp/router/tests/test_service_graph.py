@@ -0,0 +1,125 @@
+import unittest
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.service_graph import (build_closure, critical_path, dependency_closure, find_project_root, launch_stack,
+                                load_build_graph, load_service_graph)
+
+COMPOSE = """
+services:
+  web:
+    image: web
+    depends_on: [api]
+  api:
+    image: api
+    depends_on:
+      db: {condition: service_started}
+  db:
+    image: db
+  cache:
+    image: cache
+"""
+
+MAKEFILE = """
+SERVICES += web api
+web_RUN_DEPS := cache  # the page cache
+include extra.mk
+"""
+
+class TestServiceGraph(unittest.TestCase):
+    def test_merges_compose_and_makefile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "docker-compose.yaml").write_text(COMPOSE)
+            (root / "Makefile").write_text(MAKEFILE)
+            (root / "extra.mk").write_text("metrics_RUN_DEPS := db\napi_RUN_DEPS += metrics\n")
+            (root / "sub").mkdir()
+            self.assertEqual(find_project_root(root / "sub"), root.resolve())
+            graph = load_service_graph(root)
+        self.assertEqual(graph["web"], ["api", "cache"])
+        self.assertEqual(graph["api"], ["db", "metrics"])
+        self.assertEqual(graph["metrics"], ["db"])
+        self.assertEqual(sorted(dependency_closure(graph, ["api"])), ["api", "db", "metrics"])
+
+    def test_build_deps_are_separate_edges(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "docker-compose.yaml").write_text(COMPOSE)
+            (root / "Makefile").write_text(MAKEFILE + "base_RUN_DEPS := db\nweb_BUILD_DEPS := base\n")
+            (root / "extra.mk").write_text("")
+            graph = load_service_graph(root)
+            builds = load_build_graph(root)
+        self.assertEqual(graph["web"], ["api", "cache"])
+        self.assertEqual(builds["web"], ["base"])
+        self.assertEqual(sorted(build_closure(graph, builds, ["web"])), ["api", "base", "cache", "db", "web"])
+
+    def test_repository_build_closure(self):
+        root = find_project_root(Path(__file__).parent)
+        if root is None or not (root / "Makefile").is_file():
+            self.skipTest("not run from the environment repository")
+        graph = load_service_graph(root)
+        # dev/ide/Dockerfile is FROM dev:vnc, so launching codeserver needs vnc built but not running.
+        self.assertIn("vnc", build_closure(graph, load_build_graph(root), ["codeserver"]))
+        self.assertNotIn("vnc", dependency_closure(graph, ["codeserver"]))
+
+    def test_rejects_cycles_and_unknown_services(self):
+        with self.assertRaisesRegex(ValueError, "a -> b -> a"):
+            dependency_closure({"a": ["b"], "b": ["a"]}, ["a"])
+        with self.assertRaisesRegex(ValueError, "unknown service: c"):
+            dependency_closure({"a": ["c"]}, ["a"])
+
+class TestLaunchStack(unittest.TestCase):
+    GRAPH = {"web": ["api", "cache"], "api": ["db"], "db": [], "cache": [], "worker": ["db"]}
+    DURATIONS = {"db": 0.2, "cache": 0.05, "api": 0.1, "web": 0.05, "worker": 0.05}
+
+    def test_independent_services_start_together(self):
+        lock = threading.Lock()
+        active, peak = [0], [0]
+
+        def launch(service):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(self.DURATIONS[service])
+            with lock:
+                active[0] -= 1
+            return {"status": "success"}
+
+        report = launch_stack(self.GRAPH, ["web", "worker"], launch)
+        services = report["services"]
+        self.assertEqual(report["status"], "success")
+        self.assertGreaterEqual(peak[0], 2)  # db and cache run at the same time
+        self.assertAlmostEqual(services["cache"]["started_at"], services["db"]["started_at"], delta=0.05)
+        self.assertGreaterEqual(services["api"]["started_at"], services["db"]["finished_at"])
+        self.assertGreaterEqual(services["web"]["started_at"], services["api"]["finished_at"])
+        self.assertEqual(report["critical_path"], ["db", "api", "web"])
+        # Sequentially this takes 0.45s; the critical path bounds the parallel launch.
+        self.assertLess(report["total_seconds"], 0.42)
+
+    def test_failures_skip_dependents(self):
+        def launch(service):
+            return {"status": "error", "message": "boom"} if service == "db" else {"status": "success"}
+
+        report = launch_stack(self.GRAPH, ["web", "worker"], launch)
+        statuses = {s: r["status"] for s, r in report["services"].items()}
+        self.assertEqual(statuses, {"db": "error", "api": "skipped", "cache": "success", "web": "skipped", "worker": "skipped"})
+        self.assertEqual(report["status"], "error")
+        self.assertEqual(critical_path(self.GRAPH, report["services"])[-1], report["critical_path"][-1])
+
+    def test_other_statuses_count_as_failures(self):
+        def launch(service):
+            return {"status": "timeout"} if service == "db" else {"status": "success"}
+
+        report = launch_stack(self.GRAPH, ["web", "worker"], launch)
+        statuses = {s: r["status"] for s, r in report["services"].items()}
+        self.assertEqual(statuses, {"db": "timeout", "api": "skipped", "cache": "success", "web": "skipped", "worker": "skipped"})
+        self.assertEqual(report["status"], "error")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import sys
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+# Add the router directory to sys.path to allow absolute imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import tracing
+from core.mcp_server import MCPServer
+from core.registry import MCPRegistry, Tool
+from core.tcp_client import TCPMCPClient
+from core.tracing import CLIENT, SERVER, OTLPExporter, Tracer, parse_traceparent
+
+class NullExporter(tracing.SpanExporter):
+    def export(self, spans):
+        pass
+
+class TestSampling(unittest.TestCase):
+    def test_parent_decision_wins_over_the_rate(self):
+        exporter = NullExporter()
+        self.addCleanup(exporter.shutdown)
+        tracer = Tracer(exporter, sample_rate=0.0)
+        root = tracer.start_span("root")
+        self.assertFalse(root.sampled)
+        self.assertTrue(root.traceparent().endswith("-00"))
+        remote = tracer.start_span("server", SERVER, parent="00-" + "ab" * 16 + "-" + "cd" * 8 + "-01")
+        self.assertEqual((remote.trace_id, remote.parent_id, remote.sampled), ("ab" * 16, "cd" * 8, True))
+        self.assertEqual(tracer.start_span("child", parent=remote).trace_id, "ab" * 16)
+        self.assertIsNone(parse_traceparent("00-" + "0" * 32 + "-" + "cd" * 8 + "-01"))
+        sampled = sum(Tracer(exporter, sample_rate=0.25).start_span("s").sampled for _ in range(2000))
+        self.assertAlmostEqual(sampled / 2000, 0.25, delta=0.05)
+
+    def test_disabled_tracer_creates_no_spans(self):
+        self.assertIsNone(Tracer().start_span("x"))
+
+class TestTracePropagation(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "spans.jsonl"
+        tracing.configure(jsonl_path=str(self.path))
+        self.addCleanup(tracing.configure)
+        self.servers = []
+        for name in ("down", "router"):
+            server = MCPServer(host="127.0.0.1", port=0)
+            server.dynamic_loader.load_components = lambda: None
+            server.dynamic_loader.watch_for_changes = lambda **kwargs: None
+            server.start()
+            self.addCleanup(server.stop)
+            self.servers.append(server)
+        down, router = self.servers
+        down.registry.register_tool("slow", Tool(name="slow", description="", run_fn=lambda args: time.sleep(0.02) or "done"))
+        link = TCPMCPClient("down", "127.0.0.1", down.port, router.registry, "DOWN_")
+        link.connect()
+        self.addCleanup(link.close)
+        self.client = TCPMCPClient("router", "127.0.0.1", router.port, MCPRegistry(), "R_")
+        self.client.connect()
+        self.addCleanup(self.client.close)
+
+    def spans(self):
+        tracing.tracer().exporter.flush()
+        return [json.loads(line) for line in self.path.read_text().splitlines()]
+
+    def test_one_trace_across_router_and_downstream(self):
+        resp = self.client.call({"type": "run_tool", "name": "DOWN_slow", "args": {}}, timeout=5)
+        self.assertEqual(resp["result"], {"ok": True, "result": "done"})
+        call = next(s for s in self.spans() if s["name"] == "tcp run_tool" and s["attributes"]["mcp.downstream"] == "router")
+        trace = {s["span_id"]: s for s in self.spans() if s["trace_id"] == call["trace_id"]}
+
+        def children(parent, name):
+            return [s for s in trace.values() if s["parent_id"] == parent["span_id"] and s["name"] == name]
+
+        # client -> router request -> proxy tool -> downstream round trip -> downstream request -> tool
+        router_request, = children(call, "mcp run_tool")
+        self.assertEqual(router_request["kind"], "server")
+        self.assertEqual(len(children(router_request, "decode")), 1)
+        self.assertEqual(len(children(router_request, "dispatch")), 1)
+        proxy, = children(router_request, "tool DOWN_slow")
+        hop, = children(proxy, "tcp run_tool")
+        self.assertEqual((hop["kind"], hop["attributes"]["mcp.downstream"]), ("client", "down"))
+        down_request, = children(hop, "mcp run_tool")
+        tool, = children(down_request, "tool slow")
+        self.assertGreaterEqual(tool["duration_ms"], 20)
+        self.assertGreaterEqual(hop["duration_ms"], tool["duration_ms"])
+
+    def test_errors_are_marked(self):
+        self.client.call({"type": "run_tool", "name": "missing"}, timeout=5)
+        request = next(s for s in self.spans() if s["name"] == "mcp run_tool" and s["kind"] == "server")
+        self.assertEqual(request["error"], "tool not found: missing")
+
+class TestOTLPExporter(unittest.TestCase):
+    def test_posts_otlp_json(self):
+        bodies = []
+
+        class Collector(BaseHTTPRequestHandler):
+            def do_POST(self):
+                bodies.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        collector = HTTPServer(("127.0.0.1", 0), Collector)
+        threading.Thread(target=collector.serve_forever, daemon=True).start()
+        self.addCleanup(collector.server_close)
+        self.addCleanup(collector.shutdown)
+        exporter = OTLPExporter(f"http://127.0.0.1:{collector.server_address[1]}/v1/traces", service_name="test-router")
+        tracer = Tracer(exporter)
+        with tracer.span("outer", CLIENT, attributes={"n": 1}):
+            with self.assertRaises(ValueError), tracer.span("inner"):
+                raise ValueError("boom")
+        exporter.shutdown()
+        path, body = bodies[0]
+        self.assertEqual(path, "/v1/traces")
+        resource = body["resourceSpans"][0]
+        self.assertEqual(resource["resource"]["attributes"][0]["value"], {"stringValue": "test-router"})
+        inner, outer = resource["scopeSpans"][0]["spans"]
+        self.assertEqual(inner["parentSpanId"], outer["spanId"])
+        self.assertEqual(inner["status"], {"code": 2, "message": "ValueError: boom"})
+        self.assertEqual(outer["attributes"], [{"key": "n", "value": {"intValue": "1"}}])
+        self.assertEqual(outer["kind"], CLIENT)
+
+if __name__ == '__main__':
+    unittest.main()
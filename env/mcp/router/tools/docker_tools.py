@@ -6,11 +6,85 @@ import time
 
 from core.registry import MCPRegistry, Tool
 from core.downstream_manager import DownstreamManager # This might not be needed for simple tools
+from core.docker_api import DockerAPIError, default_client
+from core.docker_state import default_tracker
+from core.service_graph import build_closure, find_project_root, launch_stack as run_stack, load_build_graph, load_service_graph
 
 log = logging.getLogger(__name__)
 
+# Read without importing this module when the router runs with --lazy-load; keep in sync with make_tools.
+MANIFEST = {
+    "tools": [
+        {"name": "DOCKER_check_docker_socket", "description": "Checks if the Docker socket is available and globally read/write.",
+         "parameters": []},
+        {"name": "DOCKER_launch_ide", "description": "Launches the specified IDE service using make.",
+         "parameters": [{"name": "ide_name", "type": "str", "required": True}],
+         "invalidates": True},
+        {"name": "DOCKER_launch_service", "description": "Launches a service and waits for it to be running; with stable_seconds, also that it stays running that long.",
+         "parameters": [
+             {"name": "service_name", "type": "str", "required": True},
+             {"name": "stable_seconds", "type": "float", "required": False}
+         ],
+         "invalidates": True},
+        {"name": "DOCKER_launch_stack", "description": "Builds the images of services and their run-time dependencies (Makefile *_RUN_DEPS and compose depends_on), base images (*_BUILD_DEPS) first, then launches the services, starting independent ones in parallel. Returns per-service timings and the critical path.",
+         "parameters": [
+             {"name": "services", "type": "list", "required": True},
+             {"name": "max_parallel", "type": "int", "required": False},
+             {"name": "stable_seconds", "type": "float", "required": False}
+         ],
+         "invalidates": True},
+        {"name": "DOCKER_service_status", "description": "Returns the current state of one compose service, or of all of them, from the Docker events stream.",
+         "parameters": [{"name": "service_name", "type": "str", "required": False}]},
+        {"name": "DOCKER_service_logs", "description": "Streams the logs of a docker compose service. Set follow to keep streaming new lines.",
+         "parameters": [
+             {"name": "service_name", "type": "str", "required": True},
+             {"name": "tail", "type": "str", "required": False},
+             {"name": "follow", "type": "bool", "required": False}
+         ],
+         "streaming": True},
+    ]
+}
+
 def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
     tools = {}
+    # Container queries go to the Engine API over /var/run/docker.sock (one kept-alive connection
+    # instead of a docker CLI process per call); the CLI remains the fallback.
+    api = default_client()
+
+    def service_containers(service_name):
+        """Containers of a compose service, newest first, or None when the Engine API is not usable."""
+        if not api.available():
+            return None
+        labels = [f"com.docker.compose.service={service_name}"]
+        if os.environ.get("COMPOSE_PROJECT_NAME"):
+            labels.append(f"com.docker.compose.project={os.environ['COMPOSE_PROJECT_NAME']}")
+        try:
+            return sorted(api.list_containers({"label": labels}), key=lambda c: c.get("Created", 0), reverse=True)
+        except (OSError, DockerAPIError) as e:
+            log.warning(f"Docker API query for service '{service_name}' failed, using the docker CLI: {e}")
+            return None
+
+    def service_state(service_name, cwd=None):
+        """State of the service's container ("running", "exited", ...), "" if it has none yet."""
+        containers = service_containers(service_name)
+        if containers is not None:
+            return containers[0].get("State", "").lower() if containers else ""
+        ps_command = ["docker", "compose", "ps", "--format", "json", service_name]
+        ps_output = subprocess.run(ps_command, check=True, capture_output=True, text=True, cwd=cwd).stdout.strip()
+        if not ps_output:
+            return ""
+        return json.loads(ps_output.split('\n')[0]).get("State", "").lower()
+
+    def recent_logs(service_name, tail=50, cwd=None):
+        containers = service_containers(service_name)
+        if containers:
+            try:
+                return b"".join(api.logs(containers[0]["Id"], tail=str(tail))).decode("utf-8", errors="replace")
+            except (OSError, DockerAPIError) as e:
+                log.warning(f"Docker API logs for service '{service_name}' failed, using the docker CLI: {e}")
+        logs_command = ["docker", "compose", "logs", "--no-color", f"--tail={tail}", service_name]
+        logs_result = subprocess.run(logs_command, capture_output=True, text=True, cwd=cwd)
+        return logs_result.stdout or logs_result.stderr
 
     def check_docker_socket(args):
         """Checks if the Docker socket is available and globally read/write."""
@@ -58,81 +132,102 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="DOCKER_launch_ide",
         description=launch_ide.__doc__.strip(),
         parameters=[{"name": "ide_name", "type": "str", "required": True}],
-        run_fn=launch_ide
+        run_fn=launch_ide,
+        invalidates=True
     )
 
+    def wait_until_stable(tracker, service_name, timeout, stable_seconds, since, cwd=None):
+        """since: tracker.mark() taken before 'up'. States the tracker held before then may be stale
+        (an earlier container, or one whose new start event has not arrived yet), so they only count
+        when the daemon reports the same state for the service's current container now."""
+        current = service_containers(service_name)
+        cid, api_state = (current[0]["Id"], current[0].get("State", "").lower()) if current else (None, None)
+
+        def settled_since_up(s):
+            if s is None or s["state"] not in ("running", "exited", "dead"):
+                return False
+            return s["seq"] > since or (s["container_id"] == cid and s["state"] == api_state)
+
+        settled = tracker.wait_for(service_name, settled_since_up, timeout, container_id=cid)
+        if settled is not None and settled["state"] == "running" and stable_seconds > 0:
+            # A crash (or a restart by the restart policy) within the window counts as a failure.
+            restarts = settled["restarts"]
+            settled = tracker.wait_for(service_name, lambda s: s is None or s["state"] != "running" or s["restarts"] != restarts,
+                                       stable_seconds, container_id=settled["container_id"])
+            if settled is not None and settled["restarts"] != restarts:
+                settled = dict(settled, state="restarting")
+        if settled is not None and settled["state"] == "running":
+            log.info(f"Service '{service_name}' is running.")
+            return {"status": "success", "message": f"Service '{service_name}' launched and is running.", "state": settled}
+        if settled is None or settled["state"] not in ("exited", "dead", "restarting"):
+            message = f"Service '{service_name}' did not start within {timeout} seconds."
+        else:
+            log.error(f"Service '{service_name}' entered failed state: {settled['state']}")
+            message = f"Service '{service_name}' {settled['state']} (exit code {settled.get('exit_code')})."
+        return {"status": "error", "message": message, "state": settled,
+                "error": f"Container logs:\n{recent_logs(service_name, cwd=cwd)}"}
+
     def launch_service(args):
-        """Launches a specified deployment service and verifies it is running."""
+        """Launches a service and waits for it to be running; with stable_seconds, also that it stays running that long."""
         service_name = args.get("service_name")
         valid_services = ["cloud", "docker", "github"]
         if service_name not in valid_services:
             return {"status": "error", "message": f"Invalid service specified. Must be one of {valid_services}"}
+        return up_and_wait(service_name, float(args.get("stable_seconds") or 0))
 
-        # 1. Launch service via make
-        make_command = ["make", f"up-{service_name}"]
+    def build_image(service_name, cwd=None):
+        """docker compose build for one service (a no-op for services that only name an image)."""
+        build_command = ["docker", "compose", "build", service_name]
         try:
-            # Using a long timeout because this can involve downloading images
-            result = subprocess.run(make_command, check=True, capture_output=True, text=True, timeout=300)
-            log.info(f"Successfully ran command: '{' '.join(make_command)}'. Output:\n{result.stdout}")
-        except subprocess.CalledProcessError as e:
-            log.error(f"Error running command: '{' '.join(make_command)}'. Error:\n{e.stderr}")
-            return {"status": "error", "message": f"Failed to start service '{service_name}'.", "error": e.stderr}
-        except subprocess.TimeoutExpired as e:
-            log.error(f"Timeout running command: '{' '.join(make_command)}'.")
-            return {"status": "error", "message": f"Timeout running 'make up-{service_name}'. It may be taking a long time to download or build.", "error": str(e)}
-        except FileNotFoundError:
-            log.error("The 'make' command was not found.")
-            return {"status": "error", "message": "The 'make' command is not installed or not in the system's PATH."}
+            subprocess.run(build_command, check=True, capture_output=True, text=True, timeout=300, cwd=cwd)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError) as e:
+            return {"status": "error", "message": f"Command 'docker compose build' failed for service '{service_name}'.",
+                    "error": f"Details: {getattr(e, 'stderr', e)}"}
+        return {"status": "success", "message": f"Built '{service_name}'."}
 
-        # 2. Verify service is running
-        time.sleep(3) # Give the service a moment to stabilize or crash
-        
-    def launch_service(args):
-        """Launches a service and polls its status to ensure it stays running."""
-        service_name = args.get("service_name")
-        valid_services = ["cloud", "docker", "github"]
-        if service_name not in valid_services:
-            return {"status": "error", "message": f"Invalid service specified. Must be one of {valid_services}"}
+    def up_and_wait(service_name, stable_seconds=0.0, no_deps=False, cwd=None, build=True):
+        """docker compose up -d (with --build unless build is False) for one service, then waits until
+        it runs (or fails)."""
+        # Subscribe to events before 'up', so no state change of the new container is missed.
+        tracker = default_tracker()
+        since = tracker.mark() if tracker is not None else 0
 
         # 1. Launch service detached, ensuring it's built
-        up_command = ["docker", "compose", "up", "-d", "--build", service_name]
+        up_command = ["docker", "compose", "up", "-d"] + (["--build"] if build else []) + (["--no-deps"] if no_deps else []) + [service_name]
         try:
-            subprocess.run(up_command, check=True, capture_output=True, text=True, timeout=300)
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            subprocess.run(up_command, check=True, capture_output=True, text=True, timeout=300, cwd=cwd)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError) as e:
             # If the 'up' command itself fails, get the logs and return
-            logs_command = ["docker", "compose", "logs", "--no-color", "--tail=50", service_name]
-            logs_result = subprocess.run(logs_command, capture_output=True, text=True)
-            error_logs = logs_result.stdout or logs_result.stderr
+            error_logs = recent_logs(service_name, cwd=cwd)
             return {
                 "status": "error",
                 "message": f"Command 'docker compose up' failed for service '{service_name}'.",
                 "error": f"Details: {getattr(e, 'stderr', e)}\n\nContainer logs:\n{error_logs}"
             }
 
-        # 2. Poll for stability
+        # 2. Wait for the container to run (or crash), woken by its events
         polling_duration_seconds = 15
+        if tracker is not None:
+            return wait_until_stable(tracker, service_name, polling_duration_seconds, stable_seconds, since, cwd)
+
+        # Without the Docker socket, poll the docker CLI instead
         polling_interval_seconds = 3
         start_time = time.time()
         
         while time.time() - start_time < polling_duration_seconds:
             time.sleep(polling_interval_seconds)
             try:
-                ps_command = ["docker", "compose", "ps", "--format", "json", service_name]
-                ps_result = subprocess.run(ps_command, check=True, capture_output=True, text=True)
-                ps_output = ps_result.stdout.strip()
-                
-                if not ps_output:
-                    continue # Not up yet, keep polling
+                state = service_state(service_name, cwd)
 
-                service_info = json.loads(ps_output.split('\n')[0])
-                service_state = service_info.get("State", "").lower()
+                if not state:
+                    continue # Not up yet, keep polling
 
-                if "running" in service_state:
+                if "running" in state:
                     log.info(f"Service '{service_name}' is running.")
                     return {"status": "success", "message": f"Service '{service_name}' launched and is running."}
                 
-                if "exited" in service_state or "dead" in service_state:
-                    log.error(f"Service '{service_name}' entered failed state: {service_state}")
+                if "exited" in state or "dead" in state:
+                    log.error(f"Service '{service_name}' entered failed state: {state}")
                     break # Break and go to failure reporting
 
             except (subprocess.CalledProcessError, json.JSONDecodeError, IndexError) as e:
@@ -140,9 +235,7 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
                  # Continue polling
         
         # 3. If loop finishes or is broken, it's a failure.
-        logs_command = ["docker", "compose", "logs", "--no-color", "--tail=50", service_name]
-        logs_result = subprocess.run(logs_command, capture_output=True, text=True)
-        error_logs = logs_result.stdout or logs_result.stderr
+        error_logs = recent_logs(service_name, cwd=cwd)
         return {
             "status": "error",
             "message": f"Service '{service_name}' failed to become stable within {polling_duration_seconds} seconds.",
@@ -152,15 +245,137 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
     tools["DOCKER_launch_service"] = Tool(
         name="DOCKER_launch_service",
         description=launch_service.__doc__.strip(),
-        parameters=[{"name": "service_name", "type": "str", "required": True}],
-        run_fn=launch_service
+        parameters=[
+            {"name": "service_name", "type": "str", "required": True},
+            {"name": "stable_seconds", "type": "float", "required": False}
+        ],
+        run_fn=launch_service,
+        invalidates=True
     )
 
-    tools["DOCKER_launch_service"] = Tool(
-        name="DOCKER_launch_service",
-        description=launch_service.__doc__.strip(),
-        parameters=[{"name": "service_name", "type": "str", "required": True}],
-        run_fn=launch_service
+    def launch_stack(args):
+        """Builds the images of services and their run-time dependencies (Makefile *_RUN_DEPS and compose depends_on), base images (*_BUILD_DEPS) first, then launches the services, starting independent ones in parallel. Returns per-service timings and the critical path."""
+        services = args.get("services")
+        if isinstance(services, str):
+            services = services.replace(",", " ").split()
+        if not services:
+            return {"status": "error", "message": "services is required."}
+        root = find_project_root()
+        if root is None:
+            return {"status": "error", "message": "No docker-compose.yaml found in the working directory or above."}
+        stable_seconds = float(args.get("stable_seconds") or 0)
+        try:
+            max_parallel = int(args.get("max_parallel") or 8)
+            graph = load_service_graph(root)
+            # Like make's build-<service>: an image built FROM another service's image (e.g. codeserver
+            # on vnc) needs that one built first, even when it is not part of the stack that runs.
+            builds = build_closure(graph, load_build_graph(root), services)
+            built = run_stack(builds, builds, lambda service: build_image(service, cwd=root), max_parallel=max_parallel)
+            if built["status"] != "success":
+                return {"status": "error", "message": "Building the stack's images failed.", "build": built}
+            # Dependencies are started by the stack itself, so each 'up' only starts its own service.
+            report = run_stack(graph, services, lambda service: up_and_wait(service, stable_seconds, no_deps=True, cwd=root, build=False),
+                               max_parallel=max_parallel)
+            report["build"] = built
+            return report
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+
+    tools["DOCKER_launch_stack"] = Tool(
+        name="DOCKER_launch_stack",
+        description=launch_stack.__doc__.strip(),
+        parameters=[
+            {"name": "services", "type": "list", "required": True},
+            {"name": "max_parallel", "type": "int", "required": False},
+            {"name": "stable_seconds", "type": "float", "required": False}
+        ],
+        run_fn=launch_stack,
+        invalidates=True
+    )
+
+    def service_status(args):
+        """Returns the current state of one compose service, or of all of them, from the Docker events stream."""
+        service_name = args.get("service_name")
+        tracker = default_tracker()
+        if tracker is None:
+            # No daemon socket: ask the docker CLI instead.
+            if not service_name:
+                return {"status": "error", "message": "Listing all services needs the Docker socket; pass service_name."}
+            try:
+                state = service_state(service_name)
+            except (subprocess.CalledProcessError, FileNotFoundError, json.JSONDecodeError) as e:
+                return {"status": "error", "message": f"Could not get the state of '{service_name}'.", "error": str(e)}
+            return {"status": "success", "source": "cli", "services": {service_name: {"state": state or None}}}
+        if service_name:
+            return {"status": "success", "source": "events", "services": {service_name: tracker.service(service_name)}}
+        return {"status": "success", "source": "events", "services": tracker.services()}
+
+    tools["DOCKER_service_status"] = Tool(
+        name="DOCKER_service_status",
+        description=service_status.__doc__.strip(),
+        parameters=[{"name": "service_name", "type": "str", "required": False}],
+        run_fn=service_status
+    )
+
+    def chunk_lines(blocks):
+        """Turns raw output blocks into {"lines": [...]} chunks of complete lines."""
+        partial = b""
+        for data in blocks:
+            complete, sep, partial = (partial + data).rpartition(b"\n")
+            if sep:
+                yield {"lines": complete.decode("utf-8", errors="replace").split("\n")}
+        if partial:
+            yield {"lines": [partial.decode("utf-8", errors="replace")]}
+
+    def stream_lines(command):
+        """Yields the output of command as {"lines": [...]} chunks, as soon as the pipe has them."""
+        try:
+            proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except FileNotFoundError:
+            raise RuntimeError(f"The '{command[0]}' command is not installed or not in the system's PATH.")
+        try:
+            yield from chunk_lines(iter(lambda: proc.stdout.read1(65536), b""))
+            code = proc.wait()
+            if code != 0:
+                raise RuntimeError(f"'{' '.join(command)}' exited with code {code}")
+        finally:
+            # Also reached when the client stops reading a followed log.
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+    def stream_container_logs(container_id, tail, follow):
+        blocks = api.logs(container_id, tail=tail, follow=follow)
+        try:
+            yield from chunk_lines(blocks)
+        finally:
+            # Also reached when the client stops reading a followed log.
+            blocks.close()
+
+    def service_logs(args):
+        """Streams the logs of a docker compose service. Set follow to keep streaming new lines."""
+        service_name = args.get("service_name")
+        if not service_name:
+            return {"status": "error", "message": "service_name is required."}
+        containers = service_containers(service_name)
+        if containers:
+            return stream_container_logs(containers[0]["Id"], str(args.get("tail", "all")), bool(args.get("follow")))
+        command = ["docker", "compose", "logs", "--no-color", f"--tail={args.get('tail', 'all')}"]
+        if args.get("follow"):
+            command.append("--follow")
+        command.append(service_name)
+        return stream_lines(command)
+
+    tools["DOCKER_service_logs"] = Tool(
+        name="DOCKER_service_logs",
+        description=service_logs.__doc__.strip(),
+        parameters=[
+            {"name": "service_name", "type": "str", "required": True},
+            {"name": "tail", "type": "str", "required": False},
+            {"name": "follow", "type": "bool", "required": False}
+        ],
+        run_fn=service_logs,
+        streaming=True
     )
 
     return tools
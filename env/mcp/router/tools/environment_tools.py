@@ -25,7 +25,9 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="ENV_get_environment",
         description=get_environment.__doc__.strip(),
         parameters=[{"name": "key", "type": "str", "required": False}],
-        run_fn=get_environment
+        run_fn=get_environment,
+        cacheable=True,
+        cache_ttl=30.0
     )
 
     def create_dot_env_file(args):
@@ -37,7 +39,8 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="ENV_create_dot_env_file",
         description=create_dot_env_file.__doc__.strip(),
         parameters=[],
-        run_fn=create_dot_env_file
+        run_fn=create_dot_env_file,
+        invalidates=True
     )
 
     def set_environment_variable(args):
@@ -66,7 +69,8 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="ENV_set_environment_variable",
         description=set_environment_variable.__doc__.strip(),
         parameters=[{"name": "key", "type": "str", "required": True}, {"name": "value", "type": "str", "required": True}],
-        run_fn=set_environment_variable
+        run_fn=set_environment_variable,
+        invalidates=True
     )
 
     return tools
@@ -40,7 +40,9 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="PROJECT_get_projects",
         description=get_projects.__doc__.strip(),
         parameters=[],
-        run_fn=get_projects
+        run_fn=get_projects,
+        cacheable=True,
+        cache_ttl=10.0
     )
 
     def create_project_directory(args):
@@ -59,7 +61,8 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="PROJECT_create_project_directory",
         description=create_project_directory.__doc__.strip(),
         parameters=[{"name": "project_name", "type": "str", "required": True}],
-        run_fn=create_project_directory
+        run_fn=create_project_directory,
+        invalidates=True
     )
 
     def copy_self_to_project(args):
@@ -88,7 +91,8 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         name="PROJECT_copy_self_to_project",
         description=copy_self_to_project.__doc__.strip(),
         parameters=[{"name": "project_name", "type": "str", "required": True}],
-        run_fn=copy_self_to_project
+        run_fn=copy_self_to_project,
+        invalidates=True
     )
 
     return tools
@@ -10,15 +10,16 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
     tools = {}
 
     def connect_local_tool(args):
-        # args: {"name": "analytics", "cmd": ["python","analytics_mcp.py","--stdio"]}
+        # args: {"name": "analytics", "cmd": ["python","analytics_mcp.py","--stdio"], "replicas": 4}
         name = args["name"]
         cmd = args["cmd"]
-        downstream.connect_local(name, cmd)
+        replicas = int(args.get("replicas", 1))
+        downstream.connect_local(name, cmd, replicas=replicas)
         return {"ok": True, "connected": name}
 
     tools["ROUTER_connect_local_server"] = Tool(
         name="ROUTER_connect_local_server",
-        description="Start a local MCP server subprocess and connect via stdio. args: name, cmd",
+        description="Start a local MCP server subprocess and connect via stdio. args: name, cmd, replicas (optional, default 1; calls are balanced across replicas)",
         run_fn=connect_local_tool
     )
 
@@ -36,6 +37,18 @@ def make_tools(registry: MCPRegistry, downstream: DownstreamManager):
         run_fn=connect_remote_tool
     )
 
+    def warm_pool_stats_tool(args):
+        stats = downstream.warm_pool_stats()
+        if stats is None:
+            return {"enabled": False}
+        return {"enabled": True, **stats}
+
+    tools["ROUTER_warm_pool_stats"] = Tool(
+        name="ROUTER_warm_pool_stats",
+        description="Warm container pool statistics: hit rate, claim latency vs cold starts, idle containers per image",
+        run_fn=warm_pool_stats_tool
+    )
+
     def list_registry_tool(args):
         return registry.snapshot()
 